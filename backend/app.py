@@ -2,6 +2,7 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Depends
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import Response
 import requests
 import os
 import zipfile
@@ -14,6 +15,7 @@ from lib.cloudflareWorker import CloudflareWorker
 from lib.pydantic_filters import UserRegister, UserLogin, QuestionRequest, CustomAIRequest, QuestionResponse, FileUploadResponse
 from lib.SimpleKnowledgeStore import SimpleKnowledgeStore
 from lib.lightrag_extensions import MyLightRAG
+from lightrag.metrics import render_prometheus, PROMETHEUS_CONTENT_TYPE
 
 load_dotenv(dotenv_path=Path(__file__).parent / '.env')
 # Configuration
@@ -112,6 +114,11 @@ async def health_check():
         "fire_safety_chunks": len(fire_safety_store.chunks) if fire_safety_store else 0
     }
 
+# Prometheus scrape endpoint: LLM/embedding limiter queue wait and execution time, storage lock wait and hold time
+@app.get("/metrics")
+async def metrics():
+    return Response(content=render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
+
 # File upload for custom AI
 # Chat endpoints for different models
 @app.post("/chat/fire-safety", response_model=QuestionResponse)
@@ -196,7 +203,8 @@ async def get_available_modes():
             {"name": "hybrid", "description": "Combined approach (recommended)"},
             {"name": "local", "description": "Search specific document sections"},
             {"name": "global", "description": "Look at overall document themes"},
-            {"name": "naive", "description": "Simple text search"}
+            {"name": "naive", "description": "Simple text search"},
+            {"name": "community", "description": "Answer from summaries of related topics"}
         ]
     }
 
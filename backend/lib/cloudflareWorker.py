@@ -1,43 +1,272 @@
 # api call for cloudflare
 
+import asyncio
+import random
+import time
+
 import requests
+from requests.adapters import HTTPAdapter
 import numpy as np
 
+
+class CloudflareError(Exception):
+    """Raised when Cloudflare does not return a usable result.
+
+    Raising instead of returning an error string keeps failures out of the
+    LightRAG llm_response_cache.
+    """
+
+    def __init__(self, message: str, status_code: int | None = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class CloudflareRateLimitError(CloudflareError):
+    """Raised on HTTP 429, carries the Retry-After delay when Cloudflare sends one"""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message, status_code=429, retryable=True)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Paces request starts to `rate` per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds`, used when Cloudflare sends Retry-After"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit driven by rate limits and latency.
+
+    Every successful request below the latency target grows the limit by
+    roughly one per window of requests (additive increase). A 429 multiplies
+    the limit by `decrease_factor`, and a slow response shrinks it more gently,
+    so the controller settles just under the provider's limit.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        latency_target: float,
+        decrease_factor: float = 0.5,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float | None = None, rate_limited: bool = False):
+        async with self._condition:
+            self.in_flight -= 1
+            if rate_limited:
+                self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+            elif latency is not None and latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            elif latency is not None:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
 class CloudflareWorker:
-    def __init__(self, cloudflare_api_key: str, api_base_url: str, llm_model_name: str, embedding_model_name:str):
+    def __init__(
+        self,
+        cloudflare_api_key: str,
+        api_base_url: str,
+        llm_model_name: str,
+        embedding_model_name: str,
+        max_concurrency: int = 16,
+        min_concurrency: int = 1,
+        initial_concurrency: int = 4,
+        requests_per_second: float = 5.0,
+        latency_target: float = 20.0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        timeout: float = 30,
+    ):
         self.cloudflare_api_key = cloudflare_api_key
         self.api_base_url = api_base_url
         self.llm_model_name = llm_model_name
         self.embedding_model_name = embedding_model_name
         self.max_tokens = 4080
 
-    async def _send_request(self, model_name: str, input_: dict):
-        headers = {"Authorization": f"Bearer {self.cloudflare_api_key}"}
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.initial_concurrency = initial_concurrency
+        self.requests_per_second = requests_per_second
+        self.latency_target = latency_target
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self._session = requests.Session()
+        # The LLM and the embedding model can each run max_concurrency requests
+        # against the same host, keep a pooled connection for every one of them
+        adapter = HTTPAdapter(pool_maxsize=2 * max_concurrency)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        # Cloudflare rate limits apply per model, so each model gets its own controller
+        self._limiters: dict[str, AdaptiveConcurrencyLimiter] = {}
+        self._buckets: dict[str, TokenBucket] = {}
+        # Pending slot releases of finished requests, referenced until they ran
+        self._release_tasks: set[asyncio.Task] = set()
 
+    def _get_controller(self, model_name: str) -> tuple[AdaptiveConcurrencyLimiter, TokenBucket]:
+        if model_name not in self._limiters:
+            self._limiters[model_name] = AdaptiveConcurrencyLimiter(
+                initial=self.initial_concurrency,
+                min_limit=self.min_concurrency,
+                max_limit=self.max_concurrency,
+                latency_target=self.latency_target,
+            )
+            self._buckets[model_name] = TokenBucket(
+                rate=self.requests_per_second,
+                capacity=max(1.0, self.requests_per_second),
+            )
+        return self._limiters[model_name], self._buckets[model_name]
+
+    def _post(self, model_name: str, input_: dict):
+        headers = {"Authorization": f"Bearer {self.cloudflare_api_key}"}
         try:
-            response_raw = requests.post(
+            response = self._session.post(
                 f"{self.api_base_url}{model_name}",
                 headers=headers,
                 json=input_,
-                timeout=30
-            ).json()
+                timeout=self.timeout,
+            )
+        except requests.RequestException as e:
+            raise CloudflareError(f"Cloudflare request failed: {e}", retryable=True) from e
+
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            try:
+                retry_after = float(retry_after) if retry_after else None
+            except ValueError:
+                retry_after = None
+            raise CloudflareRateLimitError("Cloudflare rate limit exceeded", retry_after=retry_after)
+        if response.status_code >= 500:
+            raise CloudflareError(
+                f"Cloudflare server error {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+                retryable=True,
+            )
+        if response.status_code >= 400:
+            raise CloudflareError(
+                f"Cloudflare request rejected {response.status_code}: {response.text[:200]}",
+                status_code=response.status_code,
+            )
+
+        try:
+            response_raw = response.json()
+        except ValueError as e:
+            raise CloudflareError("Cloudflare returned invalid JSON", retryable=True) from e
+
+        result = response_raw.get("result") or {}
+
+        if "data" in result:  # Embedding case
+            return np.array(result["data"])
 
-            result = response_raw.get("result", {})
-            print(result)
+        if "response" in result:
+            return result["response"]
+
+        raise CloudflareError(
+            f"No response from Cloudflare: {response_raw.get('errors') or response_raw}",
+            status_code=response.status_code,
+        )
 
-            if "data" in result: # Embedding case
-                print("Returned Embedding results")
-                return np.array(result["data"])
+    def _backoff_delay(self, attempt: int, error: CloudflareError) -> float:
+        # Full jitter keeps concurrent retries from hitting the API in lockstep
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+        if isinstance(error, CloudflareRateLimitError) and error.retry_after:
+            delay = max(delay, error.retry_after)
+        return delay
 
-            if "response" in result:
-                print("Returned Query results")
-                return result["response"]
+    def _release_when_done(self, limiter: AdaptiveConcurrencyLimiter, post: asyncio.Future, started_at: float):
+        """Free the request's slot once its HTTP call has ended.
 
-            return "Error: No response from Cloudflare"
+        The call runs in a thread that cannot be cancelled, so the slot must stay
+        taken after the caller is cancelled (hedge loser, timeout, disconnect).
+        """
+
+        def done(future: asyncio.Future):
+            kwargs = {}
+            if not future.cancelled():
+                error = future.exception()
+                if error is None:
+                    kwargs["latency"] = time.monotonic() - started_at
+                elif isinstance(error, CloudflareRateLimitError):
+                    kwargs["rate_limited"] = True
+            task = asyncio.ensure_future(limiter.release(**kwargs))
+            self._release_tasks.add(task)
+            task.add_done_callback(self._release_tasks.discard)
+
+        post.add_done_callback(done)
+
+    async def _send_request(self, model_name: str, input_: dict):
+        limiter, bucket = self._get_controller(model_name)
 
-        except Exception as e:
-            print(f"Cloudflare API Error: {e}")
-            return f"Error: {e}"
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                await bucket.acquire()
+            except BaseException:
+                await limiter.release()
+                raise
+            started_at = time.monotonic()
+            post = asyncio.ensure_future(asyncio.to_thread(self._post, model_name, input_))
+            self._release_when_done(limiter, post, started_at)
+            try:
+                # Cancelling the caller leaves the post running, it holds its slot until done
+                return await asyncio.shield(post)
+            except CloudflareError as e:
+                rate_limited = isinstance(e, CloudflareRateLimitError)
+                if not e.retryable or attempt == self.max_retries:
+                    print(f"Cloudflare API Error: {e}")
+                    raise
+                delay = self._backoff_delay(attempt, e)
+                if rate_limited:
+                    bucket.pause(delay)
+                print(
+                    f"Cloudflare API Error: {e}, retry {attempt + 1}/{self.max_retries} "
+                    f"in {delay:.1f}s (concurrency limit {int(limiter.limit)})"
+                )
+                await asyncio.sleep(delay)
 
     # function for asking questions
     async def query(self, prompt, system_prompt: str = '', **kwargs) -> str:
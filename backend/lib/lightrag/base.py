@@ -36,13 +36,16 @@ T = TypeVar("T")
 class QueryParam:
     """Configuration parameters for query execution in LightRAG."""
 
-    mode: Literal["local", "global", "hybrid", "naive", "mix", "bypass"] = "global"
+    mode: Literal[
+        "local", "global", "hybrid", "naive", "mix", "community", "bypass"
+    ] = "global"
     """Specifies the retrieval mode:
     - "local": Focuses on context-dependent information.
     - "global": Utilizes global knowledge.
     - "hybrid": Combines local and global retrieval methods.
     - "naive": Performs a basic search without advanced techniques.
     - "mix": Integrates knowledge graph and vector retrieval.
+    - "community": Answers from precomputed community reports, see LightRAG.abuild_communities.
     """
 
     only_need_context: bool = False
@@ -77,6 +80,15 @@ class QueryParam:
     ll_keywords: list[str] = field(default_factory=list)
     """List of low-level keywords to refine retrieval focus."""
 
+    keyword_extraction: Literal["llm", "local"] = os.getenv(
+        "KEYWORD_EXTRACTION", "llm"
+    )
+    """How keywords are extracted when hl_keywords and ll_keywords are not given:
+    - "llm": Asks the LLM.
+    - "local": Matches the query against the graph's entity names and relationship keywords,
+      falls back to the LLM when less than `local_keywords_min_coverage` of the query matches.
+    """
+
     conversation_history: list[dict[str, str]] = field(default_factory=list)
     """Stores past conversation history to maintain context.
     Format: [{"role": "user/assistant", "content": "message"}].
@@ -541,6 +553,28 @@ class BaseGraphStorage(StorageNameSpace, ABC):
             edge_data: A dictionary of edge properties
         """
 
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """Insert or update several nodes, node_id -> node_data
+
+        Default implementation upserts nodes one by one.
+        Override this method for better performance in storage backends
+        that support batch operations.
+        """
+        for node_id, node_data in nodes.items():
+            await self.upsert_node(node_id, node_data)
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """Insert or update several edges, (source_node_id, target_node_id) -> edge_data
+
+        Both nodes of every edge must exist. Default implementation upserts
+        edges one by one. Override this method for better performance in
+        storage backends that support batch operations.
+        """
+        for (src_id, tgt_id), edge_data in edges.items():
+            await self.upsert_edge(src_id, tgt_id, edge_data)
+
     @abstractmethod
     async def delete_node(self, node_id: str) -> None:
         """Delete a node from the graph.
@@ -615,6 +649,14 @@ class DocStatus(str, Enum):
     FAILED = "failed"
 
 
+class ChunkProgress(str, Enum):
+    """Last completed processing stage of a chunk"""
+
+    EMBEDDED = "embedded"
+    EXTRACTED = "extracted"
+    MERGED = "merged"
+
+
 @dataclass
 class DocProcessingStatus:
     """Document processing status data structure"""
@@ -637,6 +679,8 @@ class DocProcessingStatus:
     """Number of chunks after splitting, used for processing"""
     chunks_list: list[str] | None = field(default_factory=list)
     """List of chunk IDs associated with this document, used for deletion"""
+    chunks_progress: dict[str, str] | None = field(default_factory=dict)
+    """Chunk ID -> last completed ChunkProgress stage, used to resume failed documents"""
     error: str | None = None
     """Error message if failed"""
     metadata: dict[str, Any] = field(default_factory=dict)
@@ -653,9 +697,13 @@ class DocStatusStorage(BaseKVStorage, ABC):
 
     @abstractmethod
     async def get_docs_by_status(
-        self, status: DocStatus
+        self, status: DocStatus, include_content: bool = True
     ) -> dict[str, DocProcessingStatus]:
-        """Get all documents with a specific status"""
+        """Get all documents with a specific status
+
+        With include_content=False the returned documents have an empty
+        content, callers load it with get_by_id when they need it.
+        """
 
     async def drop_cache_by_modes(self, modes: list[str] | None = None) -> bool:
         """Drop cache is not supported for Doc Status storage"""
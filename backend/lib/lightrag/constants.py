@@ -10,8 +10,19 @@ consistency and makes maintenance easier.
 DEFAULT_MAX_GLEANING = 1
 DEFAULT_MAX_TOKEN_SUMMARY = 500
 DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE = 6
+DEFAULT_ENTITY_EXTRACT_PACK_CHUNKS = 1  # 1 disables multi-chunk packing
 DEFAULT_WOKERS = 2
+DEFAULT_CPU_EXECUTOR = "none"  # none, thread or process
 DEFAULT_TIMEOUT = 150
+DEFAULT_LLM_HEDGE_INITIAL_DELAY = 10  # seconds, until enough query latencies are known
+DEFAULT_EMBEDDING_VECTOR_CACHE_SIZE = 50000  # 0 disables the vector cache
+DEFAULT_EMBEDDING_MICRO_BATCH_WAIT_MS = 5  # 0 disables micro-batching
+DEFAULT_QUERY_EMBEDDING_CACHE_MAX_BYTES = 16 * 1024 * 1024  # 0 disables the query embedding cache
+DEFAULT_GRAPH_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 0 disables the graph read cache
+DEFAULT_RANKING_INDEX_MAX_ENTITIES = 50000  # 0 disables the entity ranking index
+DEFAULT_COMMUNITY_MIN_SIZE = 3  # smaller communities get no report
+DEFAULT_COMMUNITY_RESOLUTION = 1.0  # Louvain resolution, higher gives smaller communities
+DEFAULT_LOCAL_KEYWORDS_MIN_COVERAGE = 0.3  # share of query words local keywords must match
 
 # Separator for graph fields
 GRAPH_FIELD_SEP = "<SEP>"
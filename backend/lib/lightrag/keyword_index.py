@@ -0,0 +1,296 @@
+"""
+Keyword extraction without an LLM call.
+
+A query's low-level keywords are mostly entity names already in the graph and
+its high-level keywords mostly terms the graph already uses as relationship
+keywords. KeywordIndex matches the query's words against both dictionaries
+with Aho-Corasick automatons. merge_nodes_and_edges adds new entities and
+terms to the automatons in place; other processes get an update flag and
+rebuild theirs from the graph before the next query. Deletions and edits
+flag every process, this one included.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+from collections import Counter
+
+from .base import BaseGraphStorage
+from .constants import GRAPH_FIELD_SEP
+from .kg.shared_storage import (
+    get_update_flag,
+    set_all_update_flags,
+    set_other_update_flags,
+)
+from .utils import logger, split_string_by_multi_markers
+
+_WORD_PATTERN = re.compile(r"\w+")
+
+# Number of high-level keywords returned per query
+_MAX_HL_KEYWORDS = 5
+
+
+def _words(text: str) -> tuple[str, ...]:
+    return tuple(_WORD_PATTERN.findall(text.casefold()))
+
+
+def _relation_terms(keywords: str) -> tuple[str, ...]:
+    """Distinct keywords of a relationship, stored comma separated and merged with GRAPH_FIELD_SEP"""
+    return tuple(
+        dict.fromkeys(
+            term.strip()
+            for part in split_string_by_multi_markers(keywords, [GRAPH_FIELD_SEP])
+            for term in part.split(",")
+            if term.strip()
+        )
+    )
+
+
+class _AhoCorasick:
+    """Aho-Corasick automaton over word sequences
+
+    Patterns can be added after searching, the trie is extended in place and
+    the failure links are recomputed on the next search.
+    """
+
+    def __init__(self):
+        self._goto: list[dict[str, int]] = [{}]
+        # pattern stored at a node as (length, value)
+        self._outputs: list[tuple[int, str] | None] = [None]
+        self._fail: list[int] = [0]
+        # nearest node on the failure chain having an output
+        self._output_link: list[int] = [0]
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return sum(1 for output in self._outputs if output is not None)
+
+    def add(self, words: tuple[str, ...], value: str) -> bool:
+        """Add a pattern, returns False if the same words were added before"""
+        if not words:
+            return False
+        node = 0
+        for word in words:
+            next_node = self._goto[node].get(word)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][word] = next_node
+                self._goto.append({})
+                self._outputs.append(None)
+                self._fail.append(0)
+                self._output_link.append(0)
+            node = next_node
+        if self._outputs[node] is not None:
+            return False
+        self._outputs[node] = (len(words), value)
+        self._dirty = True
+        return True
+
+    def _build_links(self) -> None:
+        queue = list(self._goto[0].values())
+        for node in queue:
+            self._fail[node] = 0
+            self._output_link[node] = 0
+        for node in queue:
+            for word, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(word, 0)
+                fail = self._fail[child]
+                self._output_link[child] = (
+                    fail if self._outputs[fail] is not None else self._output_link[fail]
+                )
+                queue.append(child)
+        self._dirty = False
+
+    def search(self, words: tuple[str, ...]) -> list[tuple[int, int, str]]:
+        """All matches as (start, end, value), end exclusive"""
+        if self._dirty:
+            self._build_links()
+        matches = []
+        node = 0
+        for index, word in enumerate(words):
+            while node and word not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(word, 0)
+            output_node = (
+                node if self._outputs[node] is not None else self._output_link[node]
+            )
+            while output_node:
+                length, value = self._outputs[output_node]
+                matches.append((index + 1 - length, index + 1, value))
+                output_node = self._output_link[output_node]
+        return matches
+
+
+def _select_matches(
+    matches: list[tuple[int, int, str]],
+) -> list[tuple[int, int, str]]:
+    """Longest non-overlapping matches, in query order"""
+    taken = set()
+    selected = []
+    for start, end, value in sorted(matches, key=lambda m: (m[0] - m[1], m[0])):
+        span = range(start, end)
+        if taken.isdisjoint(span):
+            taken.update(span)
+            selected.append((start, end, value))
+    return sorted(selected)
+
+
+class KeywordIndex:
+    """Entity names and relationship keywords of one graph, matched against queries"""
+
+    def __init__(self, namespace: str, workspace: str = ""):
+        self.namespace = namespace
+        self.workspace = workspace
+        self._entities = _AhoCorasick()
+        self._terms = _AhoCorasick()
+        # relationship keyword -> number of relationships using it
+        self._term_counts: Counter[str] = Counter()
+        # relationship -> its counted keywords, a re-merged edge replaces them
+        self._edge_terms: dict[tuple[str, str], tuple[str, ...]] = {}
+        self._loaded = False
+        self._index_updated = None
+        self._load_lock = asyncio.Lock()
+
+    @property
+    def _flag_namespace(self) -> str:
+        return f"{self.workspace}_{self.namespace}_keyword_index"
+
+    def add(
+        self, entity_names: list[str], relations: dict[tuple[str, str], str]
+    ) -> None:
+        """Add entity names and relationships (edge -> all its keywords) to the dictionaries"""
+        for name in entity_names:
+            self._entities.add(_words(name), name)
+        for edge, keywords in relations.items():
+            edge = tuple(sorted(edge))
+            terms = _relation_terms(keywords)
+            # Count each relationship's terms once, also when it is merged again
+            self._term_counts.subtract(self._edge_terms.get(edge, ()))
+            self._term_counts.update(terms)
+            self._edge_terms[edge] = terms
+            for term in terms:
+                self._terms.add(_words(term), term)
+
+    async def _load(self, knowledge_graph_inst: BaseGraphStorage) -> None:
+        """Build the dictionaries from the graph, again after another process merged into it"""
+        if self._index_updated is None:
+            self._index_updated = await get_update_flag(self._flag_namespace)
+        if self._loaded and not self._index_updated.value:
+            return
+        async with self._load_lock:
+            if self._loaded and not self._index_updated.value:
+                return
+            self._index_updated.value = False
+            labels = await knowledge_graph_inst.get_all_labels()
+            node_edges = await knowledge_graph_inst.get_nodes_edges_batch(labels)
+            pairs = {
+                tuple(sorted(e)) for edges in node_edges.values() for e in edges or []
+            }
+            edges = await knowledge_graph_inst.get_edges_batch(
+                [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in pairs]
+            )
+
+            self._entities = _AhoCorasick()
+            self._terms = _AhoCorasick()
+            self._term_counts = Counter()
+            self._edge_terms = {}
+            self.add(
+                labels,
+                {
+                    pair: edge.get("keywords") or ""
+                    for pair, edge in edges.items()
+                    if edge
+                },
+            )
+            self._loaded = True
+            logger.debug(
+                f"Keyword index for {self.namespace}: {len(self._entities)} entities, {len(self._terms)} terms"
+            )
+
+    async def merged(
+        self, entity_names: list[str], relations: dict[tuple[str, str], str]
+    ) -> None:
+        """Add what this process merged into the graph, other processes rebuild their index"""
+        if self._index_updated is None:
+            self._index_updated = await get_update_flag(self._flag_namespace)
+        await set_other_update_flags(self._flag_namespace, self._index_updated)
+        # An index that was never loaded is built from the graph on first use
+        if self._loaded and not self._index_updated.value:
+            self.add(entity_names, relations)
+
+    async def invalidate(self) -> None:
+        """Make every process, this one included, rebuild its index from the graph"""
+        if self._index_updated is None:
+            self._index_updated = await get_update_flag(self._flag_namespace)
+        await set_all_update_flags(self._flag_namespace)
+
+    async def extract(
+        self, query: str, knowledge_graph_inst: BaseGraphStorage
+    ) -> tuple[list[str], list[str], float]:
+        """Match the query against the graph's entity names and relationship keywords
+
+        Returns:
+            (high_level_keywords, low_level_keywords, coverage), coverage is
+            the share of the query's words covered by a match
+        """
+        await self._load(knowledge_graph_inst)
+        words = _words(query)
+        if not words:
+            return [], [], 0.0
+
+        entity_matches = _select_matches(self._entities.search(words))
+        term_matches = _select_matches(self._terms.search(words))
+
+        ll_keywords = list(dict.fromkeys(value for _, _, value in entity_matches))
+
+        # Rarer and longer terms say more about the query's theme
+        def term_score(match: tuple[int, int, str]) -> float:
+            start, end, term = match
+            return (end - start) * math.log(
+                1 + len(self._edge_terms) / (1 + self._term_counts[term])
+            )
+
+        hl_keywords = list(
+            dict.fromkeys(
+                term for _, _, term in sorted(term_matches, key=term_score, reverse=True)
+            )
+        )[:_MAX_HL_KEYWORDS]
+
+        covered = set()
+        for start, end, _ in entity_matches + term_matches:
+            covered.update(range(start, end))
+        return hl_keywords, ll_keywords, len(covered) / len(words)
+
+
+# (workspace, namespace) -> KeywordIndex of that graph in this process
+_keyword_indexes: dict[tuple[str, str], KeywordIndex] = {}
+
+
+def get_keyword_index(knowledge_graph_inst: BaseGraphStorage) -> KeywordIndex:
+    key = (knowledge_graph_inst.workspace, knowledge_graph_inst.namespace)
+    index = _keyword_indexes.get(key)
+    if index is None:
+        index = KeywordIndex(
+            knowledge_graph_inst.namespace, knowledge_graph_inst.workspace
+        )
+        _keyword_indexes[key] = index
+    return index
+
+
+async def update_keyword_index(
+    knowledge_graph_inst: BaseGraphStorage,
+    entity_names: list[str],
+    relations: dict[tuple[str, str], str],
+) -> None:
+    """Record entities and relationships (edge -> all its keywords) merged into the graph by this process"""
+    await get_keyword_index(knowledge_graph_inst).merged(entity_names, relations)
+
+
+async def invalidate_keyword_index(knowledge_graph_inst: BaseGraphStorage) -> None:
+    """Record a graph change other than a merge, e.g. a deletion or an entity edit"""
+    await get_keyword_index(knowledge_graph_inst).invalidate()
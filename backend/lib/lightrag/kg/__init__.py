@@ -45,6 +45,9 @@ STORAGE_IMPLEMENTATIONS = {
     },
 }
 
+# Storages without tables for the community_reports and communities namespaces
+COMMUNITY_UNSUPPORTED_STORAGES = {"PGKVStorage", "PGVectorStorage"}
+
 # Storage implementation environment variable without default value
 STORAGE_ENV_REQUIREMENTS: dict[str, list[str]] = {
     # KV Storage Implementations
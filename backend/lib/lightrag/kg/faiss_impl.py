@@ -6,11 +6,11 @@ import json
 import numpy as np
 from dataclasses import dataclass
 
-from lightrag.utils import logger, compute_mdhash_id
+from lightrag.utils import atomic_write, logger, compute_mdhash_id, write_json
 from lightrag.base import BaseVectorStorage
 
 from .shared_storage import (
-    get_storage_lock,
+    get_namespace_storage_lock,
     get_update_flag,
     set_all_update_flags,
 )
@@ -64,6 +64,8 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Keep a local store for metadata, IDs, etc.
         # Maps <int faiss_id> → metadata (including your original ID).
         self._id_to_meta = {}
+        # Serializes writes of the index files, taken before the storage lock
+        self._persist_lock = asyncio.Lock()
 
         self._load_faiss_index()
 
@@ -72,13 +74,17 @@ class FaissVectorDBStorage(BaseVectorStorage):
         # Get the update flag for cross-process update notification
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = await get_namespace_storage_lock(self.namespace)
 
     async def _get_index(self):
         """Check if the shtorage should be reloaded"""
-        # Acquire lock to prevent concurrent read and write
+        # Readers share the lock, only a reload needs it exclusively
+        async with self._storage_lock.reader():
+            if not self.storage_updated.value:
+                return self._index
+
         async with self._storage_lock:
-            # Check if storage was updated by another process
+            # Re-check, another coroutine may have reloaded while we waited
             if self.storage_updated.value:
                 logger.info(
                     f"Process {os.getpid()} FAISS reloading {self.namespace} due to update by another process"
@@ -312,21 +318,28 @@ class FaissVectorDBStorage(BaseVectorStorage):
 
             self._id_to_meta = new_id_to_meta
 
-    def _save_faiss_index(self):
+    def _save_faiss_index(self, index=None, id_to_meta=None):
         """
-        Save the current Faiss index + metadata to disk so it can persist across runs.
+        Save the Faiss index + metadata to disk so it can persist across runs.
+        Pass a snapshot (index, id_to_meta) to save it from a worker thread.
+        Both files are replaced atomically.
         """
-        faiss.write_index(self._index, self._faiss_index_file)
+        index = self._index if index is None else index
+        id_to_meta = self._id_to_meta if id_to_meta is None else id_to_meta
+
+        atomic_write(
+            self._faiss_index_file,
+            lambda tmp_file_name: faiss.write_index(index, tmp_file_name),
+        )
 
         # Save metadata dict to JSON. Convert all keys to strings for JSON storage.
         # _id_to_meta is { int: { '__id__': doc_id, '__vector__': [float,...], ... } }
         # We'll keep the int -> dict, but JSON requires string keys.
         serializable_dict = {}
-        for fid, meta in self._id_to_meta.items():
+        for fid, meta in id_to_meta.items():
             serializable_dict[str(fid)] = meta
 
-        with open(self._meta_file, "w", encoding="utf-8") as f:
-            json.dump(serializable_dict, f)
+        write_json(serializable_dict, self._meta_file, indent=None)
 
     def _load_faiss_index(self):
         """
@@ -373,15 +386,19 @@ class FaissVectorDBStorage(BaseVectorStorage):
                 self.storage_updated.value = False
                 return False  # Return error
 
-        # Acquire lock and perform persistence
-        async with self._storage_lock:
+        async with self._persist_lock:
+            # Snapshot under the lock, serialization runs in a worker thread
+            async with self._storage_lock:
+                index = faiss.clone_index(self._index)
+                id_to_meta = dict(self._id_to_meta)
             try:
                 # Save data to disk
-                self._save_faiss_index()
-                # Notify other processes that data has been updated
-                await set_all_update_flags(self.namespace)
-                # Reset own update flag to avoid self-reloading
-                self.storage_updated.value = False
+                await asyncio.to_thread(self._save_faiss_index, index, id_to_meta)
+                async with self._storage_lock:
+                    # Notify other processes that data has been updated
+                    await set_all_update_flags(self.namespace)
+                    # Reset own update flag to avoid self-reloading
+                    self.storage_updated.value = False
             except Exception as e:
                 logger.error(f"Error saving FAISS index for {self.namespace}: {e}")
                 return False  # Return error
@@ -0,0 +1,420 @@
+"""
+Read-through LRU cache in front of a remote graph storage.
+
+Neo4j, PostgreSQL (AGE) and MongoDB graph storages pay a network round trip
+for every node, edge and degree lookup, and queries keep asking for the same
+high-degree entities. CachedGraphStorage wraps any BaseGraphStorage, answers
+repeated reads from process memory and invalidates exactly the entries a
+write can change. Writes also set an update flag for every other process, which
+then drops its whole cache before the next read.
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any
+
+from lightrag.base import BaseGraphStorage
+from lightrag.metrics import metrics_registry
+from lightrag.types import KnowledgeGraph
+from lightrag.utils import logger
+
+from .shared_storage import get_update_flag, set_other_update_flags
+
+_MISSING = object()
+
+_cache_hits = metrics_registry.gauge(
+    "lightrag_graph_cache_hits",
+    "Graph cache lookups answered from memory",
+    ("namespace",),
+)
+_cache_misses = metrics_registry.gauge(
+    "lightrag_graph_cache_misses",
+    "Graph cache lookups sent to the storage",
+    ("namespace",),
+)
+_cache_bytes = metrics_registry.gauge(
+    "lightrag_graph_cache_bytes",
+    "Estimated size of the cached graph data",
+    ("namespace",),
+)
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough memory footprint of a cached value, good enough to enforce a cap"""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            _estimate_size(k) + _estimate_size(v) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value: Any) -> Any:
+    # Callers may modify what they get back, never hand out the cached object
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _edge_key(src_id: str, tgt_id: str) -> tuple[str, str]:
+    # Edges are undirected
+    return (src_id, tgt_id) if src_id <= tgt_id else (tgt_id, src_id)
+
+
+class _LRUCache:
+    """Byte-capped LRU map, values are stored with their estimated size"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple, tuple[Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return _MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, value: Any) -> None:
+        size = _estimate_size(key) + _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.bytes -= evicted_size
+
+    def pop(self, key: tuple) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+
+class CachedGraphStorage(BaseGraphStorage):
+    """BaseGraphStorage wrapper caching node, edge, degree and adjacency reads
+
+    Attributes not defined here are forwarded to the wrapped storage.
+    """
+
+    def __init__(self, storage: BaseGraphStorage, max_bytes: int):
+        self.storage = storage
+        self.namespace = storage.namespace
+        self.workspace = storage.workspace
+        self.global_config = storage.global_config
+        self.embedding_func = storage.embedding_func
+        self._cache = _LRUCache(max_bytes)
+        self._cache_updated = None
+        # Bumped by every write, a read only fills the cache if no write
+        # happened while it was waiting for the storage
+        self._generation = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes missing on the wrapper
+        storage = self.__dict__.get("storage")
+        if storage is None:
+            raise AttributeError(name)
+        return getattr(storage, name)
+
+    @property
+    def _flag_namespace(self) -> str:
+        return f"{self.workspace}_{self.namespace}_graph_cache"
+
+    def cache_stats(self) -> dict[str, Any]:
+        """Hit rate, size and entry count of this process's cache"""
+        lookups = self._cache.hits + self._cache.misses
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "hit_rate": self._cache.hits / lookups if lookups else 0.0,
+            "bytes": self._cache.bytes,
+            "max_bytes": self._cache.max_bytes,
+            "entries": len(self._cache),
+        }
+
+    def _publish_stats(self) -> None:
+        _cache_hits.set(self._cache.hits, namespace=self.namespace)
+        _cache_misses.set(self._cache.misses, namespace=self.namespace)
+        _cache_bytes.set(self._cache.bytes, namespace=self.namespace)
+
+    def _check_updates(self) -> None:
+        """Drop the cache if another process wrote to the graph"""
+        if self._cache_updated is not None and self._cache_updated.value:
+            logger.debug(
+                f"Graph cache for {self.namespace} cleared after an update by another process"
+            )
+            self._cache.clear()
+            self._generation += 1
+            self._cache_updated.value = False
+
+    async def _invalidate(self, keys: list[tuple]) -> None:
+        self._generation += 1
+        for key in keys:
+            self._cache.pop(key)
+        if self._cache_updated is not None:
+            # This process's cache was invalidated precisely above
+            await set_other_update_flags(self._flag_namespace, self._cache_updated)
+        self._publish_stats()
+
+    @staticmethod
+    def _node_keys(node_id: str) -> list[tuple]:
+        return [("node", node_id), ("degree", node_id), ("node_edges", node_id)]
+
+    @staticmethod
+    def _edge_keys(src_id: str, tgt_id: str) -> list[tuple]:
+        return [
+            ("edge", _edge_key(src_id, tgt_id)),
+            ("degree", src_id),
+            ("degree", tgt_id),
+            ("node_edges", src_id),
+            ("node_edges", tgt_id),
+        ]
+
+    def _edges_keys(self, edges) -> list[tuple]:
+        return [
+            key for src_id, tgt_id in edges for key in self._edge_keys(src_id, tgt_id)
+        ]
+
+    async def _cached(self, key: tuple, load) -> Any:
+        self._check_updates()
+        value = self._cache.get(key)
+        if value is _MISSING:
+            generation = self._generation
+            value = await load()
+            if generation == self._generation:
+                self._cache.put(key, value)
+            self._publish_stats()
+        return _copy(value)
+
+    async def _cached_batch(
+        self, keys: dict[Any, tuple], load, default: Any = None
+    ) -> dict[Any, Any]:
+        """Look up many keys at once, `load` fetches the missing ones as a batch
+
+        Args:
+            keys: caller's item -> cache key
+            load: coroutine function taking the missing items, returning item -> value
+            default: value cached for items `load` does not return
+        """
+        self._check_updates()
+        result = {}
+        missing = []
+        for item, key in keys.items():
+            value = self._cache.get(key)
+            if value is _MISSING:
+                missing.append(item)
+            else:
+                result[item] = value
+        if missing:
+            generation = self._generation
+            loaded = await load(missing)
+            for item in missing:
+                value = loaded.get(item, default)
+                if generation == self._generation:
+                    self._cache.put(keys[item], value)
+                result[item] = value
+            self._publish_stats()
+        return {item: _copy(value) for item, value in result.items()}
+
+    async def initialize(self):
+        await self.storage.initialize()
+        self._cache_updated = await get_update_flag(self._flag_namespace)
+
+    async def finalize(self):
+        self._cache.clear()
+        await self.storage.finalize()
+
+    async def index_done_callback(self) -> None:
+        await self.storage.index_done_callback()
+
+    async def drop(self) -> dict[str, str]:
+        result = await self.storage.drop()
+        self._cache.clear()
+        await self._invalidate([])
+        return result
+
+    async def has_node(self, node_id: str) -> bool:
+        return await self.get_node(node_id) is not None
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return await self.get_edge(source_node_id, target_node_id) is not None
+
+    async def node_degree(self, node_id: str) -> int:
+        return await self._cached(
+            ("degree", node_id), lambda: self.storage.node_degree(node_id)
+        )
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.node_degree(src_id) + await self.node_degree(tgt_id)
+
+    async def get_node(self, node_id: str) -> dict[str, str] | None:
+        return await self._cached(
+            ("node", node_id), lambda: self.storage.get_node(node_id)
+        )
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> dict[str, str] | None:
+        return await self._cached(
+            ("edge", _edge_key(source_node_id, target_node_id)),
+            lambda: self.storage.get_edge(source_node_id, target_node_id),
+        )
+
+    async def get_node_edges(self, source_node_id: str) -> list[tuple[str, str]] | None:
+        return await self._cached(
+            ("node_edges", source_node_id),
+            lambda: self.storage.get_node_edges(source_node_id),
+        )
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        nodes = await self._cached_batch(
+            {node_id: ("node", node_id) for node_id in node_ids},
+            self.storage.get_nodes_batch,
+        )
+        return {node_id: node for node_id, node in nodes.items() if node is not None}
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        return await self._cached_batch(
+            {node_id: ("degree", node_id) for node_id in node_ids},
+            self.storage.node_degrees_batch,
+            default=0,
+        )
+
+    async def edge_degrees_batch(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        degrees = await self.node_degrees_batch(
+            list({node_id for pair in edge_pairs for node_id in pair})
+        )
+        return {
+            (src_id, tgt_id): degrees.get(src_id, 0) + degrees.get(tgt_id, 0)
+            for src_id, tgt_id in edge_pairs
+        }
+
+    async def get_edges_batch(
+        self, pairs: list[dict[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        async def load(missing: list[tuple[str, str]]) -> dict:
+            loaded = await self.storage.get_edges_batch(
+                [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in missing]
+            )
+            # Backends may key an undirected edge in either direction
+            return {
+                (src_id, tgt_id): loaded.get((src_id, tgt_id))
+                or loaded.get((tgt_id, src_id))
+                for src_id, tgt_id in missing
+            }
+
+        keys = {}
+        for pair in pairs:
+            src_id, tgt_id = pair["src"], pair["tgt"]
+            keys[(src_id, tgt_id)] = ("edge", _edge_key(src_id, tgt_id))
+        edges = await self._cached_batch(keys, load)
+        return {pair: edge for pair, edge in edges.items() if edge is not None}
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        return await self._cached_batch(
+            {node_id: ("node_edges", node_id) for node_id in node_ids},
+            self.storage.get_nodes_edges_batch,
+            default=[],
+        )
+
+    async def get_nodes_by_chunk_ids(self, chunk_ids: list[str]) -> list[dict]:
+        return await self.storage.get_nodes_by_chunk_ids(chunk_ids)
+
+    async def get_edges_by_chunk_ids(self, chunk_ids: list[str]) -> list[dict]:
+        return await self.storage.get_edges_by_chunk_ids(chunk_ids)
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
+        try:
+            await self.storage.upsert_node(node_id, node_data)
+        finally:
+            await self._invalidate([("node", node_id)])
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ) -> None:
+        try:
+            await self.storage.upsert_edge(source_node_id, target_node_id, edge_data)
+        finally:
+            await self._invalidate(self._edge_keys(source_node_id, target_node_id))
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        try:
+            await self.storage.upsert_nodes_batch(nodes)
+        finally:
+            await self._invalidate([("node", node_id) for node_id in nodes])
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        try:
+            await self.storage.upsert_edges_batch(edges)
+        finally:
+            await self._invalidate(self._edges_keys(edges))
+
+    async def _node_removal_keys(self, node_ids: list[str]) -> list[tuple]:
+        """Entries changed by removing nodes, including their neighbours' degrees"""
+        keys = []
+        node_edges = await self.get_nodes_edges_batch(node_ids)
+        for node_id in node_ids:
+            keys.extend(self._node_keys(node_id))
+            for src_id, tgt_id in node_edges.get(node_id) or []:
+                keys.extend(self._edge_keys(src_id, tgt_id))
+        return keys
+
+    async def delete_node(self, node_id: str) -> None:
+        keys = await self._node_removal_keys([node_id])
+        try:
+            await self.storage.delete_node(node_id)
+        finally:
+            await self._invalidate(keys)
+
+    async def remove_nodes(self, nodes: list[str]):
+        keys = await self._node_removal_keys(nodes)
+        try:
+            await self.storage.remove_nodes(nodes)
+        finally:
+            await self._invalidate(keys)
+
+    async def remove_edges(self, edges: list[tuple[str, str]]):
+        try:
+            await self.storage.remove_edges(edges)
+        finally:
+            await self._invalidate(self._edges_keys(edges))
+
+    async def get_all_labels(self) -> list[str]:
+        return await self.storage.get_all_labels()
+
+    async def get_knowledge_graph(
+        self, node_label: str, max_depth: int = 3, max_nodes: int = 1000
+    ) -> KnowledgeGraph:
+        return await self.storage.get_knowledge_graph(node_label, max_depth, max_nodes)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+import asyncio
 import os
 from typing import Any, Union, final
 
@@ -14,7 +15,7 @@ from lightrag.utils import (
 )
 from .shared_storage import (
     get_namespace_data,
-    get_storage_lock,
+    get_namespace_storage_lock,
     get_data_init_lock,
     get_update_flag,
     set_all_update_flags,
@@ -23,6 +24,10 @@ from .shared_storage import (
 )
 
 
+def _status_value(status: Any) -> str | None:
+    return status.value if isinstance(status, DocStatus) else status
+
+
 @final
 @dataclass
 class JsonDocStatusStorage(DocStatusStorage):
@@ -45,31 +50,56 @@ class JsonDocStatusStorage(DocStatusStorage):
         self._data = None
         self._storage_lock = None
         self.storage_updated = None
+        # Serializes writes of this storage's file, taken before the storage lock
+        self._persist_lock = asyncio.Lock()
+        # Status value -> {doc_id: True}, shared between processes like _data
+        self._status_index: dict[str, dict[str, bool]] = {}
+
+    def _index_doc(self, doc_id: str, status: Any) -> None:
+        """Move doc_id to the index of its new status, caller holds the storage lock"""
+        status_value = _status_value(status)
+        for value, index in self._status_index.items():
+            if value != status_value:
+                index.pop(doc_id, None)
+        if status_value in self._status_index:
+            self._status_index[status_value][doc_id] = True
+
+    def _unindex_doc(self, doc_id: str) -> None:
+        for index in self._status_index.values():
+            index.pop(doc_id, None)
 
     async def initialize(self):
         """Initialize storage data"""
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = await get_namespace_storage_lock(self.namespace)
         self.storage_updated = await get_update_flag(self.namespace)
         async with get_data_init_lock():
             # check need_init must before get_namespace_data
             need_init = await try_initialize_namespace(self.namespace)
             self._data = await get_namespace_data(self.namespace)
+            self._status_index = {
+                status.value: await get_namespace_data(
+                    f"{self.namespace}:status:{status.value}"
+                )
+                for status in DocStatus
+            }
             if need_init:
                 loaded_data = load_json(self._file_name) or {}
                 async with self._storage_lock:
                     self._data.update(loaded_data)
+                    for doc_id, doc in loaded_data.items():
+                        self._index_doc(doc_id, doc.get("status"))
                     logger.info(
                         f"Process {os.getpid()} doc status load {self.namespace} with {len(loaded_data)} records"
                     )
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
         """Return keys that should be processed (not in storage or not successfully processed)"""
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             return set(keys) - set(self._data.keys())
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
         result: list[dict[str, Any]] = []
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             for id in ids:
                 data = self._data.get(id, None)
                 if data:
@@ -78,47 +108,57 @@ class JsonDocStatusStorage(DocStatusStorage):
 
     async def get_status_counts(self) -> dict[str, int]:
         """Get counts of documents in each status"""
-        counts = {status.value: 0 for status in DocStatus}
-        async with self._storage_lock:
-            for doc in self._data.values():
-                counts[doc["status"]] += 1
-        return counts
+        async with self._storage_lock.reader():
+            return {
+                value: len(index) for value, index in self._status_index.items()
+            }
 
     async def get_docs_by_status(
-        self, status: DocStatus
+        self, status: DocStatus, include_content: bool = True
     ) -> dict[str, DocProcessingStatus]:
         """Get all documents with a specific status"""
         result = {}
-        async with self._storage_lock:
-            for k, v in self._data.items():
-                if v["status"] == status.value:
-                    try:
-                        # Make a copy of the data to avoid modifying the original
-                        data = v.copy()
-                        # If content is missing, use content_summary as content
-                        if "content" not in data and "content_summary" in data:
-                            data["content"] = data["content_summary"]
-                        # If file_path is not in data, use document id as file path
-                        if "file_path" not in data:
-                            data["file_path"] = "no-file-path"
-                        result[k] = DocProcessingStatus(**data)
-                    except KeyError as e:
-                        logger.error(f"Missing required field for document {k}: {e}")
-                        continue
+        async with self._storage_lock.reader():
+            # Only documents in the status index are visited, not the whole store
+            for k in list(self._status_index[status.value].keys()):
+                v = self._data.get(k)
+                if v is None or v["status"] != status.value:
+                    continue
+                try:
+                    # Make a copy of the data to avoid modifying the original
+                    data = v.copy()
+                    if not include_content:
+                        data["content"] = ""
+                    # If content is missing, use content_summary as content
+                    elif "content" not in data and "content_summary" in data:
+                        data["content"] = data["content_summary"]
+                    # If file_path is not in data, use document id as file path
+                    if "file_path" not in data:
+                        data["file_path"] = "no-file-path"
+                    result[k] = DocProcessingStatus(**data)
+                except KeyError as e:
+                    logger.error(f"Missing required field for document {k}: {e}")
+                    continue
         return result
 
     async def index_done_callback(self) -> None:
-        async with self._storage_lock:
-            if self.storage_updated.value:
-                data_dict = (
-                    dict(self._data) if hasattr(self._data, "_getvalue") else self._data
-                )
-                logger.debug(
-                    f"Process {os.getpid()} doc status writting {len(data_dict)} records to {self.namespace}"
-                )
-                write_json(data_dict, self._file_name)
+        async with self._persist_lock:
+            async with self._storage_lock:
+                if not self.storage_updated.value:
+                    return
+                # Snapshot under the lock, changes made after this set the flags again
+                data_dict = dict(self._data)
                 await clear_all_update_flags(self.namespace)
 
+            logger.debug(
+                f"Process {os.getpid()} doc status writting {len(data_dict)} records to {self.namespace}"
+            )
+            try:
+                await asyncio.to_thread(write_json, data_dict, self._file_name)
+            except Exception:
+                await set_all_update_flags(self.namespace)
+                raise
+
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
         """
         Importance notes for in-memory storage:
@@ -133,13 +173,14 @@ class JsonDocStatusStorage(DocStatusStorage):
             for doc_id, doc_data in data.items():
                 if "chunks_list" not in doc_data:
                     doc_data["chunks_list"] = []
+                self._index_doc(doc_id, doc_data.get("status"))
             self._data.update(data)
             await set_all_update_flags(self.namespace)
 
         await self.index_done_callback()
 
     async def get_by_id(self, id: str) -> Union[dict[str, Any], None]:
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             return self._data.get(id)
 
     async def delete(self, doc_ids: list[str]) -> None:
@@ -161,6 +202,7 @@ class JsonDocStatusStorage(DocStatusStorage):
                 result = self._data.pop(doc_id, None)
                 if result is not None:
                     any_deleted = True
+                self._unindex_doc(doc_id)
 
             if any_deleted:
                 await set_all_update_flags(self.namespace)
@@ -181,6 +223,8 @@ class JsonDocStatusStorage(DocStatusStorage):
         try:
             async with self._storage_lock:
                 self._data.clear()
+                for index in self._status_index.values():
+                    index.clear()
                 await set_all_update_flags(self.namespace)
 
             await self.index_done_callback()
@@ -1,5 +1,7 @@
+import asyncio
 import os
 from dataclasses import dataclass
+from types import MappingProxyType
 from typing import Any, final
 
 from lightrag.base import (
@@ -12,7 +14,7 @@ from lightrag.utils import (
 )
 from .shared_storage import (
     get_namespace_data,
-    get_storage_lock,
+    get_namespace_storage_lock,
     get_data_init_lock,
     get_update_flag,
     set_all_update_flags,
@@ -21,6 +23,17 @@ from .shared_storage import (
 )
 
 
+def _normalize_record(key: str, value: Any) -> Any:
+    """Fill in the fields readers expect, done once on load instead of on every read"""
+    if isinstance(value, dict):
+        # Provide default time fields for old data
+        value.setdefault("create_time", 0)
+        value.setdefault("update_time", 0)
+        # Ensure _id field contains the clean ID
+        value["_id"] = key
+    return value
+
+
 @final
 @dataclass
 class JsonKVStorage(BaseKVStorage):
@@ -41,10 +54,20 @@ class JsonKVStorage(BaseKVStorage):
         self._data = None
         self._storage_lock = None
         self.storage_updated = None
+        # Serializes writes of this storage's file, taken before the storage lock
+        self._persist_lock = asyncio.Lock()
+        # Return read-only views of stored records instead of copying them,
+        # callers that modify a record must copy it first
+        self._read_views = self.global_config.get("kv_read_views", False)
+
+    def _view(self, record: dict[str, Any]) -> Any:
+        if self._read_views:
+            return MappingProxyType(record)
+        return dict(record)
 
     async def initialize(self):
         """Initialize storage data"""
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = await get_namespace_storage_lock(self.namespace)
         self.storage_updated = await get_update_flag(self.namespace)
         async with get_data_init_lock():
             # check need_init must before get_namespace_data
@@ -59,6 +82,8 @@ class JsonKVStorage(BaseKVStorage):
                             loaded_data
                         )
 
+                    for key, value in loaded_data.items():
+                        _normalize_record(key, value)
                     self._data.update(loaded_data)
                     data_count = len(loaded_data)
 
@@ -67,74 +92,58 @@ class JsonKVStorage(BaseKVStorage):
                     )
 
     async def index_done_callback(self) -> None:
-        async with self._storage_lock:
-            if self.storage_updated.value:
-                data_dict = (
-                    dict(self._data) if hasattr(self._data, "_getvalue") else self._data
-                )
-
-                # Calculate data count - all data is now flattened
-                data_count = len(data_dict)
-
-                logger.debug(
-                    f"Process {os.getpid()} KV writting {data_count} records to {self.namespace}"
-                )
-                write_json(data_dict, self._file_name)
+        async with self._persist_lock:
+            async with self._storage_lock:
+                if not self.storage_updated.value:
+                    return
+                # Snapshot under the lock (upserts replace values, so a shallow copy
+                # is enough), changes made after this set the flags again
+                data_dict = dict(self._data)
                 await clear_all_update_flags(self.namespace)
 
+            # Calculate data count - all data is now flattened
+            data_count = len(data_dict)
+
+            logger.debug(
+                f"Process {os.getpid()} KV writting {data_count} records to {self.namespace}"
+            )
+            try:
+                # Serialize and write in a worker thread to keep the event loop responsive
+                await asyncio.to_thread(write_json, data_dict, self._file_name)
+            except Exception:
+                await set_all_update_flags(self.namespace)
+                raise
+
     async def get_all(self) -> dict[str, Any]:
         """Get all data from storage
 
         Returns:
-            Dictionary containing all stored data
+            Dictionary containing all stored data, records are read-only views
+            when kv_read_views is enabled
         """
-        async with self._storage_lock:
-            result = {}
-            for key, value in self._data.items():
-                if value:
-                    # Create a copy to avoid modifying the original data
-                    data = dict(value)
-                    # Ensure time fields are present, provide default values for old data
-                    data.setdefault("create_time", 0)
-                    data.setdefault("update_time", 0)
-                    result[key] = data
-                else:
-                    result[key] = value
-            return result
+        async with self._storage_lock.reader():
+            return {
+                key: self._view(value) if value else value
+                for key, value in self._data.items()
+            }
 
     async def get_by_id(self, id: str) -> dict[str, Any] | None:
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             result = self._data.get(id)
             if result:
-                # Create a copy to avoid modifying the original data
-                result = dict(result)
-                # Ensure time fields are present, provide default values for old data
-                result.setdefault("create_time", 0)
-                result.setdefault("update_time", 0)
-                # Ensure _id field contains the clean ID
-                result["_id"] = id
+                result = self._view(result)
             return result
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             results = []
             for id in ids:
                 data = self._data.get(id, None)
-                if data:
-                    # Create a copy to avoid modifying the original data
-                    result = {k: v for k, v in data.items()}
-                    # Ensure time fields are present, provide default values for old data
-                    result.setdefault("create_time", 0)
-                    result.setdefault("update_time", 0)
-                    # Ensure _id field contains the clean ID
-                    result["_id"] = id
-                    results.append(result)
-                else:
-                    results.append(None)
+                results.append(self._view(data) if data else None)
             return results
 
     async def filter_keys(self, keys: set[str]) -> set[str]:
-        async with self._storage_lock:
+        async with self._storage_lock.reader():
             return set(keys) - set(self._data.keys())
 
     async def upsert(self, data: dict[str, dict[str, Any]]) -> None:
@@ -154,6 +163,10 @@ class JsonKVStorage(BaseKVStorage):
         async with self._storage_lock:
             # Add timestamps to data based on whether key exists
             for k, v in data.items():
+                # Records fetched as read-only views are copied before stamping
+                if not isinstance(v, dict):
+                    v = data[k] = dict(v)
+
                 # For text_chunks namespace, ensure llm_cache_list field exists
                 if "text_chunks" in self.namespace:
                     if "llm_cache_list" not in v:
@@ -321,6 +321,8 @@ class MongoDocStatusStorage(DocStatusStorage):
         if self.db is None:
             self.db = await ClientManager.get_client()
             self._data = await get_or_create_collection(self.db, self._collection_name)
+            # Status queries of the pipeline use this index instead of a collection scan
+            await self._data.create_index("status")
             logger.debug(f"Use MongoDB as DocStatus {self._collection_name}")
 
     async def finalize(self):
@@ -367,14 +369,15 @@ class MongoDocStatusStorage(DocStatusStorage):
         return counts
 
     async def get_docs_by_status(
-        self, status: DocStatus
+        self, status: DocStatus, include_content: bool = True
     ) -> dict[str, DocProcessingStatus]:
         """Get all documents with a specific status"""
-        cursor = self._data.find({"status": status.value})
+        projection = None if include_content else {"content": 0}
+        cursor = self._data.find({"status": status.value}, projection)
         result = await cursor.to_list()
         return {
             doc["_id"]: DocProcessingStatus(
-                content=doc["content"],
+                content=doc.get("content", ""),
                 content_summary=doc.get("content_summary"),
                 content_length=doc["content_length"],
                 status=doc["status"],
@@ -383,6 +386,7 @@ class MongoDocStatusStorage(DocStatusStorage):
                 chunks_count=doc.get("chunks_count", -1),
                 file_path=doc.get("file_path", doc["_id"]),
                 chunks_list=doc.get("chunks_list", []),
+                chunks_progress=doc.get("chunks_progress", {}),
             )
             for doc in result
         }
@@ -1,4 +1,5 @@
 import asyncio
+import base64
 import os
 from typing import Any, final
 from dataclasses import dataclass
@@ -8,6 +9,7 @@ import time
 from lightrag.utils import (
     logger,
     compute_mdhash_id,
+    write_json,
 )
 import pipmaster as pm
 from lightrag.base import BaseVectorStorage
@@ -17,7 +19,7 @@ if not pm.is_installed("nano-vectordb"):
 
 from nano_vectordb import NanoVectorDB
 from .shared_storage import (
-    get_storage_lock,
+    get_namespace_storage_lock,
     get_update_flag,
     set_all_update_flags,
 )
@@ -30,6 +32,8 @@ class NanoVectorDBStorage(BaseVectorStorage):
         # Initialize basic attributes
         self._client = None
         self._storage_lock = None
+        # Serializes writes of the client file, taken before the storage lock
+        self._persist_lock = asyncio.Lock()
         self.storage_updated = None
 
         # Use global config value if specified, otherwise use default
@@ -66,13 +70,17 @@ class NanoVectorDBStorage(BaseVectorStorage):
         # Get the update flag for cross-process update notification
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock(enable_logging=False)
+        self._storage_lock = await get_namespace_storage_lock(self.namespace)
 
     async def _get_client(self):
         """Check if the storage should be reloaded"""
-        # Acquire lock to prevent concurrent read and write
+        # Readers share the lock, only a reload needs it exclusively
+        async with self._storage_lock.reader():
+            if not self.storage_updated.value:
+                return self._client
+
         async with self._storage_lock:
-            # Check if data needs to be reloaded
+            # Re-check, another coroutine may have reloaded while we waited
             if self.storage_updated.value:
                 logger.info(
                     f"Process {os.getpid()} reloading {self.namespace} due to update by another process"
@@ -236,6 +244,31 @@ class NanoVectorDBStorage(BaseVectorStorage):
         except Exception as e:
             logger.error(f"Error deleting relations for {entity_name}: {e}")
 
+    def _snapshot_storage(self) -> dict[str, Any] | None:
+        """Copy the client's storage so it can be serialized while upserts continue
+
+        NanoVectorDB replaces data records on upsert but updates matrix rows in
+        place, so only the matrix needs a deep copy. Returns None if the client
+        does not expose its storage, the caller then falls back to client.save().
+        """
+        storage = getattr(self._client, "_NanoVectorDB__storage", None)
+        if storage is None:
+            return None
+        return {
+            **storage,
+            "data": list(storage["data"]),
+            "matrix": storage["matrix"].copy(),
+        }
+
+    @staticmethod
+    def _write_storage(storage: dict[str, Any], file_name: str):
+        """Write a storage snapshot in NanoVectorDB's file format, atomically"""
+        storage = {
+            **storage,
+            "matrix": base64.b64encode(storage["matrix"].tobytes()).decode(),
+        }
+        write_json(storage, file_name, indent=None)
+
     async def index_done_callback(self) -> bool:
         """Save data to disk"""
         async with self._storage_lock:
@@ -253,15 +286,22 @@ class NanoVectorDBStorage(BaseVectorStorage):
                 self.storage_updated.value = False
                 return False  # Return error
 
-        # Acquire lock and perform persistence
-        async with self._storage_lock:
+        async with self._persist_lock:
+            async with self._storage_lock:
+                storage = self._snapshot_storage()
             try:
                 # Save data to disk
-                self._client.save()
-                # Notify other processes that data has been updated
-                await set_all_update_flags(self.namespace)
-                # Reset own update flag to avoid self-reloading
-                self.storage_updated.value = False
+                if storage is None:
+                    self._client.save()
+                else:
+                    await asyncio.to_thread(
+                        self._write_storage, storage, self._client_file_name
+                    )
+                async with self._storage_lock:
+                    # Notify other processes that data has been updated
+                    await set_all_update_flags(self.namespace)
+                    # Reset own update flag to avoid self-reloading
+                    self.storage_updated.value = False
                 return True  # Return success
             except Exception as e:
                 logger.error(f"Error saving data for {self.namespace}: {e}")
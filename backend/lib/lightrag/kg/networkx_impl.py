@@ -1,9 +1,10 @@
+import asyncio
 import os
 from dataclasses import dataclass
 from typing import final
 
 from lightrag.types import KnowledgeGraph, KnowledgeGraphNode, KnowledgeGraphEdge
-from lightrag.utils import logger
+from lightrag.utils import atomic_write, logger
 from lightrag.base import BaseGraphStorage
 from lightrag.constants import GRAPH_FIELD_SEP
 
@@ -14,7 +15,7 @@ if not pm.is_installed("networkx"):
 
 import networkx as nx
 from .shared_storage import (
-    get_storage_lock,
+    get_namespace_storage_lock,
     get_update_flag,
     set_all_update_flags,
 )
@@ -41,7 +42,9 @@ class NetworkXStorage(BaseGraphStorage):
         logger.info(
             f"Writing graph with {graph.number_of_nodes()} nodes, {graph.number_of_edges()} edges"
         )
-        nx.write_graphml(graph, file_name)
+        atomic_write(
+            file_name, lambda tmp_file_name: nx.write_graphml(graph, tmp_file_name)
+        )
 
     def __post_init__(self):
         working_dir = self.global_config["working_dir"]
@@ -60,6 +63,8 @@ class NetworkXStorage(BaseGraphStorage):
         self._storage_lock = None
         self.storage_updated = None
         self._graph = None
+        # Serializes writes of the graph file, taken before the storage lock
+        self._persist_lock = asyncio.Lock()
 
         # Load initial graph
         preloaded_graph = NetworkXStorage.load_nx_graph(self._graphml_xml_file)
@@ -76,13 +81,17 @@ class NetworkXStorage(BaseGraphStorage):
         # Get the update flag for cross-process update notification
         self.storage_updated = await get_update_flag(self.namespace)
         # Get the storage lock for use in other methods
-        self._storage_lock = get_storage_lock()
+        self._storage_lock = await get_namespace_storage_lock(self.namespace)
 
     async def _get_graph(self):
         """Check if the storage should be reloaded"""
-        # Acquire lock to prevent concurrent read and write
+        # Readers share the lock, only a reload needs it exclusively
+        async with self._storage_lock.reader():
+            if not self.storage_updated.value:
+                return self._graph
+
         async with self._storage_lock:
-            # Check if data needs to be reloaded
+            # Re-check, another coroutine may have reloaded while we waited
             if self.storage_updated.value:
                 logger.info(
                     f"Process {os.getpid()} reloading graph {self.namespace} due to update by another process"
@@ -415,15 +424,20 @@ class NetworkXStorage(BaseGraphStorage):
                 self.storage_updated.value = False
                 return False  # Return error
 
-        # Acquire lock and perform persistence
-        async with self._storage_lock:
+        async with self._persist_lock:
+            # Copy the graph under the lock, GraphML serialization runs in a worker thread
+            async with self._storage_lock:
+                graph = self._graph.copy()
             try:
                 # Save data to disk
-                NetworkXStorage.write_nx_graph(self._graph, self._graphml_xml_file)
-                # Notify other processes that data has been updated
-                await set_all_update_flags(self.namespace)
-                # Reset own update flag to avoid self-reloading
-                self.storage_updated.value = False
+                await asyncio.to_thread(
+                    NetworkXStorage.write_nx_graph, graph, self._graphml_xml_file
+                )
+                async with self._storage_lock:
+                    # Notify other processes that data has been updated
+                    await set_all_update_flags(self.namespace)
+                    # Reset own update flag to avoid self-reloading
+                    self.storage_updated.value = False
                 return True  # Return success
             except Exception as e:
                 logger.error(f"Error saving graph for {self.namespace}: {e}")
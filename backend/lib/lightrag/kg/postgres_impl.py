@@ -55,6 +55,8 @@ class PostgreSQLDB:
         self.database = config["database"]
         self.workspace = config["workspace"]
         self.max = int(config["max_connections"])
+        # Rows sent per executemany call by the bulk upserts
+        self.batch_size = int(config.get("batch_size") or 1000)
         self.increment = 1
         self.pool: Pool | None = None
 
@@ -110,7 +112,7 @@ class PostgreSQLDB:
         try:
             # Check if chunk_id column exists
             check_column_sql = """
-            SELECT column_name
+            SELECT column_name, data_type
             FROM information_schema.columns
             WHERE table_name = 'lightrag_llm_cache'
             AND column_name = 'chunk_id'
@@ -121,12 +123,20 @@ class PostgreSQLDB:
                 logger.info("Adding chunk_id column to LIGHTRAG_LLM_CACHE table")
                 add_column_sql = """
                 ALTER TABLE LIGHTRAG_LLM_CACHE
-                ADD COLUMN chunk_id VARCHAR(255) NULL
+                ADD COLUMN chunk_id TEXT NULL
                 """
                 await self.execute(add_column_sql)
                 logger.info(
                     "Successfully added chunk_id column to LIGHTRAG_LLM_CACHE table"
                 )
+            elif column_info.get("data_type") == "character varying":
+                # Packed extraction requests store several chunk IDs in chunk_id
+                logger.info("Widening chunk_id column of LIGHTRAG_LLM_CACHE table")
+                alter_column_sql = """
+                ALTER TABLE LIGHTRAG_LLM_CACHE
+                ALTER COLUMN chunk_id TYPE TEXT
+                """
+                await self.execute(alter_column_sql)
             else:
                 logger.info(
                     "chunk_id column already exists in LIGHTRAG_LLM_CACHE table"
@@ -439,6 +449,39 @@ class PostgreSQLDB:
                 f"Failed to add chunks_list column to LIGHTRAG_DOC_STATUS: {e}"
             )
 
+    async def _migrate_doc_status_add_chunks_progress(self):
+        """Add chunks_progress column to LIGHTRAG_DOC_STATUS table if it doesn't exist"""
+        try:
+            # Check if chunks_progress column exists
+            check_column_sql = """
+            SELECT column_name
+            FROM information_schema.columns
+            WHERE table_name = 'lightrag_doc_status'
+            AND column_name = 'chunks_progress'
+            """
+
+            column_info = await self.query(check_column_sql)
+            if not column_info:
+                logger.info(
+                    "Adding chunks_progress column to LIGHTRAG_DOC_STATUS table"
+                )
+                add_column_sql = """
+                ALTER TABLE LIGHTRAG_DOC_STATUS
+                ADD COLUMN chunks_progress JSONB NULL DEFAULT '{}'::jsonb
+                """
+                await self.execute(add_column_sql)
+                logger.info(
+                    "Successfully added chunks_progress column to LIGHTRAG_DOC_STATUS table"
+                )
+            else:
+                logger.info(
+                    "chunks_progress column already exists in LIGHTRAG_DOC_STATUS table"
+                )
+        except Exception as e:
+            logger.warning(
+                f"Failed to add chunks_progress column to LIGHTRAG_DOC_STATUS: {e}"
+            )
+
     async def _migrate_text_chunks_add_llm_cache_list(self):
         """Add llm_cache_list column to LIGHTRAG_DOC_CHUNKS table if it doesn't exist"""
         try:
@@ -574,6 +617,14 @@ class PostgreSQLDB:
                 f"PostgreSQL, Failed to migrate doc status chunks_list field: {e}"
             )
 
+        # Migrate doc status to add chunks_progress field if needed
+        try:
+            await self._migrate_doc_status_add_chunks_progress()
+        except Exception as e:
+            logger.error(
+                f"PostgreSQL, Failed to migrate doc status chunks_progress field: {e}"
+            )
+
         # Migrate text chunks to add llm_cache_list field if needed
         try:
             await self._migrate_text_chunks_add_llm_cache_list()
@@ -664,6 +715,34 @@ class PostgreSQLDB:
             logger.error(f"PostgreSQL database,\nsql:{sql},\ndata:{data},\nerror:{e}")
             raise
 
+    async def executemany(
+        self,
+        sql: str,
+        data_list: list[dict[str, Any]],
+        batch_size: int | None = None,
+    ) -> None:
+        """Run one statement for many parameter sets in batches of `batch_size` rows
+
+        asyncpg pipelines the rows of an executemany call, so a batch costs one
+        round trip instead of one per row. Each batch runs in its own transaction.
+        """
+        if not data_list:
+            return
+        batch_size = batch_size or self.batch_size
+        try:
+            async with self.pool.acquire() as connection:  # type: ignore
+                for i in range(0, len(data_list), batch_size):
+                    batch = data_list[i : i + batch_size]
+                    async with connection.transaction():
+                        await connection.executemany(
+                            sql, [tuple(data.values()) for data in batch]
+                        )
+        except Exception as e:
+            logger.error(
+                f"PostgreSQL database,\nsql:{sql},\nrows:{len(data_list)},\nerror:{e}"
+            )
+            raise
+
 
 class ClientManager:
     _instances: dict[str, Any] = {"db": None, "ref_count": 0}
@@ -701,6 +780,10 @@ class ClientManager:
                 "POSTGRES_MAX_CONNECTIONS",
                 config.get("postgres", "max_connections", fallback=20),
             ),
+            "batch_size": os.environ.get(
+                "POSTGRES_BATCH_SIZE",
+                config.get("postgres", "batch_size", fallback=1000),
+            ),
         }
 
     @classmethod
@@ -940,9 +1023,9 @@ class PGKVStorage(BaseKVStorage):
 
         if is_namespace(self.namespace, NameSpace.KV_STORE_TEXT_CHUNKS):
             current_time = datetime.datetime.now(timezone.utc)
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_text_chunk"]
-                _data = {
+            upsert_sql = SQL_TEMPLATES["upsert_text_chunk"]
+            rows = [
+                {
                     "workspace": self.db.workspace,
                     "id": k,
                     "tokens": v["tokens"],
@@ -954,20 +1037,22 @@ class PGKVStorage(BaseKVStorage):
                     "create_time": current_time,
                     "update_time": current_time,
                 }
-                await self.db.execute(upsert_sql, _data)
+                for k, v in data.items()
+            ]
         elif is_namespace(self.namespace, NameSpace.KV_STORE_FULL_DOCS):
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
-                _data = {
+            upsert_sql = SQL_TEMPLATES["upsert_doc_full"]
+            rows = [
+                {
                     "id": k,
                     "content": v["content"],
                     "workspace": self.db.workspace,
                 }
-                await self.db.execute(upsert_sql, _data)
+                for k, v in data.items()
+            ]
         elif is_namespace(self.namespace, NameSpace.KV_STORE_LLM_RESPONSE_CACHE):
-            for k, v in data.items():
-                upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
-                _data = {
+            upsert_sql = SQL_TEMPLATES["upsert_llm_response_cache"]
+            rows = [
+                {
                     "workspace": self.db.workspace,
                     "id": k,  # Use flattened key as id
                     "original_prompt": v["original_prompt"],
@@ -978,8 +1063,12 @@ class PGKVStorage(BaseKVStorage):
                         "cache_type", "extract"
                     ),  # Get cache_type from data
                 }
+                for k, v in data.items()
+            ]
+        else:
+            return
 
-                await self.db.execute(upsert_sql, _data)
+        await self.db.executemany(upsert_sql, rows)
 
     async def index_done_callback(self) -> None:
         # PG handles persistence automatically
@@ -1198,17 +1287,23 @@ class PGVectorStorage(BaseVectorStorage):
         embeddings = np.concatenate(embeddings_list)
         for i, d in enumerate(list_data):
             d["__vector__"] = embeddings[i]
+
+        if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
+            prepare = self._upsert_chunks
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
+            prepare = self._upsert_entities
+        elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
+            prepare = self._upsert_relationships
+        else:
+            raise ValueError(f"{self.namespace} is not supported")
+
+        rows = []
         for item in list_data:
-            if is_namespace(self.namespace, NameSpace.VECTOR_STORE_CHUNKS):
-                upsert_sql, data = self._upsert_chunks(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_ENTITIES):
-                upsert_sql, data = self._upsert_entities(item, current_time)
-            elif is_namespace(self.namespace, NameSpace.VECTOR_STORE_RELATIONSHIPS):
-                upsert_sql, data = self._upsert_relationships(item, current_time)
-            else:
-                raise ValueError(f"{self.namespace} is not supported")
+            upsert_sql, row = prepare(item, current_time)
+            rows.append(row)
 
-            await self.db.execute(upsert_sql, data)
+        # One pipelined executemany per batch instead of a round trip per row
+        await self.db.executemany(upsert_sql, rows)
 
     #################### query method ###############
     async def query(
@@ -1369,6 +1464,16 @@ class PGVectorStorage(BaseVectorStorage):
             return {"status": "error", "message": str(e)}
 
 
+def _parse_chunks_progress(chunks_progress: Any) -> dict[str, str]:
+    """Parse chunks_progress JSONB value, which may be returned as a JSON string"""
+    if isinstance(chunks_progress, str):
+        try:
+            chunks_progress = json.loads(chunks_progress)
+        except json.JSONDecodeError:
+            chunks_progress = {}
+    return chunks_progress if isinstance(chunks_progress, dict) else {}
+
+
 @final
 @dataclass
 class PGDocStatusStorage(DocStatusStorage):
@@ -1432,6 +1537,7 @@ class PGDocStatusStorage(DocStatusStorage):
                     chunks_list = json.loads(chunks_list)
                 except json.JSONDecodeError:
                     chunks_list = []
+            chunks_progress = _parse_chunks_progress(result[0].get("chunks_progress"))
 
             return dict(
                 content=result[0]["content"],
@@ -1443,6 +1549,7 @@ class PGDocStatusStorage(DocStatusStorage):
                 updated_at=result[0]["updated_at"],
                 file_path=result[0]["file_path"],
                 chunks_list=chunks_list,
+                chunks_progress=chunks_progress,
             )
 
     async def get_by_ids(self, ids: list[str]) -> list[dict[str, Any]]:
@@ -1467,6 +1574,7 @@ class PGDocStatusStorage(DocStatusStorage):
                     chunks_list = json.loads(chunks_list)
                 except json.JSONDecodeError:
                     chunks_list = []
+            chunks_progress = _parse_chunks_progress(row.get("chunks_progress"))
 
             processed_results.append(
                 {
@@ -1479,6 +1587,7 @@ class PGDocStatusStorage(DocStatusStorage):
                     "updated_at": row["updated_at"],
                     "file_path": row["file_path"],
                     "chunks_list": chunks_list,
+                    "chunks_progress": chunks_progress,
                 }
             )
 
@@ -1497,10 +1606,15 @@ class PGDocStatusStorage(DocStatusStorage):
         return counts
 
     async def get_docs_by_status(
-        self, status: DocStatus
+        self, status: DocStatus, include_content: bool = True
     ) -> dict[str, DocProcessingStatus]:
         """all documents with a specific status"""
-        sql = "select * from LIGHTRAG_DOC_STATUS where workspace=$1 and status=$2"
+        if include_content:
+            sql = "select * from LIGHTRAG_DOC_STATUS where workspace=$1 and status=$2"
+        else:
+            sql = """select id, '' as content, content_summary, content_length, chunks_count,
+                     status, file_path, chunks_list, chunks_progress, created_at, updated_at
+                     from LIGHTRAG_DOC_STATUS where workspace=$1 and status=$2"""
         params = {"workspace": self.db.workspace, "status": status.value}
         result = await self.db.query(sql, params, True)
 
@@ -1513,6 +1627,7 @@ class PGDocStatusStorage(DocStatusStorage):
                     chunks_list = json.loads(chunks_list)
                 except json.JSONDecodeError:
                     chunks_list = []
+            chunks_progress = _parse_chunks_progress(element.get("chunks_progress"))
 
             docs_by_status[element["id"]] = DocProcessingStatus(
                 content=element["content"],
@@ -1524,6 +1639,7 @@ class PGDocStatusStorage(DocStatusStorage):
                 chunks_count=element["chunks_count"],
                 file_path=element["file_path"],
                 chunks_list=chunks_list,
+                chunks_progress=chunks_progress,
             )
 
         return docs_by_status
@@ -1591,8 +1707,8 @@ class PGDocStatusStorage(DocStatusStorage):
 
         # Modified SQL to include created_at, updated_at, and chunks_list in both INSERT and UPDATE operations
         # All fields are updated from the input data in both INSERT and UPDATE cases
-        sql = """insert into LIGHTRAG_DOC_STATUS(workspace,id,content,content_summary,content_length,chunks_count,status,file_path,chunks_list,created_at,updated_at)
-                 values($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11)
+        sql = """insert into LIGHTRAG_DOC_STATUS(workspace,id,content,content_summary,content_length,chunks_count,status,file_path,chunks_list,chunks_progress,created_at,updated_at)
+                 values($1,$2,$3,$4,$5,$6,$7,$8,$9,$10,$11,$12)
                   on conflict(id,workspace) do update set
                   content = EXCLUDED.content,
                   content_summary = EXCLUDED.content_summary,
@@ -1601,6 +1717,7 @@ class PGDocStatusStorage(DocStatusStorage):
                   status = EXCLUDED.status,
                   file_path = EXCLUDED.file_path,
                   chunks_list = EXCLUDED.chunks_list,
+                  chunks_progress = EXCLUDED.chunks_progress,
                   created_at = EXCLUDED.created_at,
                   updated_at = EXCLUDED.updated_at"""
         for k, v in data.items():
@@ -1621,6 +1738,7 @@ class PGDocStatusStorage(DocStatusStorage):
                     "status": v["status"],
                     "file_path": v["file_path"],
                     "chunks_list": json.dumps(v.get("chunks_list", [])),
+                    "chunks_progress": json.dumps(v.get("chunks_progress") or {}),
                     "created_at": created_at,  # Use the converted datetime object
                     "updated_at": updated_at,  # Use the converted datetime object
                 },
@@ -2064,6 +2182,16 @@ class PGGraphStorage(BaseGraphStorage):
             node_id: The unique identifier for the node (used as label)
             node_data: Dictionary of node properties
         """
+        query = self._upsert_node_query(node_id, node_data)
+
+        try:
+            await self._query(query, readonly=False, upsert=True)
+
+        except Exception:
+            logger.error(f"POSTGRES, upsert_node error on node_id: `{node_id}`")
+            raise
+
+    def _upsert_node_query(self, node_id: str, node_data: dict[str, str]) -> str:
         if "entity_id" not in node_data:
             raise ValueError(
                 "PostgreSQL: node properties must contain an 'entity_id' field"
@@ -2072,7 +2200,7 @@ class PGGraphStorage(BaseGraphStorage):
         label = self._normalize_node_id(node_id)
         properties = self._format_properties(node_data)
 
-        query = """SELECT * FROM cypher('%s', $$
+        return """SELECT * FROM cypher('%s', $$
                      MERGE (n:base {entity_id: "%s"})
                      SET n += %s
                      RETURN n
@@ -2082,11 +2210,64 @@ class PGGraphStorage(BaseGraphStorage):
             properties,
         )
 
-        try:
-            await self._query(query, readonly=False, upsert=True)
+    def _upsert_edge_query(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ) -> str:
+        src_label = self._normalize_node_id(source_node_id)
+        tgt_label = self._normalize_node_id(target_node_id)
+        edge_properties = self._format_properties(edge_data)
+
+        return """SELECT * FROM cypher('%s', $$
+                     MATCH (source:base {entity_id: "%s"})
+                     WITH source
+                     MATCH (target:base {entity_id: "%s"})
+                     MERGE (source)-[r:DIRECTED]-(target)
+                     SET r += %s
+                     SET r += %s
+                     RETURN r
+                   $$) AS (r agtype)""" % (
+            self.graph_name,
+            src_label,
+            tgt_label,
+            edge_properties,
+            edge_properties,  # https://github.com/HKUDS/LightRAG/issues/1438#issuecomment-2826000195
+        )
+
+    async def _execute_batched(self, queries: list[str]) -> None:
+        """Send cypher statements as multi-statement strings of db.batch_size
+        statements, one round trip and one implicit transaction per batch"""
+        batch_size = self.db.batch_size
+        for i in range(0, len(queries), batch_size):
+            await self._query(
+                ";\n".join(queries[i : i + batch_size]), readonly=False, upsert=True
+            )
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        """
+        Upsert several nodes with one round trip per batch.
+
+        AGE has no parameterized UNWIND of property maps, so the MERGE
+        statements of upsert_node are sent together as one multi-statement query.
+
+        Args:
+            nodes: Dictionary mapping node_id to its node properties
+        """
+        if not nodes:
+            return
+
+        queries = [
+            self._upsert_node_query(node_id, node_data)
+            for node_id, node_data in nodes.items()
+        ]
+        try:
+            await self._execute_batched(queries)
         except Exception:
-            logger.error(f"POSTGRES, upsert_node error on node_id: `{node_id}`")
+            logger.error(f"POSTGRES, upsert_nodes_batch error on {len(nodes)} nodes")
             raise
 
     @retry(
@@ -2105,25 +2286,7 @@ class PGGraphStorage(BaseGraphStorage):
             target_node_id (str): Label of the target node (used as identifier)
             edge_data (dict): dictionary of properties to set on the edge
         """
-        src_label = self._normalize_node_id(source_node_id)
-        tgt_label = self._normalize_node_id(target_node_id)
-        edge_properties = self._format_properties(edge_data)
-
-        query = """SELECT * FROM cypher('%s', $$
-                     MATCH (source:base {entity_id: "%s"})
-                     WITH source
-                     MATCH (target:base {entity_id: "%s"})
-                     MERGE (source)-[r:DIRECTED]-(target)
-                     SET r += %s
-                     SET r += %s
-                     RETURN r
-                   $$) AS (r agtype)""" % (
-            self.graph_name,
-            src_label,
-            tgt_label,
-            edge_properties,
-            edge_properties,  # https://github.com/HKUDS/LightRAG/issues/1438#issuecomment-2826000195
-        )
+        query = self._upsert_edge_query(source_node_id, target_node_id, edge_data)
 
         try:
             await self._query(query, readonly=False, upsert=True)
@@ -2134,6 +2297,33 @@ class PGGraphStorage(BaseGraphStorage):
             )
             raise
 
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=4, max=10),
+        retry=retry_if_exception_type((PGGraphQueryException,)),
+    )
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        """
+        Upsert several edges with one round trip per batch.
+
+        Args:
+            edges: Dictionary mapping (source_node_id, target_node_id) to edge properties
+        """
+        if not edges:
+            return
+
+        queries = [
+            self._upsert_edge_query(src_id, tgt_id, edge_data)
+            for (src_id, tgt_id), edge_data in edges.items()
+        ]
+        try:
+            await self._execute_batched(queries)
+        except Exception:
+            logger.error(f"POSTGRES, upsert_edges_batch error on {len(edges)} edges")
+            raise
+
     async def delete_node(self, node_id: str) -> None:
         """
         Delete a node from the graph.
@@ -3051,7 +3241,7 @@ TABLES = {
 	                mode varchar(32) NOT NULL,
                     original_prompt TEXT,
                     return_value TEXT,
-                    chunk_id VARCHAR(255) NULL,
+                    chunk_id TEXT NULL,
                     create_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     update_time TIMESTAMP,
 	                CONSTRAINT LIGHTRAG_LLM_CACHE_PK PRIMARY KEY (workspace, mode, id)
@@ -3068,6 +3258,7 @@ TABLES = {
 	               status varchar(64) NULL,
 	               file_path TEXT NULL,
 	               chunks_list JSONB NULL DEFAULT '[]'::jsonb,
+	               chunks_progress JSONB NULL DEFAULT '{}'::jsonb,
 	               created_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP NULL,
 	               updated_at timestamp with time zone DEFAULT CURRENT_TIMESTAMP NULL,
 	               CONSTRAINT LIGHTRAG_DOC_STATUS_PK PRIMARY KEY (workspace, id)
@@ -3213,9 +3404,9 @@ SQL_TEMPLATES = {
             FROM LIGHTRAG_VDB_CHUNKS
             WHERE $2::varchar[] IS NULL OR full_doc_id = ANY($2::varchar[])
         )
-        SELECT id, content, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
+        SELECT id, content, tokens, file_path, EXTRACT(EPOCH FROM create_time)::BIGINT as created_at FROM
             (
-                SELECT id, content, file_path, create_time, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
+                SELECT id, content, tokens, file_path, create_time, 1 - (content_vector <=> '[{embedding_string}]'::vector) as distance
                 FROM LIGHTRAG_VDB_CHUNKS
                 WHERE workspace=$1
                 AND id IN (SELECT chunk_id FROM relevant_chunks)
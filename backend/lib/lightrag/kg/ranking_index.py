@@ -0,0 +1,388 @@
+"""
+Materialized per-entity rankings for local queries.
+
+Every local query derives the same data from the graph: an entity's degree,
+its edges ordered by (edge degree, weight) and its chunks ordered by how many
+one-hop neighbours cite them. None of it changes until the graph does.
+RankingIndexGraphStorage wraps a BaseGraphStorage, keeps these rankings per
+entity, and on every write drops the touched entities together with the
+entities whose rankings were computed from them. merge_nodes_and_edges
+rebuilds the merged entities right after writing them, so queries mostly
+look rankings up instead of reading and sorting neighbourhoods. Writes also
+set an update flag for every other process, which then drops its whole index
+before the next read.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from lightrag.base import BaseGraphStorage
+from lightrag.constants import GRAPH_FIELD_SEP
+from lightrag.types import KnowledgeGraph
+from lightrag.utils import logger, split_string_by_multi_markers
+
+from .shared_storage import get_update_flag, set_other_update_flags
+
+
+@dataclass
+class RankedEdge:
+    src_tgt: tuple[str, str]
+    rank: int
+    """Edge degree, the sum of both endpoint degrees"""
+    weight: float
+    tokens: int
+    """Token count of the description"""
+    data: dict[str, Any]
+
+
+@dataclass
+class EntityRanking:
+    node: dict[str, Any]
+    degree: int
+    tokens: int
+    """Token count of the description"""
+    edges: list[RankedEdge]
+    """Edges by (rank, weight), highest first"""
+    chunks: list[tuple[str, int]]
+    """(chunk_id, relation_counts) with the chunks cited by most neighbours first"""
+    neighbours: frozenset[str]
+
+
+def _description_tokens(data: dict[str, Any], tokenizer) -> int:
+    count = data.get("description_tokens")
+    if count is not None and count != "":
+        try:
+            return int(count)
+        except (TypeError, ValueError):
+            pass
+    return tokenizer.count_tokens(data.get("description") or "")
+
+
+class RankingIndexGraphStorage(BaseGraphStorage):
+    """BaseGraphStorage wrapper keeping a ranking index of the entities queried or merged
+
+    Rankings handed out are shared, callers must not modify them. Attributes
+    not defined here are forwarded to the wrapped storage.
+    """
+
+    def __init__(self, storage: BaseGraphStorage, max_entities: int):
+        self.storage = storage
+        self.namespace = storage.namespace
+        self.workspace = storage.workspace
+        self.global_config = storage.global_config
+        self.embedding_func = storage.embedding_func
+        self.max_entities = max_entities
+        self._entries: OrderedDict[str, EntityRanking] = OrderedDict()
+        # entity -> indexed entities whose ranking was computed from it
+        self._dependants: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+        self._index_updated = None
+        # Bumped by every write, rankings built while a write happened are not kept
+        self._generation = 0
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes missing on the wrapper
+        storage = self.__dict__.get("storage")
+        if storage is None:
+            raise AttributeError(name)
+        return getattr(storage, name)
+
+    @property
+    def _flag_namespace(self) -> str:
+        return f"{self.workspace}_{self.namespace}_ranking_index"
+
+    def _clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._dependants.clear()
+            self._generation += 1
+
+    def _check_updates(self) -> None:
+        """Drop the index if another process wrote to the graph"""
+        if self._index_updated is not None and self._index_updated.value:
+            logger.debug(
+                f"Ranking index for {self.namespace} cleared after an update by another process"
+            )
+            self._clear()
+            self._index_updated.value = False
+
+    def _drop_entry(self, node_id: str) -> None:
+        entry = self._entries.pop(node_id, None)
+        if entry is None:
+            return
+        for neighbour in entry.neighbours:
+            dependants = self._dependants.get(neighbour)
+            if dependants is not None:
+                dependants.discard(node_id)
+                if not dependants:
+                    del self._dependants[neighbour]
+
+    def _put_entry(self, node_id: str, entry: EntityRanking) -> None:
+        self._drop_entry(node_id)
+        self._entries[node_id] = entry
+        for neighbour in entry.neighbours:
+            self._dependants.setdefault(neighbour, set()).add(node_id)
+        while len(self._entries) > self.max_entities:
+            self._drop_entry(next(iter(self._entries)))
+
+    async def _invalidate(self, node_ids) -> None:
+        """Drop the rankings of nodes whose data, degree or edges changed"""
+        with self._lock:
+            self._generation += 1
+            for node_id in node_ids:
+                self._drop_entry(node_id)
+                for dependant in self._dependants.pop(node_id, ()):
+                    self._drop_entry(dependant)
+        if self._index_updated is not None:
+            # This process's index was invalidated precisely above
+            await set_other_update_flags(self._flag_namespace, self._index_updated)
+
+    async def _build(self, node_ids: list[str]) -> dict[str, EntityRanking]:
+        """Compute the rankings of existing nodes with a few batch reads"""
+        tokenizer = self.global_config.get("tokenizer")
+        node_edges = await self.storage.get_nodes_edges_batch(node_ids)
+        related = set(node_ids)
+        edge_keys = {}
+        for node_id in node_ids:
+            for edge in node_edges.get(node_id) or []:
+                related.add(edge[1])
+                edge_keys.setdefault(tuple(sorted(edge)), None)
+
+        related = list(related)
+        nodes, degrees, edge_datas = await asyncio.gather(
+            self.storage.get_nodes_batch(related),
+            self.storage.node_degrees_batch(related),
+            self.storage.get_edges_batch(
+                [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in edge_keys]
+            ),
+        )
+
+        ranked_edges = {}
+        for pair in edge_keys:
+            edge_data = edge_datas.get(pair)
+            if edge_data is None:
+                continue
+            if "weight" not in edge_data:
+                logger.warning(
+                    f"Edge {pair} missing 'weight' attribute, using default value 0.0"
+                )
+            weight = edge_data.get("weight", 0.0)
+            ranked_edges[pair] = RankedEdge(
+                src_tgt=pair,
+                rank=degrees.get(pair[0], 0) + degrees.get(pair[1], 0),
+                weight=weight,
+                tokens=_description_tokens(edge_data, tokenizer),
+                data={**edge_data, "weight": weight},
+            )
+
+        chunk_sets = {
+            node_id: set(
+                split_string_by_multi_markers(node["source_id"], [GRAPH_FIELD_SEP])
+            )
+            for node_id, node in nodes.items()
+            if node is not None and "source_id" in node
+        }
+
+        rankings = {}
+        for node_id in node_ids:
+            node = nodes.get(node_id)
+            if node is None:
+                continue
+            this_edges = node_edges.get(node_id) or []
+
+            edges = []
+            seen_edges = set()
+            for edge in this_edges:
+                pair = tuple(sorted(edge))
+                if pair not in seen_edges and pair in ranked_edges:
+                    seen_edges.add(pair)
+                    edges.append(ranked_edges[pair])
+            edges.sort(key=lambda e: (e.rank, e.weight), reverse=True)
+
+            chunks = []
+            if node.get("source_id") is not None:
+                seen_chunks = set()
+                for c_id in split_string_by_multi_markers(
+                    node["source_id"], [GRAPH_FIELD_SEP]
+                ):
+                    if c_id in seen_chunks:
+                        continue
+                    seen_chunks.add(c_id)
+                    relation_counts = sum(
+                        1 for e in this_edges if c_id in chunk_sets.get(e[1], ())
+                    )
+                    chunks.append((c_id, relation_counts))
+                chunks.sort(key=lambda c: -c[1])
+
+            rankings[node_id] = EntityRanking(
+                node=node,
+                degree=degrees.get(node_id, 0),
+                tokens=_description_tokens(node, tokenizer),
+                edges=edges,
+                chunks=chunks,
+                neighbours=frozenset(e[1] for e in this_edges) | {node_id},
+            )
+        return rankings
+
+    async def entity_rankings(self, node_ids: list[str]) -> dict[str, EntityRanking]:
+        """Rankings of the given entities, built and indexed for the ones not indexed yet
+
+        Nodes missing from the graph are left out of the result.
+        """
+        self._check_updates()
+        result = {}
+        missing = []
+        with self._lock:
+            for node_id in node_ids:
+                entry = self._entries.get(node_id)
+                if entry is None:
+                    missing.append(node_id)
+                else:
+                    self._entries.move_to_end(node_id)
+                    result[node_id] = entry
+        if missing:
+            generation = self._generation
+            built = await self._build(missing)
+            with self._lock:
+                if generation == self._generation:
+                    for node_id, entry in built.items():
+                        self._put_entry(node_id, entry)
+            result.update(built)
+        return result
+
+    async def initialize(self):
+        await self.storage.initialize()
+        self._index_updated = await get_update_flag(self._flag_namespace)
+
+    async def finalize(self):
+        self._clear()
+        await self.storage.finalize()
+
+    async def index_done_callback(self) -> None:
+        await self.storage.index_done_callback()
+
+    async def drop(self) -> dict[str, str]:
+        result = await self.storage.drop()
+        self._clear()
+        await self._invalidate([])
+        return result
+
+    async def has_node(self, node_id: str) -> bool:
+        return await self.storage.has_node(node_id)
+
+    async def has_edge(self, source_node_id: str, target_node_id: str) -> bool:
+        return await self.storage.has_edge(source_node_id, target_node_id)
+
+    async def node_degree(self, node_id: str) -> int:
+        return await self.storage.node_degree(node_id)
+
+    async def edge_degree(self, src_id: str, tgt_id: str) -> int:
+        return await self.storage.edge_degree(src_id, tgt_id)
+
+    async def get_node(self, node_id: str) -> dict[str, str] | None:
+        return await self.storage.get_node(node_id)
+
+    async def get_edge(
+        self, source_node_id: str, target_node_id: str
+    ) -> dict[str, str] | None:
+        return await self.storage.get_edge(source_node_id, target_node_id)
+
+    async def get_node_edges(self, source_node_id: str) -> list[tuple[str, str]] | None:
+        return await self.storage.get_node_edges(source_node_id)
+
+    async def get_nodes_batch(self, node_ids: list[str]) -> dict[str, dict]:
+        return await self.storage.get_nodes_batch(node_ids)
+
+    async def node_degrees_batch(self, node_ids: list[str]) -> dict[str, int]:
+        return await self.storage.node_degrees_batch(node_ids)
+
+    async def edge_degrees_batch(
+        self, edge_pairs: list[tuple[str, str]]
+    ) -> dict[tuple[str, str], int]:
+        return await self.storage.edge_degrees_batch(edge_pairs)
+
+    async def get_edges_batch(
+        self, pairs: list[dict[str, str]]
+    ) -> dict[tuple[str, str], dict]:
+        return await self.storage.get_edges_batch(pairs)
+
+    async def get_nodes_edges_batch(
+        self, node_ids: list[str]
+    ) -> dict[str, list[tuple[str, str]]]:
+        return await self.storage.get_nodes_edges_batch(node_ids)
+
+    async def get_nodes_by_chunk_ids(self, chunk_ids: list[str]) -> list[dict]:
+        return await self.storage.get_nodes_by_chunk_ids(chunk_ids)
+
+    async def get_edges_by_chunk_ids(self, chunk_ids: list[str]) -> list[dict]:
+        return await self.storage.get_edges_by_chunk_ids(chunk_ids)
+
+    async def upsert_node(self, node_id: str, node_data: dict[str, str]) -> None:
+        try:
+            await self.storage.upsert_node(node_id, node_data)
+        finally:
+            await self._invalidate([node_id])
+
+    async def upsert_edge(
+        self, source_node_id: str, target_node_id: str, edge_data: dict[str, str]
+    ) -> None:
+        try:
+            await self.storage.upsert_edge(source_node_id, target_node_id, edge_data)
+        finally:
+            await self._invalidate([source_node_id, target_node_id])
+
+    async def upsert_nodes_batch(self, nodes: dict[str, dict[str, str]]) -> None:
+        try:
+            await self.storage.upsert_nodes_batch(nodes)
+        finally:
+            await self._invalidate(nodes)
+
+    async def upsert_edges_batch(
+        self, edges: dict[tuple[str, str], dict[str, str]]
+    ) -> None:
+        try:
+            await self.storage.upsert_edges_batch(edges)
+        finally:
+            await self._invalidate({node_id for pair in edges for node_id in pair})
+
+    async def _with_neighbours(self, node_ids: list[str]) -> set[str]:
+        """Removed nodes and their neighbours, whose degrees change with the removal"""
+        affected = set(node_ids)
+        node_edges = await self.storage.get_nodes_edges_batch(node_ids)
+        for edges in node_edges.values():
+            for edge in edges or []:
+                affected.update(edge)
+        return affected
+
+    async def delete_node(self, node_id: str) -> None:
+        affected = await self._with_neighbours([node_id])
+        try:
+            await self.storage.delete_node(node_id)
+        finally:
+            await self._invalidate(affected)
+
+    async def remove_nodes(self, nodes: list[str]):
+        affected = await self._with_neighbours(nodes)
+        try:
+            await self.storage.remove_nodes(nodes)
+        finally:
+            await self._invalidate(affected)
+
+    async def remove_edges(self, edges: list[tuple[str, str]]):
+        try:
+            await self.storage.remove_edges(edges)
+        finally:
+            await self._invalidate({node_id for pair in edges for node_id in pair})
+
+    async def get_all_labels(self) -> list[str]:
+        return await self.storage.get_all_labels()
+
+    async def get_knowledge_graph(
+        self, node_label: str, max_depth: int = 3, max_nodes: int = 1000
+    ) -> KnowledgeGraph:
+        return await self.storage.get_knowledge_graph(node_label, max_depth, max_nodes)
@@ -525,10 +525,57 @@ class RedisDocStatusStorage(DocStatusStorage):
                 logger.info(
                     f"Connected to Redis for doc status namespace {self.namespace}"
                 )
+                if not await redis.exists(self._status_index_ready_key()):
+                    await self._rebuild_status_index(redis)
         except Exception as e:
             logger.error(f"Failed to connect to Redis for doc status: {e}")
             raise
 
+    def _status_key(self, status: str) -> str:
+        """Key of the set holding the ids of all documents in `status`"""
+        return f"{self.namespace}:__status__:{status}"
+
+    def _status_index_ready_key(self) -> str:
+        return f"{self.namespace}:__status_index__"
+
+    def _is_index_key(self, key: str) -> bool:
+        return key.startswith(f"{self.namespace}:__status")
+
+    async def _rebuild_status_index(self, redis) -> None:
+        """Build the per-status sets from the documents, needed once for data
+        written before the index existed"""
+        indexed = 0
+        cursor = 0
+        while True:
+            cursor, keys = await redis.scan(
+                cursor, match=f"{self.namespace}:*", count=1000
+            )
+            keys = [key for key in keys if not self._is_index_key(key)]
+            if keys:
+                pipe = redis.pipeline()
+                for key in keys:
+                    pipe.get(key)
+                values = await pipe.execute()
+
+                pipe = redis.pipeline()
+                for key, value in zip(keys, values):
+                    if not value:
+                        continue
+                    try:
+                        status = json.loads(value).get("status")
+                    except json.JSONDecodeError:
+                        continue
+                    if status:
+                        pipe.sadd(self._status_key(status), key.split(":", 1)[1])
+                        indexed += 1
+                await pipe.execute()
+
+            if cursor == 0:
+                break
+
+        await redis.set(self._status_index_ready_key(), "1")
+        logger.info(f"Built doc status index for {indexed} documents in {self.namespace}")
+
     @asynccontextmanager
     async def _get_redis_connection(self):
         """Safe context manager for Redis operations."""
@@ -597,87 +644,62 @@ class RedisDocStatusStorage(DocStatusStorage):
         counts = {status.value: 0 for status in DocStatus}
         async with self._get_redis_connection() as redis:
             try:
-                # Use SCAN to iterate through all keys in the namespace
-                cursor = 0
-                while True:
-                    cursor, keys = await redis.scan(
-                        cursor, match=f"{self.namespace}:*", count=1000
-                    )
-                    if keys:
-                        # Get all values in batch
-                        pipe = redis.pipeline()
-                        for key in keys:
-                            pipe.get(key)
-                        values = await pipe.execute()
-
-                        # Count statuses
-                        for value in values:
-                            if value:
-                                try:
-                                    doc_data = json.loads(value)
-                                    status = doc_data.get("status")
-                                    if status in counts:
-                                        counts[status] += 1
-                                except json.JSONDecodeError:
-                                    continue
-
-                    if cursor == 0:
-                        break
+                # The status sets are maintained by upsert and delete
+                pipe = redis.pipeline()
+                for status in DocStatus:
+                    pipe.scard(self._status_key(status.value))
+                results = await pipe.execute()
+                for status, count in zip(DocStatus, results):
+                    counts[status.value] = count
             except Exception as e:
                 logger.error(f"Error getting status counts: {e}")
 
         return counts
 
     async def get_docs_by_status(
-        self, status: DocStatus
+        self, status: DocStatus, include_content: bool = True
     ) -> dict[str, DocProcessingStatus]:
         """Get all documents with a specific status"""
         result = {}
         async with self._get_redis_connection() as redis:
             try:
-                # Use SCAN to iterate through all keys in the namespace
-                cursor = 0
-                while True:
-                    cursor, keys = await redis.scan(
-                        cursor, match=f"{self.namespace}:*", count=1000
-                    )
-                    if keys:
-                        # Get all values in batch
-                        pipe = redis.pipeline()
-                        for key in keys:
-                            pipe.get(key)
-                        values = await pipe.execute()
-
-                        # Filter by status and create DocProcessingStatus objects
-                        for key, value in zip(keys, values):
-                            if value:
-                                try:
-                                    doc_data = json.loads(value)
-                                    if doc_data.get("status") == status.value:
-                                        # Extract document ID from key
-                                        doc_id = key.split(":", 1)[1]
-
-                                        # Make a copy of the data to avoid modifying the original
-                                        data = doc_data.copy()
-                                        # If content is missing, use content_summary as content
-                                        if (
-                                            "content" not in data
-                                            and "content_summary" in data
-                                        ):
-                                            data["content"] = data["content_summary"]
-                                        # If file_path is not in data, use document id as file path
-                                        if "file_path" not in data:
-                                            data["file_path"] = "no-file-path"
-
-                                        result[doc_id] = DocProcessingStatus(**data)
-                                except (json.JSONDecodeError, KeyError) as e:
-                                    logger.error(
-                                        f"Error processing document {key}: {e}"
-                                    )
-                                    continue
+                # Only documents in the status set are fetched, not the whole namespace
+                doc_ids = list(await redis.smembers(self._status_key(status.value)))
+                if not doc_ids:
+                    return result
 
-                    if cursor == 0:
-                        break
+                pipe = redis.pipeline()
+                for doc_id in doc_ids:
+                    pipe.get(f"{self.namespace}:{doc_id}")
+                values = await pipe.execute()
+
+                stale_ids = []
+                for doc_id, value in zip(doc_ids, values):
+                    if not value:
+                        stale_ids.append(doc_id)
+                        continue
+                    try:
+                        data = json.loads(value)
+                        if data.get("status") != status.value:
+                            stale_ids.append(doc_id)
+                            continue
+
+                        if not include_content:
+                            data["content"] = ""
+                        # If content is missing, use content_summary as content
+                        elif "content" not in data and "content_summary" in data:
+                            data["content"] = data["content_summary"]
+                        # If file_path is not in data, use document id as file path
+                        if "file_path" not in data:
+                            data["file_path"] = "no-file-path"
+
+                        result[doc_id] = DocProcessingStatus(**data)
+                    except (json.JSONDecodeError, KeyError) as e:
+                        logger.error(f"Error processing document {doc_id}: {e}")
+                        continue
+
+                if stale_ids:
+                    await redis.srem(self._status_key(status.value), *stale_ids)
             except Exception as e:
                 logger.error(f"Error getting docs by status: {e}")
 
@@ -700,9 +722,18 @@ class RedisDocStatusStorage(DocStatusStorage):
                     if "chunks_list" not in doc_data:
                         doc_data["chunks_list"] = []
 
-                pipe = redis.pipeline()
+                # The document and its status set membership change in one transaction
+                pipe = redis.pipeline(transaction=True)
                 for k, v in data.items():
                     pipe.set(f"{self.namespace}:{k}", json.dumps(v))
+                    status = v.get("status")
+                    if isinstance(status, DocStatus):
+                        status = status.value
+                    for other in DocStatus:
+                        if other.value != status:
+                            pipe.srem(self._status_key(other.value), k)
+                    if status:
+                        pipe.sadd(self._status_key(status), k)
                 await pipe.execute()
             except json.JSONEncodeError as e:
                 logger.error(f"JSON encode error during upsert: {e}")
@@ -723,12 +754,14 @@ class RedisDocStatusStorage(DocStatusStorage):
             return
 
         async with self._get_redis_connection() as redis:
-            pipe = redis.pipeline()
+            pipe = redis.pipeline(transaction=True)
             for doc_id in doc_ids:
                 pipe.delete(f"{self.namespace}:{doc_id}")
+            for status in DocStatus:
+                pipe.srem(self._status_key(status.value), *doc_ids)
 
             results = await pipe.execute()
-            deleted_count = sum(results)
+            deleted_count = sum(results[: len(doc_ids)])
             logger.info(
                 f"Deleted {deleted_count} of {len(doc_ids)} doc status entries from {self.namespace}"
             )
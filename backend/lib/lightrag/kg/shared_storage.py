@@ -1,10 +1,13 @@
 import os
 import sys
+import time
 import asyncio
 from multiprocessing.synchronize import Lock as ProcessLock
 from multiprocessing import Manager
 from typing import Any, Dict, Optional, Union, TypeVar, Generic
 
+from lightrag.metrics import metrics_registry
+
 
 # Define a direct print function for critical logs that must be visible in all processes
 def direct_log(message, level="INFO", enable_output: bool = True):
@@ -44,6 +47,22 @@ _data_init_lock: Optional[LockType] = None
 # async locks for coroutine synchronization in multiprocess mode
 _async_locks: Optional[Dict[str, asyncio.Lock]] = None
 
+# per-namespace reader/writer locks
+_namespace_process_locks: Optional[Dict[str, Any]] = None  # namespace -> (lock, mutex, readers)
+_namespace_async_locks: Optional[Dict[str, "_AsyncRWLock"]] = None  # process local
+
+
+_lock_wait_time = metrics_registry.histogram(
+    "lightrag_lock_wait_seconds",
+    "Time spent waiting to acquire a shared storage lock",
+    ("lock",),
+)
+_lock_hold_time = metrics_registry.histogram(
+    "lightrag_lock_hold_seconds",
+    "Time a shared storage lock is held",
+    ("lock",),
+)
+
 
 class UnifiedLock(Generic[T]):
     """Provide a unified lock interface type for asyncio.Lock and multiprocessing.Lock"""
@@ -62,8 +81,17 @@ class UnifiedLock(Generic[T]):
         self._name = name  # for debug only
         self._enable_logging = enable_logging  # for debug only
         self._async_lock = async_lock  # auxiliary lock for coroutine synchronization
+        self._acquired_at = 0.0  # for hold time metrics, only one holder at a time
+
+    def _record_acquired(self, wait_started_at: float):
+        self._acquired_at = time.perf_counter()
+        _lock_wait_time.observe(self._acquired_at - wait_started_at, lock=self._name)
+
+    def _record_released(self):
+        _lock_hold_time.observe(time.perf_counter() - self._acquired_at, lock=self._name)
 
     async def __aenter__(self) -> "UnifiedLock[T]":
+        wait_started_at = time.perf_counter()
         try:
             # direct_log(
             #     f"== Lock == Process {self._pid}: Acquiring lock '{self._name}' (async={self._is_async})",
@@ -87,6 +115,7 @@ class UnifiedLock(Generic[T]):
                 await self._lock.acquire()
             else:
                 self._lock.acquire()
+            self._record_acquired(wait_started_at)
 
             direct_log(
                 f"== Lock == Process {self._pid}: Lock '{self._name}' acquired (async={self._is_async})",
@@ -112,7 +141,8 @@ class UnifiedLock(Generic[T]):
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         main_lock_released = False
         try:
-            # Release main lock first
+            # Release main lock first, record hold time while it is still ours
+            self._record_released()
             if self._is_async:
                 self._lock.release()
             else:
@@ -167,6 +197,7 @@ class UnifiedLock(Generic[T]):
 
     def __enter__(self) -> "UnifiedLock[T]":
         """For backward compatibility"""
+        wait_started_at = time.perf_counter()
         try:
             if self._is_async:
                 raise RuntimeError("Use 'async with' for shared_storage lock")
@@ -175,6 +206,7 @@ class UnifiedLock(Generic[T]):
                 enable_output=self._enable_logging,
             )
             self._lock.acquire()
+            self._record_acquired(wait_started_at)
             direct_log(
                 f"== Lock == Process {self._pid}: Lock '{self._name}' acquired (sync)",
                 enable_output=self._enable_logging,
@@ -197,6 +229,7 @@ class UnifiedLock(Generic[T]):
                 f"== Lock == Process {self._pid}: Releasing lock '{self._name}' (sync)",
                 enable_output=self._enable_logging,
             )
+            self._record_released()
             self._lock.release()
             direct_log(
                 f"== Lock == Process {self._pid}: Lock '{self._name}' released (sync)",
@@ -211,6 +244,176 @@ class UnifiedLock(Generic[T]):
             raise
 
 
+class _AsyncRWLock:
+    """Reader/writer lock for coroutines of one process.
+
+    Readers share the lock, a writer holds it alone. Waiting writers block new
+    readers so a steady stream of reads cannot starve persistence.
+    """
+
+    def __init__(self):
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire_read(self):
+        async with self._condition:
+            await self._condition.wait_for(
+                lambda: not self._writer and self._writers_waiting == 0
+            )
+            self._readers += 1
+
+    async def release_read(self):
+        async with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    async def acquire_write(self):
+        async with self._condition:
+            self._writers_waiting += 1
+            try:
+                await self._condition.wait_for(
+                    lambda: not self._writer and self._readers == 0
+                )
+            finally:
+                self._writers_waiting -= 1
+            self._writer = True
+
+    async def release_write(self):
+        async with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+class _ProcessRWLock:
+    """Reader/writer lock across processes built from Manager primitives.
+
+    The first reader takes the write lock on behalf of all readers and the last
+    one releases it, the reader count is guarded by a mutex.
+    """
+
+    def __init__(self, write_lock: ProcessLock, mutex: ProcessLock, readers: Any):
+        self._write_lock = write_lock
+        self._mutex = mutex
+        self._readers = readers
+
+    def acquire_read(self):
+        with self._mutex:
+            self._readers.value += 1
+            if self._readers.value == 1:
+                try:
+                    self._write_lock.acquire()
+                except BaseException:
+                    self._readers.value -= 1
+                    raise
+
+    def release_read(self):
+        with self._mutex:
+            self._readers.value -= 1
+            if self._readers.value == 0:
+                self._write_lock.release()
+
+    def acquire_write(self):
+        self._write_lock.acquire()
+
+    def release_write(self):
+        self._write_lock.release()
+
+
+class UnifiedRWLock:
+    """Per-namespace storage lock with shared-read and exclusive-write semantics.
+
+    ``async with lock:`` takes the lock exclusively, like UnifiedLock, so existing
+    write paths keep their behaviour. ``async with lock.reader():`` shares it with
+    other readers of the same namespace. In multiprocess mode coroutines first
+    coordinate on a process-local lock, then on the cross-process one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        async_lock: _AsyncRWLock,
+        process_lock: Optional[_ProcessRWLock] = None,
+        enable_logging: bool = False,
+    ):
+        self._name = name
+        self._pid = os.getpid()  # for debug only
+        self._async_lock = async_lock
+        self._process_lock = process_lock
+        self._enable_logging = enable_logging  # for debug only
+        self._acquired_at = 0.0  # for hold time metrics, only one writer at a time
+
+    async def __aenter__(self) -> "UnifiedRWLock":
+        wait_started_at = time.perf_counter()
+        await self._async_lock.acquire_write()
+        if self._process_lock is not None:
+            try:
+                self._process_lock.acquire_write()
+            except BaseException:
+                await self._async_lock.release_write()
+                raise
+        self._acquired_at = time.perf_counter()
+        _lock_wait_time.observe(self._acquired_at - wait_started_at, lock=self._name)
+        direct_log(
+            f"== Lock == Process {self._pid}: Lock '{self._name}' acquired (write)",
+            enable_output=self._enable_logging,
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _lock_hold_time.observe(time.perf_counter() - self._acquired_at, lock=self._name)
+        try:
+            if self._process_lock is not None:
+                self._process_lock.release_write()
+        finally:
+            await self._async_lock.release_write()
+        direct_log(
+            f"== Lock == Process {self._pid}: Lock '{self._name}' released (write)",
+            enable_output=self._enable_logging,
+        )
+
+    def writer(self) -> "UnifiedRWLock":
+        return self
+
+    def reader(self) -> "_RWLockReader":
+        return _RWLockReader(self)
+
+
+class _RWLockReader:
+    """Shared-read context of a UnifiedRWLock, one per ``async with``"""
+
+    def __init__(self, lock: UnifiedRWLock):
+        self._lock = lock
+        self._acquired_at = 0.0
+
+    async def __aenter__(self) -> "_RWLockReader":
+        wait_started_at = time.perf_counter()
+        await self._lock._async_lock.acquire_read()
+        if self._lock._process_lock is not None:
+            try:
+                self._lock._process_lock.acquire_read()
+            except BaseException:
+                await self._lock._async_lock.release_read()
+                raise
+        self._acquired_at = time.perf_counter()
+        _lock_wait_time.observe(
+            self._acquired_at - wait_started_at, lock=f"{self._lock._name}:read"
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        _lock_hold_time.observe(
+            time.perf_counter() - self._acquired_at, lock=f"{self._lock._name}:read"
+        )
+        try:
+            if self._lock._process_lock is not None:
+                self._lock._process_lock.release_read()
+        finally:
+            await self._lock._async_lock.release_read()
+
+
 def get_internal_lock(enable_logging: bool = False) -> UnifiedLock:
     """return unified storage lock for data consistency"""
     async_lock = _async_locks.get("internal_lock") if _is_multiprocess else None
@@ -235,6 +438,39 @@ def get_storage_lock(enable_logging: bool = False) -> UnifiedLock:
     )
 
 
+async def get_namespace_storage_lock(
+    namespace: str, enable_logging: bool = False
+) -> UnifiedRWLock:
+    """return the reader/writer storage lock of one namespace
+
+    Unlike get_storage_lock, storages of different namespaces do not block each
+    other and readers of the same namespace run concurrently.
+    """
+    if _namespace_async_locks is None:
+        raise ValueError("Try to create namespace lock before Shared-Data is initialized")
+
+    if namespace not in _namespace_async_locks:
+        _namespace_async_locks[namespace] = _AsyncRWLock()
+
+    process_lock = None
+    if _is_multiprocess and _manager is not None:
+        async with get_internal_lock():
+            if namespace not in _namespace_process_locks:
+                _namespace_process_locks[namespace] = (
+                    _manager.Lock(),
+                    _manager.Lock(),
+                    _manager.Value("i", 0),
+                )
+            process_lock = _ProcessRWLock(*_namespace_process_locks[namespace])
+
+    return UnifiedRWLock(
+        name=f"storage_lock:{namespace}",
+        async_lock=_namespace_async_locks[namespace],
+        process_lock=process_lock,
+        enable_logging=enable_logging,
+    )
+
+
 def get_pipeline_status_lock(enable_logging: bool = False) -> UnifiedLock:
     """return unified storage lock for data consistency"""
     async_lock = _async_locks.get("pipeline_status_lock") if _is_multiprocess else None
@@ -302,7 +538,9 @@ def initialize_share_data(workers: int = 1):
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _namespace_process_locks, \
+        _namespace_async_locks
 
     # Check if already initialized
     if _initialized:
@@ -324,6 +562,8 @@ def initialize_share_data(workers: int = 1):
         _shared_dicts = _manager.dict()
         _init_flags = _manager.dict()
         _update_flags = _manager.dict()
+        _namespace_process_locks = _manager.dict()
+        _namespace_async_locks = {}
 
         # Initialize async locks for multiprocess mode
         _async_locks = {
@@ -347,6 +587,8 @@ def initialize_share_data(workers: int = 1):
         _shared_dicts = {}
         _init_flags = {}
         _update_flags = {}
+        _namespace_process_locks = {}
+        _namespace_async_locks = {}
         _async_locks = None  # No need for async locks in single process mode
         direct_log(f"Process {os.getpid()} Shared-Data created for Single Process")
 
@@ -432,6 +674,31 @@ async def set_all_update_flags(namespace: str):
             _update_flags[namespace][i].value = True
 
 
+def _flag_identity(flag) -> Any:
+    # Manager proxies of the same value are distinct objects sharing a token id
+    token = getattr(flag, "_token", None)
+    return token.id if token is not None else id(flag)
+
+
+async def set_other_update_flags(namespace: str, own_flag):
+    """Set the update flags of all other workers of namespace, own_flag is left as is
+
+    Used by workers that already applied a change in place. Clearing their own
+    flag after set_all_update_flags could swallow an update set in between.
+    """
+    global _update_flags
+    if _update_flags is None:
+        raise ValueError("Try to create namespace before Shared-Data is initialized")
+
+    own_identity = _flag_identity(own_flag)
+    async with get_internal_lock():
+        if namespace not in _update_flags:
+            raise ValueError(f"Namespace {namespace} not found in update flags")
+        for flag in _update_flags[namespace]:
+            if _flag_identity(flag) != own_identity:
+                flag.value = True
+
+
 async def clear_all_update_flags(namespace: str):
     """Clear all update flag of namespace indicating all workers need to reload data from files"""
     global _update_flags
@@ -535,7 +802,9 @@ def finalize_share_data():
         _init_flags, \
         _initialized, \
         _update_flags, \
-        _async_locks
+        _async_locks, \
+        _namespace_process_locks, \
+        _namespace_async_locks
 
     # Check if already initialized
     if not _initialized:
@@ -601,5 +870,7 @@ def finalize_share_data():
     _data_init_lock = None
     _update_flags = None
     _async_locks = None
+    _namespace_process_locks = None
+    _namespace_async_locks = None
 
     direct_log(f"Process {os.getpid()} storage data finalization complete")
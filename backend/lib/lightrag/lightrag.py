@@ -25,10 +25,22 @@ from lightrag.constants import (
     DEFAULT_MAX_GLEANING,
     DEFAULT_MAX_TOKEN_SUMMARY,
     DEFAULT_FORCE_LLM_SUMMARY_ON_MERGE,
+    DEFAULT_ENTITY_EXTRACT_PACK_CHUNKS,
+    DEFAULT_CPU_EXECUTOR,
+    DEFAULT_EMBEDDING_VECTOR_CACHE_SIZE,
+    DEFAULT_EMBEDDING_MICRO_BATCH_WAIT_MS,
+    DEFAULT_QUERY_EMBEDDING_CACHE_MAX_BYTES,
+    DEFAULT_LLM_HEDGE_INITIAL_DELAY,
+    DEFAULT_GRAPH_CACHE_MAX_BYTES,
+    DEFAULT_RANKING_INDEX_MAX_ENTITIES,
+    DEFAULT_COMMUNITY_MIN_SIZE,
+    DEFAULT_COMMUNITY_RESOLUTION,
+    DEFAULT_LOCAL_KEYWORDS_MIN_COVERAGE,
 )
 from lightrag.utils import get_env_value
 
 from lightrag.kg import (
+    COMMUNITY_UNSUPPORTED_STORAGES,
     STORAGES,
     verify_storage_implementation,
 )
@@ -38,11 +50,14 @@ from lightrag.kg.shared_storage import (
     get_pipeline_status_lock,
     get_graph_db_lock,
 )
+from lightrag.kg.graph_cache import CachedGraphStorage
+from lightrag.kg.ranking_index import RankingIndexGraphStorage
 
 from .base import (
     BaseGraphStorage,
     BaseKVStorage,
     BaseVectorStorage,
+    ChunkProgress,
     DocProcessingStatus,
     DocStatus,
     DocStatusStorage,
@@ -55,23 +70,37 @@ from .namespace import NameSpace
 from .operate import (
     chunking_by_token_size,
     extract_entities,
+    load_cached_extraction_results,
     merge_nodes_and_edges,
+    build_communities,
     kg_query,
     naive_query,
+    community_query,
     query_with_keywords,
     _rebuild_knowledge_from_chunks,
+    invalidate_graph_query_caches,
 )
 from .constants import GRAPH_FIELD_SEP
 from .utils import (
     Tokenizer,
     TiktokenTokenizer,
+    ApproximateTokenCounter,
+    get_tokenizer,
     EmbeddingFunc,
     always_get_an_event_loop,
     compute_mdhash_id,
     convert_response_to_json,
     lazy_external_import,
     priority_limit_async_func_call,
+    hedge_async_func_call,
     get_content_summary,
+    get_cpu_executor,
+    shutdown_cpu_executors,
+    get_embedding_vector_cache,
+    QueryEmbeddingCache,
+    wrap_embedding_func_with_query_cache,
+    wrap_embedding_func_with_vector_cache,
+    wrap_embedding_func_with_micro_batching,
     clean_text,
     check_storage_env_vars,
     logger,
@@ -112,9 +141,26 @@ class LightRAG:
     graph_storage: str = field(default="NetworkXStorage")
     """Storage backend for knowledge graphs."""
 
+    graph_cache_max_bytes: int = field(
+        default=get_env_value(
+            "GRAPH_CACHE_MAX_BYTES", DEFAULT_GRAPH_CACHE_MAX_BYTES, int
+        )
+    )
+    """Memory cap of the read cache in front of remote graph storages, 0 disables it. NetworkXStorage is never cached."""
+
+    ranking_index_max_entities: int = field(
+        default=get_env_value(
+            "RANKING_INDEX_MAX_ENTITIES", DEFAULT_RANKING_INDEX_MAX_ENTITIES, int
+        )
+    )
+    """Number of entities whose edge and chunk rankings are kept for local queries, 0 disables the index."""
+
     doc_status_storage: str = field(default="JsonDocStatusStorage")
     """Storage type for tracking document processing statuses."""
 
+    kv_read_views: bool = field(default=get_env_value("KV_READ_VIEWS", False, bool))
+    """Opt-in: if True, JsonKVStorage reads return read-only views of stored records instead of copies, so callers must copy a record before modifying it."""
+
     # Workspace
     # ---
 
@@ -144,6 +190,39 @@ class LightRAG:
         )
     )
 
+    entity_extract_pack_chunks: int = field(
+        default=get_env_value(
+            "ENTITY_EXTRACT_PACK_CHUNKS", DEFAULT_ENTITY_EXTRACT_PACK_CHUNKS, int
+        )
+    )
+    """Maximum number of chunks packed into a single entity extraction request.
+    Packing is bounded by `llm_model_max_token_size`; 1 disables packing."""
+
+    # Community reports
+    # ---
+
+    community_min_size: int = field(
+        default=get_env_value("COMMUNITY_MIN_SIZE", DEFAULT_COMMUNITY_MIN_SIZE, int)
+    )
+    """Minimum number of entities for a community to get a report."""
+
+    community_resolution: float = field(
+        default=get_env_value(
+            "COMMUNITY_RESOLUTION", DEFAULT_COMMUNITY_RESOLUTION, float
+        )
+    )
+    """Louvain resolution used by abuild_communities, higher values give smaller communities."""
+
+    # Query
+    # ---
+
+    local_keywords_min_coverage: float = field(
+        default=get_env_value(
+            "LOCAL_KEYWORDS_MIN_COVERAGE", DEFAULT_LOCAL_KEYWORDS_MIN_COVERAGE, float
+        )
+    )
+    """Share of the query's words that local keyword extraction must match, otherwise the LLM extracts the keywords."""
+
     # Text chunking
     # ---
 
@@ -165,6 +244,17 @@ class LightRAG:
     tiktoken_model_name: str = field(default="gpt-4o-mini")
     """Model name used for tokenization when chunking text with tiktoken. Defaults to `gpt-4o-mini`."""
 
+    tokenizer_cache_dir: str | None = field(
+        default=get_env_value("TOKENIZER_CACHE_DIR", None, str)
+    )
+    """Directory with bundled tokenizer files, so the tokenizer loads without network access."""
+
+    approximate_token_count: bool = field(
+        default=get_env_value("APPROXIMATE_TOKEN_COUNT", False, bool)
+    )
+    """Use a per-script character ratio estimate instead of encoding for token budgeting.
+    Chunking still uses the exact tokenizer."""
+
     chunking_func: Callable[
         [
             Tokenizer,
@@ -195,6 +285,21 @@ class LightRAG:
     Defaults to `chunking_by_token_size` if not specified.
     """
 
+    # CPU-bound work
+    # ---
+
+    cpu_executor: str = field(
+        default=get_env_value("CPU_EXECUTOR", DEFAULT_CPU_EXECUTOR, str)
+    )
+    """Executor for CPU-bound ingestion steps (chunking, extraction record parsing):
+    "none" runs them on the event loop, "thread" or "process" runs them in a pool.
+    The process pool requires a picklable tokenizer and chunking_func."""
+
+    cpu_executor_max_workers: int = field(
+        default=get_env_value("CPU_EXECUTOR_MAX_WORKERS", 0, int)
+    )
+    """Maximum number of pool workers for cpu_executor, 0 uses the executor default."""
+
     # Embedding
     # ---
 
@@ -209,6 +314,43 @@ class LightRAG:
     )
     """Maximum number of concurrent embedding function calls."""
 
+    embedding_model_name: str = field(
+        default=get_env_value("EMBEDDING_MODEL", "", str)
+    )
+    """Name of the embedding model, part of the embedding vector cache fingerprint."""
+
+    embedding_vector_cache_size: int = field(
+        default=get_env_value(
+            "EMBEDDING_VECTOR_CACHE_SIZE", DEFAULT_EMBEDDING_VECTOR_CACHE_SIZE, int
+        )
+    )
+    """Maximum number of content-hash to vector entries kept in the persistent embedding cache.
+    The cache is shared by all vector storages and invalidated when the model or dimension changes.
+    Set to 0 to disable."""
+
+    embedding_micro_batch_size: int = field(
+        default=get_env_value("EMBEDDING_MICRO_BATCH_SIZE", 0, int)
+    )
+    """Maximum number of texts in one coalesced embedding request, 0 uses embedding_batch_num."""
+
+    embedding_micro_batch_wait_ms: float = field(
+        default=get_env_value(
+            "EMBEDDING_MICRO_BATCH_WAIT_MS", DEFAULT_EMBEDDING_MICRO_BATCH_WAIT_MS, float
+        )
+    )
+    """How long concurrent embedding calls are collected before one request is sent.
+    Query-priority calls are never delayed. Set to 0 to disable micro-batching."""
+
+    query_embedding_cache_max_bytes: int = field(
+        default=get_env_value(
+            "QUERY_EMBEDDING_CACHE_MAX_BYTES",
+            DEFAULT_QUERY_EMBEDDING_CACHE_MAX_BYTES,
+            int,
+        )
+    )
+    """Memory cap of the in-memory query embedding cache shared by all vector storages of this instance.
+    Entries are keyed by embedding model and dimension. Set to 0 to disable."""
+
     embedding_cache_config: dict[str, Any] = field(
         default_factory=lambda: {
             "enabled": False,
@@ -237,6 +379,23 @@ class LightRAG:
     llm_model_max_async: int = field(default=int(os.getenv("MAX_ASYNC", 4)))
     """Maximum number of concurrent LLM calls."""
 
+    query_reserved_workers: int = field(
+        default=get_env_value("QUERY_RESERVED_WORKERS", 1, int)
+    )
+    """LLM and embedding workers kept free for query-priority calls, so queries do not wait
+    behind extraction. Ignored when max_async leaves no shared worker."""
+
+    llm_hedge_budget: float = field(default=get_env_value("LLM_HEDGE_BUDGET", 0.0, float))
+    """Fraction of query-priority LLM calls that may be duplicated when they exceed the p95 latency.
+    The first response wins. Extraction and summary calls are never hedged. Set to 0 to disable."""
+
+    llm_hedge_initial_delay: float = field(
+        default=get_env_value(
+            "LLM_HEDGE_INITIAL_DELAY", DEFAULT_LLM_HEDGE_INITIAL_DELAY, float
+        )
+    )
+    """Hedge delay in seconds used until enough query latencies have been observed."""
+
     llm_model_kwargs: dict[str, Any] = field(default_factory=dict)
     """Additional keyword arguments passed to the LLM model function."""
 
@@ -346,9 +505,17 @@ class LightRAG:
         # Post-initialization hook to handle backward compatabile tokenizer initialization based on provided parameters
         if self.tokenizer is None:
             if self.tiktoken_model_name:
-                self.tokenizer = TiktokenTokenizer(self.tiktoken_model_name)
+                self.tokenizer = get_tokenizer(
+                    self.tiktoken_model_name, cache_dir=self.tokenizer_cache_dir
+                )
             else:
-                self.tokenizer = TiktokenTokenizer()
+                self.tokenizer = TiktokenTokenizer(cache_dir=self.tokenizer_cache_dir)
+
+        if (
+            self.approximate_token_count
+            and getattr(self.tokenizer, "token_counter", None) is None
+        ):
+            self.tokenizer.token_counter = ApproximateTokenCounter()
 
         # Fix global_config now
         global_config = asdict(self)
@@ -357,9 +524,46 @@ class LightRAG:
         logger.debug(f"LightRAG init with param:\n  {_print_config}\n")
 
         # Init Embedding
+        self._embedding_vector_cache = None
+        self._query_embedding_cache = None
+        if self.embedding_func is not None:
+            model_name = self.embedding_model_name or getattr(
+                self.embedding_func.func, "__qualname__", "unknown"
+            )
+            embedding_fingerprint = f"{model_name}:{self.embedding_func.embedding_dim}"
+            if self.embedding_vector_cache_size > 0:
+                self._embedding_vector_cache = get_embedding_vector_cache(
+                    os.path.join(self.working_dir, "embedding_vector_cache.npz"),
+                    fingerprint=embedding_fingerprint,
+                    max_entries=self.embedding_vector_cache_size,
+                )
+            if self.query_embedding_cache_max_bytes > 0:
+                self._query_embedding_cache = QueryEmbeddingCache(
+                    embedding_fingerprint, self.query_embedding_cache_max_bytes
+                )
+
         self.embedding_func = priority_limit_async_func_call(
-            self.embedding_func_max_async
+            self.embedding_func_max_async,
+            reserved={5: self.query_reserved_workers},
+            name="embedding",
         )(self.embedding_func)
+        if self.embedding_func is not None and self.embedding_micro_batch_wait_ms > 0:
+            self.embedding_func = wrap_embedding_func_with_micro_batching(
+                self.embedding_func,
+                max_batch_size=self.embedding_micro_batch_size
+                or self.embedding_batch_num,
+                max_wait_ms=self.embedding_micro_batch_wait_ms,
+            )
+        if self._embedding_vector_cache is not None:
+            # Cache sits in front of the limiter so hits never wait for a worker
+            self.embedding_func = wrap_embedding_func_with_vector_cache(
+                self.embedding_func, self._embedding_vector_cache
+            )
+        if self._query_embedding_cache is not None:
+            # Repeated queries and keywords skip the embedding round trip
+            self.embedding_func = wrap_embedding_func_with_query_cache(
+                self.embedding_func, self._query_embedding_cache
+            )
 
         # Initialize all storages
         self.key_string_value_json_storage_cls: type[BaseKVStorage] = (
@@ -408,6 +612,16 @@ class LightRAG:
             workspace=self.workspace,
             embedding_func=self.embedding_func,
         )
+        if self.graph_cache_max_bytes > 0 and self.graph_storage != "NetworkXStorage":
+            # Remote graph storages pay a round trip per read, keep hot nodes in memory
+            self.chunk_entity_relation_graph = CachedGraphStorage(
+                self.chunk_entity_relation_graph, self.graph_cache_max_bytes
+            )
+        if self.ranking_index_max_entities > 0:
+            # Keep per-entity edge and chunk rankings so local queries skip the sorting
+            self.chunk_entity_relation_graph = RankingIndexGraphStorage(
+                self.chunk_entity_relation_graph, self.ranking_index_max_entities
+            )
 
         self.entities_vdb: BaseVectorStorage = self.vector_db_storage_cls(  # type: ignore
             namespace=NameSpace.VECTOR_STORE_ENTITIES,
@@ -425,7 +639,19 @@ class LightRAG:
             namespace=NameSpace.VECTOR_STORE_CHUNKS,
             workspace=self.workspace,
             embedding_func=self.embedding_func,
-            meta_fields={"full_doc_id", "content", "file_path"},
+            meta_fields={"full_doc_id", "content", "file_path", "tokens"},
+        )
+
+        self.community_reports: BaseKVStorage = self.key_string_value_json_storage_cls(  # type: ignore
+            namespace=NameSpace.KV_STORE_COMMUNITY_REPORTS,
+            workspace=self.workspace,
+            embedding_func=self.embedding_func,
+        )
+        self.communities_vdb: BaseVectorStorage = self.vector_db_storage_cls(  # type: ignore
+            namespace=NameSpace.VECTOR_STORE_COMMUNITIES,
+            workspace=self.workspace,
+            embedding_func=self.embedding_func,
+            meta_fields={"title", "content"},
         )
 
         # Initialize document status storage
@@ -439,13 +665,24 @@ class LightRAG:
         # Directly use llm_response_cache, don't create a new object
         hashing_kv = self.llm_response_cache
 
-        self.llm_model_func = priority_limit_async_func_call(self.llm_model_max_async)(
+        self.llm_model_func = priority_limit_async_func_call(
+            self.llm_model_max_async,
+            reserved={5: self.query_reserved_workers},
+            name="llm",
+        )(
             partial(
                 self.llm_model_func,  # type: ignore
                 hashing_kv=hashing_kv,
                 **self.llm_model_kwargs,
             )
         )
+        if self.llm_hedge_budget > 0:
+            # Hedges go through the limiter too, so they are counted against llm_model_max_async
+            self.llm_model_func = hedge_async_func_call(
+                budget=self.llm_hedge_budget,
+                initial_delay=self.llm_hedge_initial_delay,
+                name="llm",
+            )(self.llm_model_func)
 
         self._storages_status = StoragesStatus.CREATED
 
@@ -486,6 +723,8 @@ class LightRAG:
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
+                self.community_reports,
+                self.communities_vdb,
                 self.chunk_entity_relation_graph,
                 self.llm_response_cache,
                 self.doc_status,
@@ -493,6 +732,13 @@ class LightRAG:
                 if storage:
                     tasks.append(storage.initialize())
 
+            # Load a lazily loaded tokenizer (BPE download/parse) off the event loop
+            load_tokenizer = getattr(
+                getattr(self.tokenizer, "tokenizer", None), "load", None
+            )
+            if load_tokenizer is not None:
+                tasks.append(asyncio.to_thread(load_tokenizer))
+
             await asyncio.gather(*tasks)
 
             self._storages_status = StoragesStatus.INITIALIZED
@@ -509,14 +755,20 @@ class LightRAG:
                 self.entities_vdb,
                 self.relationships_vdb,
                 self.chunks_vdb,
+                self.community_reports,
+                self.communities_vdb,
                 self.chunk_entity_relation_graph,
                 self.llm_response_cache,
                 self.doc_status,
             ):
                 if storage:
                     tasks.append(storage.finalize())
+            if self._embedding_vector_cache is not None:
+                tasks.append(asyncio.to_thread(self._embedding_vector_cache.save))
 
             await asyncio.gather(*tasks)
+            # Pools are recreated on demand, waiting for them must not block the loop
+            await asyncio.to_thread(shutdown_cpu_executors)
 
             self._storages_status = StoragesStatus.FINALIZED
             logger.debug("Finalized Storages")
@@ -830,6 +1082,10 @@ class LightRAG:
         2. Split document content into chunks
         3. Process each chunk for entity and relation extraction
         4. Update the document status
+
+        Failed and interrupted documents resume from their recorded chunk progress:
+        embedded chunks are not upserted again, and extracted chunks are recovered
+        from the LLM cache instead of being sent to the LLM.
         """
 
         # Get pipeline status shared data and lock
@@ -840,16 +1096,7 @@ class LightRAG:
         async with pipeline_status_lock:
             # Ensure only one worker is processing documents
             if not pipeline_status.get("busy", False):
-                processing_docs, failed_docs, pending_docs = await asyncio.gather(
-                    self.doc_status.get_docs_by_status(DocStatus.PROCESSING),
-                    self.doc_status.get_docs_by_status(DocStatus.FAILED),
-                    self.doc_status.get_docs_by_status(DocStatus.PENDING),
-                )
-
-                to_process_docs: dict[str, DocProcessingStatus] = {}
-                to_process_docs.update(processing_docs)
-                to_process_docs.update(failed_docs)
-                to_process_docs.update(pending_docs)
+                to_process_docs = await self._get_docs_to_process()
 
                 if not to_process_docs:
                     logger.info("No documents to process")
@@ -923,9 +1170,29 @@ class LightRAG:
                 ) -> None:
                     """Process single document"""
                     file_extraction_stage_ok = False
+                    merge_stage_done = False
+                    chunks: dict[str, Any] = {}
+                    # Chunk ID -> last completed ChunkProgress stage
+                    chunks_progress: dict[str, str] = {}
+                    # Chunks whose extraction completed in this run
+                    extracted_chunk_keys: set[str] = set()
+                    chunk_results_by_key: dict[str, tuple[dict, dict]] = {}
+                    first_stage_tasks = []
+                    entity_relation_task = None
                     async with semaphore:
                         nonlocal processed_count
                         current_file_number = 0
+                        # The queue is listed without content, load it only for the
+                        # document being processed. Done before the try block so a
+                        # failed load never writes an empty content back.
+                        if not status_doc.content:
+                            content = await self._get_doc_content(doc_id)
+                            if content is None:
+                                logger.warning(
+                                    f"Document {doc_id} was removed before processing, skipping"
+                                )
+                                return
+                            status_doc.content = content
                         try:
                             # Get file path from status document
                             file_path = getattr(
@@ -948,27 +1215,51 @@ class LightRAG:
                                 pipeline_status["latest_message"] = log_message
                                 pipeline_status["history_messages"].append(log_message)
 
-                            # Generate chunks from document
-                            chunks: dict[str, Any] = {
+                            # Generate chunks from document, tokenization runs in the CPU executor
+                            chunking_result = await get_cpu_executor(
+                                self.cpu_executor, self.cpu_executor_max_workers
+                            ).run(
+                                self.chunking_func,
+                                self.tokenizer,
+                                status_doc.content,
+                                split_by_character,
+                                split_by_character_only,
+                                self.chunk_overlap_token_size,
+                                self.chunk_token_size,
+                            )
+                            chunks = {
                                 compute_mdhash_id(dp["content"], prefix="chunk-"): {
                                     **dp,
                                     "full_doc_id": doc_id,
                                     "file_path": file_path,  # Add file path to each chunk
                                     "llm_cache_list": [],  # Initialize empty LLM cache list for each chunk
                                 }
-                                for dp in self.chunking_func(
-                                    self.tokenizer,
-                                    status_doc.content,
-                                    split_by_character,
-                                    split_by_character_only,
-                                    self.chunk_overlap_token_size,
-                                    self.chunk_token_size,
-                                )
+                                for dp in chunking_result
                             }
 
                             if not chunks:
                                 logger.warning("No document chunks to process")
 
+                            # Resume from the chunk progress left by a failed or interrupted run
+                            chunks_progress.update(
+                                await self._get_resumable_chunks_progress(
+                                    status_doc, chunks
+                                )
+                            )
+                            chunks_to_embed = {
+                                chunk_key: chunk_data
+                                for chunk_key, chunk_data in chunks.items()
+                                if chunk_key not in chunks_progress
+                            }
+                            if chunks_progress:
+                                log_message = f"Resuming d-id: {doc_id}, {len(chunks) - len(chunks_to_embed)} of {len(chunks)} chunks already embedded"
+                                logger.info(log_message)
+                                async with pipeline_status_lock:
+                                    pipeline_status["latest_message"] = log_message
+                                    pipeline_status["history_messages"].append(
+                                        log_message
+                                    )
+
                             # Process document in two stages
                             # Stage 1: Process text chunks and docs (parallel execution)
                             doc_status_task = asyncio.create_task(
@@ -980,6 +1271,7 @@ class LightRAG:
                                             "chunks_list": list(
                                                 chunks.keys()
                                             ),  # Save chunks list
+                                            "chunks_progress": dict(chunks_progress),
                                             "content": status_doc.content,
                                             "content_summary": status_doc.content_summary,
                                             "content_length": status_doc.content_length,
@@ -993,7 +1285,7 @@ class LightRAG:
                                 )
                             )
                             chunks_vdb_task = asyncio.create_task(
-                                self.chunks_vdb.upsert(chunks)
+                                self.chunks_vdb.upsert(chunks_to_embed)
                             )
                             full_docs_task = asyncio.create_task(
                                 self.full_docs.upsert(
@@ -1001,7 +1293,7 @@ class LightRAG:
                                 )
                             )
                             text_chunks_task = asyncio.create_task(
-                                self.text_chunks.upsert(chunks)
+                                self.text_chunks.upsert(chunks_to_embed)
                             )
 
                             # First stage tasks (parallel execution)
@@ -1015,14 +1307,53 @@ class LightRAG:
 
                             # Execute first stage tasks
                             await asyncio.gather(*first_stage_tasks)
+                            for chunk_key in chunks_to_embed:
+                                chunks_progress[chunk_key] = ChunkProgress.EMBEDDED
 
-                            # Stage 2: Process entity relation graph (after text_chunks are saved)
-                            entity_relation_task = asyncio.create_task(
-                                self._process_entity_relation_graph(
-                                    chunks, pipeline_status, pipeline_status_lock
-                                )
+                            merge_stage_done = bool(chunks) and all(
+                                chunks_progress.get(chunk_key) == ChunkProgress.MERGED
+                                for chunk_key in chunks
                             )
-                            await entity_relation_task
+                            if not merge_stage_done:
+                                # Recover chunks extracted in a previous run from the LLM cache
+                                extracted_chunks = [
+                                    chunk_key
+                                    for chunk_key in chunks
+                                    if chunks_progress.get(chunk_key)
+                                    != ChunkProgress.EMBEDDED
+                                ]
+                                if extracted_chunks and self.llm_response_cache:
+                                    chunk_results_by_key.update(
+                                        await load_cached_extraction_results(
+                                            extracted_chunks,
+                                            self.llm_response_cache,
+                                            self.text_chunks,
+                                        )
+                                    )
+                                chunks_to_extract = {
+                                    chunk_key: chunk_data
+                                    for chunk_key, chunk_data in chunks.items()
+                                    if chunk_key not in chunk_results_by_key
+                                }
+
+                                # Stage 2: Process entity relation graph (after text_chunks are saved)
+                                if chunks_to_extract:
+                                    entity_relation_task = asyncio.create_task(
+                                        self._process_entity_relation_graph(
+                                            chunks_to_extract,
+                                            pipeline_status,
+                                            pipeline_status_lock,
+                                            extracted_chunk_keys=extracted_chunk_keys,
+                                        )
+                                    )
+                                    chunk_results_by_key.update(
+                                        zip(
+                                            chunks_to_extract.keys(),
+                                            await entity_relation_task,
+                                        )
+                                    )
+                                for chunk_key in chunks:
+                                    chunks_progress[chunk_key] = ChunkProgress.EXTRACTED
                             file_extraction_stage_ok = True
 
                         except Exception as e:
@@ -1047,9 +1378,11 @@ class LightRAG:
                                     if task and not task.done():
                                         task.cancel()
 
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
+                            for chunk_key in extracted_chunk_keys:
+                                chunks_progress[chunk_key] = ChunkProgress.EXTRACTED
+
+                            # Persistent llm cache and chunk data needed for resuming
+                            await self._persist_resume_state()
 
                             # Update document status to failed
                             await self.doc_status.upsert(
@@ -1057,6 +1390,9 @@ class LightRAG:
                                     doc_id: {
                                         "status": DocStatus.FAILED,
                                         "error": str(e),
+                                        "chunks_count": len(chunks),
+                                        "chunks_list": list(chunks.keys()),
+                                        "chunks_progress": dict(chunks_progress),
                                         "content": status_doc.content,
                                         "content_summary": status_doc.content_summary,
                                         "content_length": status_doc.content_length,
@@ -1073,22 +1409,27 @@ class LightRAG:
 
                     if file_extraction_stage_ok:
                         try:
-                            # Get chunk_results from entity_relation_task
-                            chunk_results = await entity_relation_task
-                            await merge_nodes_and_edges(
-                                chunk_results=chunk_results,  # result collected from entity_relation_task
-                                knowledge_graph_inst=self.chunk_entity_relation_graph,
-                                entity_vdb=self.entities_vdb,
-                                relationships_vdb=self.relationships_vdb,
-                                global_config=asdict(self),
-                                pipeline_status=pipeline_status,
-                                pipeline_status_lock=pipeline_status_lock,
-                                llm_response_cache=self.llm_response_cache,
-                                current_file_number=current_file_number,
-                                total_files=total_files,
-                                file_path=file_path,
-                            )
+                            if not merge_stage_done:
+                                await merge_nodes_and_edges(
+                                    chunk_results=[
+                                        chunk_results_by_key[chunk_key]
+                                        for chunk_key in chunks
+                                    ],  # results in chunk order, extracted now or recovered from cache
+                                    knowledge_graph_inst=self.chunk_entity_relation_graph,
+                                    entity_vdb=self.entities_vdb,
+                                    relationships_vdb=self.relationships_vdb,
+                                    global_config=asdict(self),
+                                    pipeline_status=pipeline_status,
+                                    pipeline_status_lock=pipeline_status_lock,
+                                    llm_response_cache=self.llm_response_cache,
+                                    current_file_number=current_file_number,
+                                    total_files=total_files,
+                                    file_path=file_path,
+                                )
+                                for chunk_key in chunks:
+                                    chunks_progress[chunk_key] = ChunkProgress.MERGED
 
+                            # Chunk progress is only kept until the document is processed
                             await self.doc_status.upsert(
                                 {
                                     doc_id: {
@@ -1097,6 +1438,7 @@ class LightRAG:
                                         "chunks_list": list(
                                             chunks.keys()
                                         ),  # 保留 chunks_list
+                                        "chunks_progress": {},
                                         "content": status_doc.content,
                                         "content_summary": status_doc.content_summary,
                                         "content_length": status_doc.content_length,
@@ -1130,9 +1472,8 @@ class LightRAG:
                                 )
                                 pipeline_status["history_messages"].append(error_msg)
 
-                            # Persistent llm cache
-                            if self.llm_response_cache:
-                                await self.llm_response_cache.index_done_callback()
+                            # Persistent llm cache and chunk data needed for resuming
+                            await self._persist_resume_state()
 
                             # Update document status to failed
                             await self.doc_status.upsert(
@@ -1140,6 +1481,9 @@ class LightRAG:
                                     doc_id: {
                                         "status": DocStatus.FAILED,
                                         "error": str(e),
+                                        "chunks_count": len(chunks),
+                                        "chunks_list": list(chunks.keys()),
+                                        "chunks_progress": dict(chunks_progress),
                                         "content": status_doc.content,
                                         "content_summary": status_doc.content_summary,
                                         "content_length": status_doc.content_length,
@@ -1185,16 +1529,7 @@ class LightRAG:
                 pipeline_status["history_messages"].append(log_message)
 
                 # Check for pending documents again
-                processing_docs, failed_docs, pending_docs = await asyncio.gather(
-                    self.doc_status.get_docs_by_status(DocStatus.PROCESSING),
-                    self.doc_status.get_docs_by_status(DocStatus.FAILED),
-                    self.doc_status.get_docs_by_status(DocStatus.PENDING),
-                )
-
-                to_process_docs = {}
-                to_process_docs.update(processing_docs)
-                to_process_docs.update(failed_docs)
-                to_process_docs.update(pending_docs)
+                to_process_docs = await self._get_docs_to_process()
 
         finally:
             log_message = "Document processing pipeline completed"
@@ -1206,7 +1541,11 @@ class LightRAG:
                 pipeline_status["history_messages"].append(log_message)
 
     async def _process_entity_relation_graph(
-        self, chunk: dict[str, Any], pipeline_status=None, pipeline_status_lock=None
+        self,
+        chunk: dict[str, Any],
+        pipeline_status=None,
+        pipeline_status_lock=None,
+        extracted_chunk_keys: set[str] | None = None,
     ) -> list:
         try:
             chunk_results = await extract_entities(
@@ -1216,6 +1555,7 @@ class LightRAG:
                 pipeline_status_lock=pipeline_status_lock,
                 llm_response_cache=self.llm_response_cache,
                 text_chunks_storage=self.text_chunks,
+                extracted_chunk_keys=extracted_chunk_keys,
             )
             return chunk_results
         except Exception as e:
@@ -1226,6 +1566,39 @@ class LightRAG:
                 pipeline_status["history_messages"].append(error_msg)
             raise e
 
+    async def _get_resumable_chunks_progress(
+        self, status_doc: DocProcessingStatus, chunks: dict[str, Any]
+    ) -> dict[str, str]:
+        """Get the chunk progress of a previous run that is still valid for resuming
+
+        Progress is dropped for chunks that are no longer produced by chunking
+        (e.g. chunk size changed) or whose chunk data is missing from text_chunks.
+        """
+        chunks_progress = {
+            chunk_key: stage
+            for chunk_key, stage in (status_doc.chunks_progress or {}).items()
+            if chunk_key in chunks
+        }
+        if chunks_progress:
+            missing_keys = await self.text_chunks.filter_keys(set(chunks_progress))
+            for chunk_key in missing_keys:
+                chunks_progress.pop(chunk_key, None)
+        return chunks_progress
+
+    async def _persist_resume_state(self) -> None:
+        """Persist the storages a failed document resumes from"""
+        await asyncio.gather(
+            *[
+                cast(StorageNameSpace, storage_inst).index_done_callback()
+                for storage_inst in [  # type: ignore
+                    self.llm_response_cache,
+                    self.text_chunks,
+                    self.chunks_vdb,
+                ]
+                if storage_inst is not None
+            ]
+        )
+
     async def _insert_done(
         self, pipeline_status=None, pipeline_status_lock=None
     ) -> None:
@@ -1243,6 +1616,8 @@ class LightRAG:
             ]
             if storage_inst is not None
         ]
+        if self._embedding_vector_cache is not None:
+            tasks.append(asyncio.to_thread(self._embedding_vector_cache.save))
         await asyncio.gather(*tasks)
 
         log_message = "In memory DB persist to disk"
@@ -1253,6 +1628,55 @@ class LightRAG:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
+    def _check_community_support(self) -> None:
+        unsupported = [
+            storage_name
+            for storage_name in (self.kv_storage, self.vector_storage)
+            if storage_name in COMMUNITY_UNSUPPORTED_STORAGES
+        ]
+        if unsupported:
+            raise ValueError(
+                f"Community reports are not supported by {', '.join(unsupported)}"
+            )
+
+    def build_communities(self) -> dict[str, int]:
+        """Synchronous version of abuild_communities."""
+        loop = always_get_an_event_loop()
+        return loop.run_until_complete(self.abuild_communities())
+
+    async def abuild_communities(self) -> dict[str, int]:
+        """Detect communities in the knowledge graph and refresh their reports
+
+        Run after inserting documents, the "community" query mode answers from
+        these reports. Only communities whose members or member descriptions
+        changed since the last run are summarized again by the LLM.
+
+        Returns:
+            Number of "communities", "updated" reports and "deleted" reports
+
+        Raises:
+            ValueError: If the KV or vector storage has no community tables
+        """
+        self._check_community_support()
+        result = await build_communities(
+            self.chunk_entity_relation_graph,
+            self.community_reports,
+            self.communities_vdb,
+            asdict(self),
+            llm_response_cache=self.llm_response_cache,
+        )
+        await asyncio.gather(
+            *[
+                cast(StorageNameSpace, storage_inst).index_done_callback()
+                for storage_inst in [  # type: ignore
+                    self.community_reports,
+                    self.communities_vdb,
+                    self.llm_response_cache,
+                ]
+            ]
+        )
+        return result
+
     def insert_custom_kg(
         self, custom_kg: dict[str, Any], full_doc_id: str = None
     ) -> None:
@@ -1323,6 +1747,7 @@ class LightRAG:
                     "entity_id": entity_name,
                     "entity_type": entity_type,
                     "description": description,
+                    "description_tokens": self.tokenizer.count_tokens(description),
                     "source_id": source_id,
                     "file_path": file_path,
                     "created_at": int(time.time()),
@@ -1377,6 +1802,9 @@ class LightRAG:
                     edge_data={
                         "weight": weight,
                         "description": description,
+                        "description_tokens": self.tokenizer.count_tokens(
+                            description
+                        ),
                         "keywords": keywords,
                         "source_id": source_id,
                         "file_path": file_path,
@@ -1431,6 +1859,7 @@ class LightRAG:
             logger.error(f"Error in ainsert_custom_kg: {e}")
             raise
         finally:
+            await invalidate_graph_query_caches(self.chunk_entity_relation_graph)
             if update_storage:
                 await self._insert_done()
 
@@ -1500,6 +1929,17 @@ class LightRAG:
                 hashing_kv=self.llm_response_cache,
                 system_prompt=system_prompt,
             )
+        elif param.mode == "community":
+            self._check_community_support()
+            response = await community_query(
+                query.strip(),
+                self.communities_vdb,
+                self.community_reports,
+                param,
+                global_config,
+                hashing_kv=self.llm_response_cache,
+                system_prompt=system_prompt,
+            )
         elif param.mode == "bypass":
             # Bypass mode: directly use LLM without knowledge retrieval
             use_llm_func = param.model_func or global_config["llm_model_func"]
@@ -1596,7 +2036,15 @@ class LightRAG:
             logger.warning("No cache storage configured")
             return
 
-        valid_modes = ["default", "naive", "local", "global", "hybrid", "mix"]
+        valid_modes = [
+            "default",
+            "naive",
+            "local",
+            "global",
+            "hybrid",
+            "mix",
+            "community",
+        ]
 
         # Validate input
         if modes and not all(mode in valid_modes for mode in modes):
@@ -1627,6 +2075,32 @@ class LightRAG:
         """Synchronous version of aclear_cache."""
         return always_get_an_event_loop().run_until_complete(self.aclear_cache(modes))
 
+    async def _get_docs_to_process(self) -> dict[str, DocProcessingStatus]:
+        """Processing, failed and pending documents, listed without their content"""
+        processing_docs, failed_docs, pending_docs = await asyncio.gather(
+            self.doc_status.get_docs_by_status(
+                DocStatus.PROCESSING, include_content=False
+            ),
+            self.doc_status.get_docs_by_status(DocStatus.FAILED, include_content=False),
+            self.doc_status.get_docs_by_status(
+                DocStatus.PENDING, include_content=False
+            ),
+        )
+
+        to_process_docs: dict[str, DocProcessingStatus] = {}
+        to_process_docs.update(processing_docs)
+        to_process_docs.update(failed_docs)
+        to_process_docs.update(pending_docs)
+        return to_process_docs
+
+    async def _get_doc_content(self, doc_id: str) -> str | None:
+        """Load a document's content from doc status, None if the document is gone"""
+        status_data = await self.doc_status.get_by_id(doc_id)
+        if not status_data:
+            return None
+        # If content is missing, use content_summary as content
+        return status_data.get("content") or status_data.get("content_summary", "")
+
     async def get_docs_by_status(
         self, status: DocStatus
     ) -> dict[str, DocProcessingStatus]:
@@ -1992,6 +2466,9 @@ class LightRAG:
             # ALWAYS ensure persistence if any deletion operations were started
             if deletion_operations_started:
                 try:
+                    await invalidate_graph_query_caches(
+                        self.chunk_entity_relation_graph
+                    )
                     await self._insert_done()
                 except Exception as persistence_error:
                     persistence_error_msg = f"Failed to persist data after deletion attempt for {doc_id}: {persistence_error}"
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from typing import Callable, Any
+import time
+from dataclasses import dataclass
+from typing import Callable, Any, Literal
 from pydantic import BaseModel, Field
 
+from lightrag.utils import logger, priority_limit_async_func_call
+
 
 class Model(BaseModel):
     """
@@ -29,6 +33,14 @@ class Model(BaseModel):
         ...,
         description="The arguments to pass to the callable function. Eg. the api key, model name, etc",
     )
+    max_async: int | None = Field(
+        default=None,
+        description="Maximum number of concurrent calls to this model. None leaves it unlimited",
+    )
+    weight: float = Field(
+        default=1.0,
+        description="Relative routing weight. A model with weight 2 is expected to take twice the load",
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -41,6 +53,18 @@ class MultiModel:
 
     Attributes:
         models (List[Model]): A list of language models to be used.
+        strategy: "ewma" routes to the model with the lowest expected latency (EWMA latency
+            times outstanding requests, divided by weight), "least_outstanding" to the model with
+            the fewest in-flight requests per weight, "round_robin" keeps the old rotation.
+        failure_threshold: Consecutive failures after which a model's circuit breaker opens.
+        recovery_timeout: Seconds an open breaker waits before letting a trial request through.
+        ewma_alpha: Smoothing factor for the latency average.
+
+    A failed call is retried on the next best model until every model has been tried once.
+    Models with `max_async` set get their own priority-limited worker pool, calls keep
+    the priority they were given by LightRAG's limiter there. Once the recovery timeout
+    has passed, an open breaker lets a single trial request through and closes again
+    when it succeeds.
 
     Usage example:
         ```python
@@ -59,34 +83,153 @@ class MultiModel:
         ```
     """
 
-    def __init__(self, models: list[Model]):
+    def __init__(
+        self,
+        models: list[Model],
+        strategy: Literal["ewma", "least_outstanding", "round_robin"] = "ewma",
+        failure_threshold: int = 3,
+        recovery_timeout: float = 30.0,
+        ewma_alpha: float = 0.3,
+    ):
         self._models = models
         self._current_model = 0
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.ewma_alpha = ewma_alpha
+        self._states = [
+            _ModelState(
+                gen_func=priority_limit_async_func_call(model.max_async)(model.gen_func)
+                if model.max_async
+                else model.gen_func
+            )
+            for model in models
+        ]
 
     def _next_model(self):
         self._current_model = (self._current_model + 1) % len(self._models)
         return self._models[self._current_model]
 
+    def _is_available(self, index: int, now: float) -> bool:
+        state = self._states[index]
+        if not state.open_until:
+            return True
+        # Half-open: one trial request at a time until it succeeds
+        return state.open_until <= now and not state.trial_in_flight
+
+    def _score(self, index: int) -> float:
+        state = self._states[index]
+        weight = max(self._models[index].weight, 1e-6)
+        if self.strategy == "least_outstanding":
+            return state.outstanding / weight
+        # Models without samples yet look as fast as the fastest known one, so they get probed
+        known = [s.ewma_latency for s in self._states if s.ewma_latency is not None]
+        latency = state.ewma_latency
+        if latency is None:
+            latency = min(known) if known else 1.0
+        return latency * (state.outstanding + 1) / weight
+
+    def _select_model(self, exclude: set[int]) -> int:
+        candidates = [i for i in range(len(self._models)) if i not in exclude]
+        now = time.monotonic()
+        available = [i for i in candidates if self._is_available(i, now)]
+        if not available:
+            # Every breaker is open: fail open on the one that recovers first
+            return min(candidates, key=lambda i: self._states[i].open_until)
+
+        if self.strategy == "round_robin":
+            for _ in range(len(self._models)):
+                self._next_model()
+                if self._current_model in available:
+                    return self._current_model
+
+        # Rotate the starting point so ties are spread across models
+        self._current_model = (self._current_model + 1) % len(self._models)
+        available.sort(key=lambda i: (i - self._current_model) % len(self._models))
+        return min(available, key=self._score)
+
+    def _record_success(self, index: int, latency: float):
+        state = self._states[index]
+        state.consecutive_failures = 0
+        state.open_until = 0.0
+        if state.ewma_latency is None:
+            state.ewma_latency = latency
+        else:
+            state.ewma_latency += self.ewma_alpha * (latency - state.ewma_latency)
+
+    def _record_failure(self, index: int):
+        state = self._states[index]
+        state.consecutive_failures += 1
+        if state.consecutive_failures >= self.failure_threshold:
+            state.open_until = time.monotonic() + self.recovery_timeout
+            logger.warning(
+                f"MultiModel: circuit opened for model {index} after "
+                f"{state.consecutive_failures} consecutive failures"
+            )
+
     async def llm_model_func(
         self,
         prompt: str,
         system_prompt: str | None = None,
         history_messages: list[dict[str, Any]] = [],
+        _priority: int = 10,
         **kwargs: Any,
     ) -> str:
         kwargs.pop("model", None)  # stop from overwriting the custom model name
         kwargs.pop("keyword_extraction", None)
         kwargs.pop("mode", None)
-        next_model = self._next_model()
-        args = dict(
-            prompt=prompt,
-            system_prompt=system_prompt,
-            history_messages=history_messages,
-            **kwargs,
-            **next_model.kwargs,
-        )
-
-        return await next_model.gen_func(**args)
+        tried: set[int] = set()
+        last_error: Exception | None = None
+        while len(tried) < len(self._models):
+            index = self._select_model(tried)
+            tried.add(index)
+            next_model = self._models[index]
+            state = self._states[index]
+            args = dict(
+                prompt=prompt,
+                system_prompt=system_prompt,
+                history_messages=history_messages,
+                **kwargs,
+                **next_model.kwargs,
+            )
+            if next_model.max_async:
+                # Per-model pools schedule by the caller's priority
+                args["_priority"] = _priority
+
+            trial = bool(state.open_until)
+            if trial:
+                state.trial_in_flight = True
+            state.outstanding += 1
+            started_at = time.monotonic()
+            try:
+                result = await state.gen_func(**args)
+            except Exception as e:
+                self._record_failure(index)
+                last_error = e
+                if len(tried) < len(self._models):
+                    logger.warning(f"MultiModel: model {index} failed ({e}), failing over")
+                continue
+            finally:
+                state.outstanding -= 1
+                if trial:
+                    state.trial_in_flight = False
+
+            self._record_success(index, time.monotonic() - started_at)
+            return result
+
+        raise last_error
+
+
+@dataclass
+class _ModelState:
+    """Routing and circuit breaker state of one model in a MultiModel"""
+
+    gen_func: Callable[..., Any]
+    outstanding: int = 0
+    ewma_latency: float | None = None
+    consecutive_failures: int = 0
+    open_until: float = 0.0
+    trial_in_flight: bool = False
 
 
 if __name__ == "__main__":
@@ -2,11 +2,14 @@ from __future__ import annotations
 from functools import partial
 
 import asyncio
+import heapq
 import json
+import logging
 import re
 import os
 from typing import Any, AsyncIterator
-from collections import Counter, defaultdict
+from collections import Counter, OrderedDict, defaultdict
+from collections.abc import Mapping
 
 from .utils import (
     logger,
@@ -26,6 +29,7 @@ from .utils import (
     get_conversation_turns,
     use_llm_func_with_cache,
     update_chunk_cache_list,
+    get_cpu_executor,
 )
 from .base import (
     BaseGraphStorage,
@@ -36,6 +40,13 @@ from .base import (
 )
 from .prompt import PROMPTS
 from .constants import GRAPH_FIELD_SEP
+from .kg.ranking_index import RankingIndexGraphStorage
+from .kg.shared_storage import get_update_flag, set_all_update_flags
+from .keyword_index import (
+    get_keyword_index,
+    invalidate_keyword_index,
+    update_keyword_index,
+)
 import time
 from dotenv import load_dotenv
 
@@ -44,6 +55,19 @@ from dotenv import load_dotenv
 # the OS environment variables take precedence over the .env file
 load_dotenv(dotenv_path=".env", override=False)
 
+# (workspace, namespace, entities with their source_id) -> chunk ranking, see
+# _rank_text_units_for_entities. A ranking also depends on the neighbours'
+# source_id, so every graph write in any process sets the graph's update flag
+# and the cache is cleared before the next lookup.
+_TEXT_UNIT_RANKING_CACHE_SIZE = 256
+_text_unit_ranking_cache: OrderedDict[tuple, list[tuple[str, int, int]]] = (
+    OrderedDict()
+)
+# (workspace, namespace) -> this process's update flag of the chunk ranking cache
+_text_unit_ranking_flags: dict[tuple[str, str], Any] = {}
+# Bumped when the cache is cleared, rankings computed across a clear are not kept
+_text_unit_ranking_generation = 0
+
 
 def chunking_by_token_size(
     tokenizer: Tokenizer,
@@ -53,18 +77,16 @@ def chunking_by_token_size(
     overlap_token_size: int = 128,
     max_token_size: int = 1024,
 ) -> list[dict[str, Any]]:
-    tokens = tokenizer.encode(content)
     results: list[dict[str, Any]] = []
     if split_by_character:
         raw_chunks = content.split(split_by_character)
+        raw_chunk_tokens = tokenizer.encode_batch(raw_chunks)
         new_chunks = []
         if split_by_character_only:
-            for chunk in raw_chunks:
-                _tokens = tokenizer.encode(chunk)
+            for chunk, _tokens in zip(raw_chunks, raw_chunk_tokens):
                 new_chunks.append((len(_tokens), chunk))
         else:
-            for chunk in raw_chunks:
-                _tokens = tokenizer.encode(chunk)
+            for chunk, _tokens in zip(raw_chunks, raw_chunk_tokens):
                 if len(_tokens) > max_token_size:
                     for start in range(
                         0, len(_tokens), max_token_size - overlap_token_size
@@ -86,6 +108,7 @@ def chunking_by_token_size(
                 }
             )
     else:
+        tokens = tokenizer.encode(content)
         for index, start in enumerate(
             range(0, len(tokens), max_token_size - overlap_token_size)
         ):
@@ -122,14 +145,18 @@ async def _handle_entity_relation_summary(
         "language", PROMPTS["DEFAULT_LANGUAGE"]
     )
 
-    tokens = tokenizer.encode(description)
-
     ### summarize is not determined here anymore (It's determined by num_fragment now)
     # if len(tokens) < summary_max_tokens:  # No need for summary
     #     return description
 
     prompt_template = PROMPTS["summarize_entity_descriptions"]
-    use_description = tokenizer.decode(tokens[:llm_max_tokens])
+    # Only encode the description when it actually has to be truncated
+    if tokenizer.count_tokens(description) > llm_max_tokens:
+        use_description = tokenizer.decode(
+            tokenizer.encode(description)[:llm_max_tokens]
+        )
+    else:
+        use_description = description
     context_base = dict(
         entity_name=entity_or_relation_name,
         description_list=use_description.split(GRAPH_FIELD_SEP),
@@ -149,11 +176,11 @@ async def _handle_entity_relation_summary(
     return summary
 
 
-async def _handle_single_entity_extraction(
+def _parse_entity_record(
     record_attributes: list[str],
     chunk_key: str,
     file_path: str = "unknown_source",
-):
+) -> dict | None:
     if len(record_attributes) < 4 or '"entity"' not in record_attributes[0]:
         return None
 
@@ -202,11 +229,11 @@ async def _handle_single_entity_extraction(
     )
 
 
-async def _handle_single_relationship_extraction(
+def _parse_relationship_record(
     record_attributes: list[str],
     chunk_key: str,
     file_path: str = "unknown_source",
-):
+) -> dict | None:
     if len(record_attributes) < 5 or '"relationship"' not in record_attributes[0]:
         return None
     # add this record as edge
@@ -261,6 +288,60 @@ async def _handle_single_relationship_extraction(
     )
 
 
+def parse_extraction_records(
+    extraction_result: str, chunk_key: str, file_path: str = "unknown_source"
+) -> tuple[defaultdict, defaultdict]:
+    """Parse the records of an extraction result (either initial or gleaning)
+
+    Pure CPU work without awaits, so it can run in a CPUExecutor.
+
+    Args:
+        extraction_result: The LLM extraction result of a single chunk
+        chunk_key: The chunk key for source tracking
+        file_path: The file path for citation
+
+    Returns:
+        Tuple of (maybe_nodes, maybe_edges) keyed by entity name and (src, tgt)
+    """
+    maybe_nodes = defaultdict(list)
+    maybe_edges = defaultdict(list)
+
+    records = split_string_by_multi_markers(
+        extraction_result,
+        [PROMPTS["DEFAULT_RECORD_DELIMITER"], PROMPTS["DEFAULT_COMPLETION_DELIMITER"]],
+    )
+    for record in records:
+        record = re.search(r"\((.*)\)", record)
+        if record is None:
+            continue
+        record = record.group(1)
+        record_attributes = split_string_by_multi_markers(
+            record, [PROMPTS["DEFAULT_TUPLE_DELIMITER"]]
+        )
+
+        entity_data = _parse_entity_record(record_attributes, chunk_key, file_path)
+        if entity_data is not None:
+            maybe_nodes[entity_data["entity_name"]].append(entity_data)
+            continue
+
+        relationship_data = _parse_relationship_record(
+            record_attributes, chunk_key, file_path
+        )
+        if relationship_data is not None:
+            maybe_edges[
+                (relationship_data["src_id"], relationship_data["tgt_id"])
+            ].append(relationship_data)
+
+    return maybe_nodes, maybe_edges
+
+
+def _parse_extraction_records_batch(
+    items: list[tuple[str, str, str]],
+) -> list[tuple[defaultdict, defaultdict]]:
+    """Batched parse_extraction_records over (extraction_result, chunk_key, file_path) items"""
+    return [parse_extraction_records(*item) for item in items]
+
+
 async def _rebuild_knowledge_from_chunks(
     entities_to_rebuild: dict[str, set[str]],
     relationships_to_rebuild: dict[tuple[str, str], set[str]],
@@ -432,6 +513,115 @@ async def _rebuild_knowledge_from_chunks(
             pipeline_status["history_messages"].append(status_message)
 
 
+_PACKED_CHUNK_MARKER = re.compile(
+    r'\(\s*"?chunk"?\s*'
+    + re.escape(PROMPTS["DEFAULT_TUPLE_DELIMITER"])
+    + r'\s*"?(\d+)"?\s*\)',
+    re.IGNORECASE,
+)
+
+
+def _pack_chunks_for_extraction(
+    ordered_chunks: list[tuple[str, TextChunkSchema]],
+    max_chunks_per_pack: int,
+    max_pack_tokens: int,
+    marker_tokens: int = 0,
+) -> list[list[tuple[str, TextChunkSchema]]]:
+    """Group consecutive chunks into packs for a single extraction request
+
+    Args:
+        ordered_chunks: List of (chunk_key, chunk_data) in document order
+        max_chunks_per_pack: Maximum number of chunks in one pack
+        max_pack_tokens: Token budget for the packed chunk texts
+        marker_tokens: Token overhead added by the chunk marker of each chunk
+
+    Returns:
+        List of packs, each a list of (chunk_key, chunk_data). A chunk that does
+        not fit the budget on its own always forms a pack by itself.
+    """
+    if max_chunks_per_pack <= 1 or max_pack_tokens <= 0:
+        return [[chunk] for chunk in ordered_chunks]
+
+    packs = []
+    current_pack = []
+    current_tokens = 0
+    for chunk_key, chunk_dp in ordered_chunks:
+        chunk_tokens = chunk_dp["tokens"] + marker_tokens
+        if current_pack and (
+            len(current_pack) >= max_chunks_per_pack
+            or current_tokens + chunk_tokens > max_pack_tokens
+        ):
+            packs.append(current_pack)
+            current_pack = []
+            current_tokens = 0
+        current_pack.append((chunk_key, chunk_dp))
+        current_tokens += chunk_tokens
+    if current_pack:
+        packs.append(current_pack)
+    return packs
+
+
+def _split_packed_extraction_result(
+    extraction_result: str, chunk_ids: list[str]
+) -> dict[str, str] | None:
+    """Demultiplex the LLM output of a packed extraction request
+
+    Records following a ("chunk"<|>N) marker belong to the N-th chunk (1-based)
+    of the pack. If the LLM omitted or renumbered the markers, so that entity or
+    relationship records appear before any marker or after a marker with an
+    unknown chunk number, the result cannot be attributed and None is returned.
+
+    Args:
+        extraction_result: The LLM extraction result of the pack
+        chunk_ids: Chunk IDs in the order they were packed into the prompt
+
+    Returns:
+        Dict mapping chunk_id -> extraction result text of that chunk, or None
+        if records could not be attributed to the chunks of the pack
+    """
+    if len(chunk_ids) == 1:
+        return {chunk_ids[0]: extraction_result}
+
+    record_delimiter = PROMPTS["DEFAULT_RECORD_DELIMITER"]
+    # Isolate markers as records of their own, the LLM may omit the delimiter after them
+    isolated_result = _PACKED_CHUNK_MARKER.sub(
+        lambda m: f"{record_delimiter}{m.group(0)}{record_delimiter}",
+        extraction_result or "",
+    )
+    records = split_string_by_multi_markers(
+        isolated_result,
+        [record_delimiter, PROMPTS["DEFAULT_COMPLETION_DELIMITER"]],
+    )
+
+    tuple_delimiter = PROMPTS["DEFAULT_TUPLE_DELIMITER"]
+    chunk_records = {chunk_id: [] for chunk_id in chunk_ids}
+    current_chunk_id = None
+    unattributed_records = 0
+    for record in records:
+        marker = _PACKED_CHUNK_MARKER.fullmatch(record)
+        if marker is not None:
+            index = int(marker.group(1)) - 1
+            current_chunk_id = chunk_ids[index] if 0 <= index < len(chunk_ids) else None
+            continue
+        if current_chunk_id is not None:
+            chunk_records[current_chunk_id].append(record)
+        elif tuple_delimiter in record:
+            # Free text outside the markers is harmless, lost records are not
+            unattributed_records += 1
+
+    if unattributed_records:
+        logger.warning(
+            f"Packed extraction of {len(chunk_ids)} chunks has {unattributed_records} "
+            "records outside valid chunk markers"
+        )
+        return None
+
+    return {
+        chunk_id: record_delimiter.join(records)
+        for chunk_id, records in chunk_records.items()
+    }
+
+
 async def _get_cached_extraction_results(
     llm_response_cache: BaseKVStorage,
     chunk_ids: set[str],
@@ -456,7 +646,7 @@ async def _get_cached_extraction_results(
     # Read from storage
     chunk_data_list = await text_chunks_storage.get_by_ids(list(chunk_ids))
     for chunk_id, chunk_data in zip(chunk_ids, chunk_data_list):
-        if chunk_data and isinstance(chunk_data, dict):
+        if chunk_data and isinstance(chunk_data, Mapping):
             llm_cache_list = chunk_data.get("llm_cache_list", [])
             if llm_cache_list:
                 all_cache_ids.update(llm_cache_list)
@@ -477,22 +667,33 @@ async def _get_cached_extraction_results(
     for cache_id, cache_entry in zip(all_cache_ids, cache_data_list):
         if (
             cache_entry is not None
-            and isinstance(cache_entry, dict)
+            and isinstance(cache_entry, Mapping)
             and cache_entry.get("cache_type") == "extract"
-            and cache_entry.get("chunk_id") in chunk_ids
+            and cache_entry.get("chunk_id")
         ):
-            chunk_id = cache_entry["chunk_id"]
-            extraction_result = cache_entry["return"]
+            # Packed extraction requests record all their chunk IDs joined by GRAPH_FIELD_SEP
+            packed_chunk_ids = cache_entry["chunk_id"].split(GRAPH_FIELD_SEP)
+            if chunk_ids.isdisjoint(packed_chunk_ids):
+                continue
+            extraction_results = _split_packed_extraction_result(
+                cache_entry["return"], packed_chunk_ids
+            )
+            if extraction_results is None:
+                # The chunks were re-extracted one at a time and have their own entries
+                continue
             create_time = cache_entry.get(
                 "create_time", 0
             )  # Get creation time, default to 0
             valid_entries += 1
 
-            # Support multiple LLM caches per chunk
-            if chunk_id not in cached_results:
-                cached_results[chunk_id] = []
-            # Store tuple with extraction result and creation time for sorting
-            cached_results[chunk_id].append((extraction_result, create_time))
+            for chunk_id, extraction_result in extraction_results.items():
+                if chunk_id not in chunk_ids:
+                    continue
+                # Support multiple LLM caches per chunk
+                if chunk_id not in cached_results:
+                    cached_results[chunk_id] = []
+                # Store tuple with extraction result and creation time for sorting
+                cached_results[chunk_id].append((extraction_result, create_time))
 
     # Sort extraction results by create_time for each chunk
     for chunk_id in cached_results:
@@ -527,46 +728,62 @@ async def _parse_extraction_result(
         if chunk_data
         else "unknown_source"
     )
-    context_base = dict(
-        tuple_delimiter=PROMPTS["DEFAULT_TUPLE_DELIMITER"],
-        record_delimiter=PROMPTS["DEFAULT_RECORD_DELIMITER"],
-        completion_delimiter=PROMPTS["DEFAULT_COMPLETION_DELIMITER"],
-    )
-    maybe_nodes = defaultdict(list)
-    maybe_edges = defaultdict(list)
-
     # Parse the extraction result using the same logic as in extract_entities
-    records = split_string_by_multi_markers(
-        extraction_result,
-        [context_base["record_delimiter"], context_base["completion_delimiter"]],
+    maybe_nodes, maybe_edges = parse_extraction_records(
+        extraction_result, chunk_id, file_path
     )
-    for record in records:
-        record = re.search(r"\((.*)\)", record)
-        if record is None:
-            continue
-        record = record.group(1)
-        record_attributes = split_string_by_multi_markers(
-            record, [context_base["tuple_delimiter"]]
-        )
 
-        # Try to parse as entity
-        entity_data = await _handle_single_entity_extraction(
-            record_attributes, chunk_id, file_path
-        )
-        if entity_data is not None:
-            maybe_nodes[entity_data["entity_name"]].append(entity_data)
-            continue
+    return dict(maybe_nodes), dict(maybe_edges)
 
-        # Try to parse as relationship
-        relationship_data = await _handle_single_relationship_extraction(
-            record_attributes, chunk_id, file_path
-        )
-        if relationship_data is not None:
-            maybe_edges[
-                (relationship_data["src_id"], relationship_data["tgt_id"])
-            ].append(relationship_data)
 
-    return dict(maybe_nodes), dict(maybe_edges)
+async def load_cached_extraction_results(
+    chunk_ids: list[str],
+    llm_response_cache: BaseKVStorage,
+    text_chunks_storage: BaseKVStorage,
+) -> dict[str, tuple[dict, dict]]:
+    """Recover extraction results of already extracted chunks from the LLM cache
+
+    Used to resume a failed document without calling the LLM again for chunks
+    whose extraction completed in a previous run.
+
+    Args:
+        chunk_ids: Chunk IDs whose extraction completed previously
+        llm_response_cache: LLM response cache storage
+        text_chunks_storage: Text chunks storage holding each chunk's llm_cache_list
+
+    Returns:
+        Dict mapping chunk_id -> (maybe_nodes, maybe_edges) in the same shape as
+        extract_entities results. Chunks without cached results are omitted.
+    """
+    if not chunk_ids:
+        return {}
+
+    cached_results = await _get_cached_extraction_results(
+        llm_response_cache,
+        set(chunk_ids),
+        text_chunks_storage=text_chunks_storage,
+    )
+
+    recovered = {}
+    for chunk_id, extraction_results in cached_results.items():
+        maybe_nodes = defaultdict(list)
+        maybe_edges = defaultdict(list)
+        # The first result is the initial extraction, only new names are accepted from gleaning
+        for extraction_result in extraction_results:
+            entities, relationships = await _parse_extraction_result(
+                text_chunks_storage=text_chunks_storage,
+                extraction_result=extraction_result,
+                chunk_id=chunk_id,
+            )
+            for entity_name, entity_list in entities.items():
+                if entity_name not in maybe_nodes:
+                    maybe_nodes[entity_name].extend(entity_list)
+            for rel_key, rel_list in relationships.items():
+                if rel_key not in maybe_edges:
+                    maybe_edges[rel_key].extend(rel_list)
+        recovered[chunk_id] = (maybe_nodes, maybe_edges)
+
+    return recovered
 
 
 async def _rebuild_single_entity(
@@ -585,6 +802,8 @@ async def _rebuild_single_entity(
     if not current_entity:
         return
 
+    tokenizer: Tokenizer = global_config["tokenizer"]
+
     # Helper function to update entity in both graph and vector storage
     async def _update_entity_storage(
         final_description: str, entity_type: str, file_paths: set[str]
@@ -593,6 +812,7 @@ async def _rebuild_single_entity(
         updated_entity_data = {
             **current_entity,
             "description": final_description,
+            "description_tokens": tokenizer.count_tokens(final_description),
             "entity_type": entity_type,
             "source_id": GRAPH_FIELD_SEP.join(chunk_ids),
             "file_path": GRAPH_FIELD_SEP.join(file_paths)
@@ -792,9 +1012,11 @@ async def _rebuild_single_relationship(
         final_description = combined_description
 
     # Update relationship in graph storage
+    tokenizer: Tokenizer = global_config["tokenizer"]
     updated_relationship_data = {
         **current_relationship,
         "description": final_description,
+        "description_tokens": tokenizer.count_tokens(final_description),
         "keywords": combined_keywords,
         "weight": weight,
         "source_id": GRAPH_FIELD_SEP.join(chunk_ids),
@@ -834,22 +1056,32 @@ async def _rebuild_single_relationship(
     )
 
 
-async def _merge_nodes_then_upsert(
+def _stored_description_tokens(data: dict) -> int | None:
+    """Token count of a node or edge description computed at ingest time, if any"""
+    count = data.get("description_tokens")
+    if count is None or count == "":
+        return None
+    try:
+        return int(count)
+    except (TypeError, ValueError):
+        return None
+
+
+async def _merge_nodes(
     entity_name: str,
     nodes_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_node: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
-    """Get existing nodes from knowledge graph use name,if exists, merge data, else create, then upsert."""
+) -> dict:
+    """Merge extracted node data with the existing node, if any, and return the node data to upsert."""
     already_entity_types = []
     already_source_ids = []
     already_description = []
     already_file_paths = []
 
-    already_node = await knowledge_graph_inst.get_node(entity_name)
     if already_node:
         already_entity_types.append(already_node["entity_type"])
         already_source_ids.extend(
@@ -904,32 +1136,35 @@ async def _merge_nodes_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
+    tokenizer: Tokenizer = global_config["tokenizer"]
     node_data = dict(
         entity_id=entity_name,
         entity_type=entity_type,
         description=description,
+        description_tokens=tokenizer.count_tokens(description),
         source_id=source_id,
         file_path=file_path,
         created_at=int(time.time()),
     )
-    await knowledge_graph_inst.upsert_node(
-        entity_name,
-        node_data=node_data,
-    )
-    node_data["entity_name"] = entity_name
     return node_data
 
 
-async def _merge_edges_then_upsert(
+async def _merge_edges(
     src_id: str,
     tgt_id: str,
     edges_data: list[dict],
-    knowledge_graph_inst: BaseGraphStorage,
+    already_edge: dict | None,
     global_config: dict,
     pipeline_status: dict = None,
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
-):
+) -> tuple[dict, dict] | None:
+    """Merge extracted edge data with the existing edge, if any.
+
+    Returns:
+        (edge properties to upsert, node data for endpoints missing from the graph),
+        or None for self loops
+    """
     if src_id == tgt_id:
         return None
 
@@ -939,40 +1174,32 @@ async def _merge_edges_then_upsert(
     already_keywords = []
     already_file_paths = []
 
-    if await knowledge_graph_inst.has_edge(src_id, tgt_id):
-        already_edge = await knowledge_graph_inst.get_edge(src_id, tgt_id)
-        # Handle the case where get_edge returns None or missing fields
-        if already_edge:
-            # Get weight with default 0.0 if missing
-            already_weights.append(already_edge.get("weight", 0.0))
-
-            # Get source_id with empty string default if missing or None
-            if already_edge.get("source_id") is not None:
-                already_source_ids.extend(
-                    split_string_by_multi_markers(
-                        already_edge["source_id"], [GRAPH_FIELD_SEP]
-                    )
-                )
+    # Handle the case where the stored edge is missing or has missing fields
+    if already_edge:
+        # Get weight with default 0.0 if missing
+        already_weights.append(already_edge.get("weight", 0.0))
 
-            # Get file_path with empty string default if missing or None
-            if already_edge.get("file_path") is not None:
-                already_file_paths.extend(
-                    split_string_by_multi_markers(
-                        already_edge["file_path"], [GRAPH_FIELD_SEP]
-                    )
-                )
+        # Get source_id with empty string default if missing or None
+        if already_edge.get("source_id") is not None:
+            already_source_ids.extend(
+                split_string_by_multi_markers(already_edge["source_id"], [GRAPH_FIELD_SEP])
+            )
+
+        # Get file_path with empty string default if missing or None
+        if already_edge.get("file_path") is not None:
+            already_file_paths.extend(
+                split_string_by_multi_markers(already_edge["file_path"], [GRAPH_FIELD_SEP])
+            )
 
-            # Get description with empty string default if missing or None
-            if already_edge.get("description") is not None:
-                already_description.append(already_edge["description"])
+        # Get description with empty string default if missing or None
+        if already_edge.get("description") is not None:
+            already_description.append(already_edge["description"])
 
-            # Get keywords with empty string default if missing or None
-            if already_edge.get("keywords") is not None:
-                already_keywords.extend(
-                    split_string_by_multi_markers(
-                        already_edge["keywords"], [GRAPH_FIELD_SEP]
-                    )
-                )
+        # Get keywords with empty string default if missing or None
+        if already_edge.get("keywords") is not None:
+            already_keywords.extend(
+                split_string_by_multi_markers(already_edge["keywords"], [GRAPH_FIELD_SEP])
+            )
 
     # Process edges_data with None checks
     weight = sum([dp["weight"] for dp in edges_data] + already_weights)
@@ -1013,29 +1240,16 @@ async def _merge_edges_then_upsert(
         )
     )
 
-    for need_insert_id in [src_id, tgt_id]:
-        if not (await knowledge_graph_inst.has_node(need_insert_id)):
-            # # Discard this edge if the node does not exist
-            # if need_insert_id == src_id:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Source node missing"
-            #     )
-            # else:
-            #     logger.warning(
-            #         f"Discard edge: {src_id} - {tgt_id} | Target node missing"
-            #     )
-            # return None
-            await knowledge_graph_inst.upsert_node(
-                need_insert_id,
-                node_data={
-                    "entity_id": need_insert_id,
-                    "source_id": source_id,
-                    "description": description,
-                    "entity_type": "UNKNOWN",
-                    "file_path": file_path,
-                    "created_at": int(time.time()),
-                },
-            )
+    tokenizer: Tokenizer = global_config["tokenizer"]
+    # Node data for an endpoint missing from the graph, entity_id is set by the caller
+    missing_node_data = {
+        "source_id": source_id,
+        "description": description,
+        "description_tokens": tokenizer.count_tokens(description),
+        "entity_type": "UNKNOWN",
+        "file_path": file_path,
+        "created_at": int(time.time()),
+    }
 
     force_llm_summary_on_merge = global_config["force_llm_summary_on_merge"]
 
@@ -1066,30 +1280,17 @@ async def _merge_edges_then_upsert(
                     pipeline_status["latest_message"] = status_message
                     pipeline_status["history_messages"].append(status_message)
 
-    await knowledge_graph_inst.upsert_edge(
-        src_id,
-        tgt_id,
-        edge_data=dict(
-            weight=weight,
-            description=description,
-            keywords=keywords,
-            source_id=source_id,
-            file_path=file_path,
-            created_at=int(time.time()),
-        ),
-    )
-
     edge_data = dict(
-        src_id=src_id,
-        tgt_id=tgt_id,
+        weight=weight,
         description=description,
+        description_tokens=tokenizer.count_tokens(description),
         keywords=keywords,
         source_id=source_id,
         file_path=file_path,
         created_at=int(time.time()),
     )
 
-    return edge_data
+    return edge_data, missing_node_data
 
 
 async def merge_nodes_and_edges(
@@ -1150,33 +1351,86 @@ async def merge_nodes_and_edges(
             pipeline_status["latest_message"] = log_message
             pipeline_status["history_messages"].append(log_message)
 
-        # Process and update all entities at once
+        # Read the existing nodes and edges in batches instead of one query each
+        already_nodes = await knowledge_graph_inst.get_nodes_batch(list(all_nodes))
+        already_edges = await knowledge_graph_inst.get_edges_batch(
+            [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in all_edges]
+        )
+
+        # Merge all entities, then write them with one batch upsert
+        nodes_to_upsert = {}
         for entity_name, entities in all_nodes.items():
-            entity_data = await _merge_nodes_then_upsert(
+            node_data = await _merge_nodes(
                 entity_name,
                 entities,
-                knowledge_graph_inst,
+                already_nodes.get(entity_name),
                 global_config,
                 pipeline_status,
                 pipeline_status_lock,
                 llm_response_cache,
             )
-            entities_data.append(entity_data)
+            nodes_to_upsert[entity_name] = node_data
+            entities_data.append({**node_data, "entity_name": entity_name})
+        await knowledge_graph_inst.upsert_nodes_batch(nodes_to_upsert)
+
+        # Edge endpoints that were not extracted as entities may be missing from the graph
+        existing_endpoints = set(all_nodes)
+        other_endpoints = {
+            node_id
+            for edge_key in all_edges
+            for node_id in edge_key
+            if node_id not in existing_endpoints
+        }
+        if other_endpoints:
+            existing_endpoints.update(
+                await knowledge_graph_inst.get_nodes_batch(list(other_endpoints))
+            )
 
-        # Process and update all relationships at once
+        # Merge all relationships, then write missing endpoints and edges in batches
+        missing_nodes = {}
+        edges_to_upsert = {}
         for edge_key, edges in all_edges.items():
-            edge_data = await _merge_edges_then_upsert(
-                edge_key[0],
-                edge_key[1],
+            src_id, tgt_id = edge_key
+            merged = await _merge_edges(
+                src_id,
+                tgt_id,
                 edges,
-                knowledge_graph_inst,
+                already_edges.get(edge_key) or already_edges.get((tgt_id, src_id)),
                 global_config,
                 pipeline_status,
                 pipeline_status_lock,
                 llm_response_cache,
             )
-            if edge_data is not None:
-                relationships_data.append(edge_data)
+            if merged is None:
+                continue
+            edge_data, missing_node_data = merged
+            for node_id in edge_key:
+                if node_id not in existing_endpoints and node_id not in missing_nodes:
+                    missing_nodes[node_id] = {"entity_id": node_id, **missing_node_data}
+            edges_to_upsert[edge_key] = edge_data
+            relationships_data.append(
+                dict(
+                    src_id=src_id,
+                    tgt_id=tgt_id,
+                    description=edge_data["description"],
+                    keywords=edge_data["keywords"],
+                    source_id=edge_data["source_id"],
+                    file_path=edge_data["file_path"],
+                    created_at=edge_data["created_at"],
+                )
+            )
+        await knowledge_graph_inst.upsert_nodes_batch(missing_nodes)
+        await knowledge_graph_inst.upsert_edges_batch(edges_to_upsert)
+        # Neighbourhoods changed, cached chunk rankings may be stale
+        await _invalidate_text_unit_rankings(knowledge_graph_inst)
+        await update_keyword_index(
+            knowledge_graph_inst,
+            list(nodes_to_upsert) + list(missing_nodes),
+            {
+                edge_key: edge_data["keywords"]
+                for edge_key, edge_data in edges_to_upsert.items()
+            },
+        )
 
         # Update total counts
         total_entities_count = len(entities_data)
@@ -1224,6 +1478,23 @@ async def merge_nodes_and_edges(
             }
             await relationships_vdb.upsert(data_for_vdb)
 
+    if isinstance(knowledge_graph_inst, RankingIndexGraphStorage):
+        # Rebuild the rankings of the merged entities after releasing the lock,
+        # a write in between only keeps the index from storing them
+        await knowledge_graph_inst.entity_rankings(list(nodes_to_upsert))
+
+
+async def invalidate_graph_query_caches(
+    knowledge_graph_inst: BaseGraphStorage,
+) -> None:
+    """Drop the query caches derived from the graph in every process
+
+    Call after graph writes outside merge_nodes_and_edges, such as deletions,
+    entity edits and custom KG inserts.
+    """
+    await _invalidate_text_unit_rankings(knowledge_graph_inst)
+    await invalidate_keyword_index(knowledge_graph_inst)
+
 
 async def extract_entities(
     chunks: dict[str, TextChunkSchema],
@@ -1232,6 +1503,7 @@ async def extract_entities(
     pipeline_status_lock=None,
     llm_response_cache: BaseKVStorage | None = None,
     text_chunks_storage: BaseKVStorage | None = None,
+    extracted_chunk_keys: set[str] | None = None,
 ) -> list:
     use_llm_func: callable = global_config["llm_model_func"]
     entity_extract_max_gleaning = global_config["entity_extract_max_gleaning"]
@@ -1278,76 +1550,74 @@ async def extract_entities(
     processed_chunks = 0
     total_chunks = len(ordered_chunks)
 
+    def _build_packed_input_text(chunk_pack: list[tuple[str, TextChunkSchema]]) -> str:
+        packed_text = "\n\n".join(
+            f'("chunk"{context_base["tuple_delimiter"]}{index})\n{chunk_dp["content"]}'
+            for index, (_, chunk_dp) in enumerate(chunk_pack, start=1)
+        )
+        return PROMPTS["entity_extraction_packed_input"].format(
+            **context_base, chunk_count=len(chunk_pack), packed_text=packed_text
+        )
+
+    cpu_executor = get_cpu_executor(
+        global_config.get("cpu_executor"),
+        global_config.get("cpu_executor_max_workers"),
+    )
+
     async def _process_extraction_result(
-        result: str, chunk_key: str, file_path: str = "unknown_source"
-    ):
-        """Process a single extraction result (either initial or gleaning)
+        chunk_extraction_results: dict[str, str], file_paths: dict[str, str]
+    ) -> dict[str, tuple[defaultdict, defaultdict]]:
+        """Process an extraction result (either initial or gleaning) of a chunk pack
         Args:
-            result (str): The extraction result to process
-            chunk_key (str): The chunk key for source tracking
-            file_path (str): The file path for citation
+            chunk_extraction_results (dict[str, str]): chunk_key -> extraction result text of that chunk
+            file_paths (dict[str, str]): The file path of each chunk for citation
         Returns:
-            tuple: (nodes_dict, edges_dict) containing the extracted entities and relationships
+            dict: chunk_key -> (nodes_dict, edges_dict) containing the extracted entities and relationships
         """
-        maybe_nodes = defaultdict(list)
-        maybe_edges = defaultdict(list)
-
-        records = split_string_by_multi_markers(
-            result,
-            [context_base["record_delimiter"], context_base["completion_delimiter"]],
+        parsed_results = await cpu_executor.map_batched(
+            _parse_extraction_records_batch,
+            [
+                (chunk_result, chunk_key, file_paths[chunk_key])
+                for chunk_key, chunk_result in chunk_extraction_results.items()
+            ],
         )
+        return dict(zip(chunk_extraction_results.keys(), parsed_results))
 
-        for record in records:
-            record = re.search(r"\((.*)\)", record)
-            if record is None:
-                continue
-            record = record.group(1)
-            record_attributes = split_string_by_multi_markers(
-                record, [context_base["tuple_delimiter"]]
-            )
-
-            if_entities = await _handle_single_entity_extraction(
-                record_attributes, chunk_key, file_path
-            )
-            if if_entities is not None:
-                maybe_nodes[if_entities["entity_name"]].append(if_entities)
-                continue
-
-            if_relation = await _handle_single_relationship_extraction(
-                record_attributes, chunk_key, file_path
-            )
-            if if_relation is not None:
-                maybe_edges[(if_relation["src_id"], if_relation["tgt_id"])].append(
-                    if_relation
-                )
-
-        return maybe_nodes, maybe_edges
-
-    async def _process_single_content(chunk_key_dp: tuple[str, TextChunkSchema]):
-        """Process a single chunk
+    async def _process_single_content(
+        chunk_pack: list[tuple[str, TextChunkSchema]],
+    ) -> list[tuple[dict, dict]]:
+        """Process a single chunk, or a pack of chunks sharing one extraction request
         Args:
-            chunk_key_dp (tuple[str, TextChunkSchema]):
-                ("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int})
+            chunk_pack (list[tuple[str, TextChunkSchema]]):
+                [("chunk-xxxxxx", {"tokens": int, "content": str, "full_doc_id": str, "chunk_order_index": int}), ...]
         Returns:
-            tuple: (maybe_nodes, maybe_edges) containing extracted entities and relationships
+            list: (maybe_nodes, maybe_edges) of every chunk in the pack, in pack order
         """
         nonlocal processed_chunks
-        chunk_key = chunk_key_dp[0]
-        chunk_dp = chunk_key_dp[1]
-        content = chunk_dp["content"]
+        chunk_keys = [chunk_key for chunk_key, _ in chunk_pack]
         # Get file path from chunk data or use default
-        file_path = chunk_dp.get("file_path", "unknown_source")
+        file_paths = {
+            chunk_key: chunk_dp.get("file_path", "unknown_source")
+            for chunk_key, chunk_dp in chunk_pack
+        }
+
+        if len(chunk_pack) == 1:
+            input_text = chunk_pack[0][1]["content"]
+            cache_chunk_id = chunk_keys[0]
+        else:
+            input_text = _build_packed_input_text(chunk_pack)
+            cache_chunk_id = GRAPH_FIELD_SEP.join(chunk_keys)
 
         # Create cache keys collector for batch processing
         cache_keys_collector = []
 
         # Get initial extraction
         hint_prompt = entity_extract_prompt.format(
-            **{**context_base, "input_text": content}
+            **{**context_base, "input_text": input_text}
         )
 
         continue_prompt = PROMPTS["entity_continue_extraction"].format(
-            **{**context_base, "input_text": content}
+            **{**context_base, "input_text": input_text}
         )
 
         final_result = await use_llm_func_with_cache(
@@ -1355,17 +1625,38 @@ async def extract_entities(
             use_llm_func,
             llm_response_cache=llm_response_cache,
             cache_type="extract",
-            chunk_id=chunk_key,
+            chunk_id=cache_chunk_id,
             cache_keys_collector=cache_keys_collector,
         )
 
+        chunk_extraction_results = _split_packed_extraction_result(
+            final_result, chunk_keys
+        )
+        if len(chunk_pack) > 1 and (
+            chunk_extraction_results is None
+            or not any(chunk_extraction_results.values())
+        ):
+            # Don't accept empty results for the whole pack when the markers were mangled
+            logger.warning(
+                f"Packed extraction returned no records attributable to its chunks, "
+                f"re-extracting {len(chunk_pack)} chunks one at a time"
+            )
+            results = await asyncio.gather(
+                *(_process_single_content([chunk]) for chunk in chunk_pack)
+            )
+            return [chunk_result for result in results for chunk_result in result]
+
         # Store LLM cache reference in chunk (will be handled by use_llm_func_with_cache)
         history = pack_user_ass_to_openai_messages(hint_prompt, final_result)
 
         # Process initial extraction with file path
-        maybe_nodes, maybe_edges = await _process_extraction_result(
-            final_result, chunk_key, file_path
-        )
+        chunk_nodes = {}
+        chunk_edges = {}
+        for chunk_key, (maybe_nodes, maybe_edges) in (
+            await _process_extraction_result(chunk_extraction_results, file_paths)
+        ).items():
+            chunk_nodes[chunk_key] = maybe_nodes
+            chunk_edges[chunk_key] = maybe_edges
 
         # Process additional gleaning results
         for now_glean_index in range(entity_extract_max_gleaning):
@@ -1375,28 +1666,35 @@ async def extract_entities(
                 llm_response_cache=llm_response_cache,
                 history_messages=history,
                 cache_type="extract",
-                chunk_id=chunk_key,
+                chunk_id=cache_chunk_id,
                 cache_keys_collector=cache_keys_collector,
             )
 
             history += pack_user_ass_to_openai_messages(continue_prompt, glean_result)
 
-            # Process gleaning result separately with file path
-            glean_nodes, glean_edges = await _process_extraction_result(
-                glean_result, chunk_key, file_path
-            )
+            # A gleaning that can't be attributed to chunks adds nothing
+            glean_extraction_results = _split_packed_extraction_result(
+                glean_result, chunk_keys
+            ) or {chunk_key: "" for chunk_key in chunk_keys}
 
-            # Merge results - only add entities and edges with new names
-            for entity_name, entities in glean_nodes.items():
-                if (
-                    entity_name not in maybe_nodes
-                ):  # Only accetp entities with new name in gleaning stage
-                    maybe_nodes[entity_name].extend(entities)
-            for edge_key, edges in glean_edges.items():
-                if (
-                    edge_key not in maybe_edges
-                ):  # Only accetp edges with new name in gleaning stage
-                    maybe_edges[edge_key].extend(edges)
+            # Process gleaning result separately with file path
+            for chunk_key, (glean_nodes, glean_edges) in (
+                await _process_extraction_result(glean_extraction_results, file_paths)
+            ).items():
+                maybe_nodes = chunk_nodes[chunk_key]
+                maybe_edges = chunk_edges[chunk_key]
+
+                # Merge results - only add entities and edges with new names
+                for entity_name, entities in glean_nodes.items():
+                    if (
+                        entity_name not in maybe_nodes
+                    ):  # Only accetp entities with new name in gleaning stage
+                        maybe_nodes[entity_name].extend(entities)
+                for edge_key, edges in glean_edges.items():
+                    if (
+                        edge_key not in maybe_edges
+                    ):  # Only accetp edges with new name in gleaning stage
+                        maybe_edges[edge_key].extend(edges)
 
             if now_glean_index == entity_extract_max_gleaning - 1:
                 break
@@ -1415,37 +1713,96 @@ async def extract_entities(
 
         # Batch update chunk's llm_cache_list with all collected cache keys
         if cache_keys_collector and text_chunks_storage:
-            await update_chunk_cache_list(
-                chunk_key,
-                text_chunks_storage,
-                cache_keys_collector,
-                "entity_extraction",
+            for chunk_key in chunk_keys:
+                await update_chunk_cache_list(
+                    chunk_key,
+                    text_chunks_storage,
+                    cache_keys_collector,
+                    "entity_extraction",
+                )
+
+        # Record completed chunks so a failed document can resume from them
+        if extracted_chunk_keys is not None:
+            extracted_chunk_keys.update(chunk_keys)
+
+        results = []
+        for chunk_key in chunk_keys:
+            maybe_nodes = chunk_nodes[chunk_key]
+            maybe_edges = chunk_edges[chunk_key]
+            processed_chunks += 1
+            entities_count = len(maybe_nodes)
+            relations_count = len(maybe_edges)
+            log_message = f"Chunk {processed_chunks} of {total_chunks} extracted {entities_count} Ent + {relations_count} Rel"
+            logger.info(log_message)
+            if pipeline_status is not None:
+                async with pipeline_status_lock:
+                    pipeline_status["latest_message"] = log_message
+                    pipeline_status["history_messages"].append(log_message)
+            results.append((maybe_nodes, maybe_edges))
+
+        # Return the extracted nodes and edges for centralized processing
+        return results
+
+    # Pack small chunks into shared extraction requests when enabled
+    chunk_packs = [[chunk] for chunk in ordered_chunks]
+    pack_chunks = global_config.get("entity_extract_pack_chunks", 1)
+    if pack_chunks > 1 and total_chunks > 1:
+        tokenizer: Tokenizer = global_config["tokenizer"]
+        single_prompt_tokens = len(
+            tokenizer.encode(
+                entity_extract_prompt.format(**{**context_base, "input_text": ""})
+            )
+        )
+        packed_prompt_tokens = len(
+            tokenizer.encode(
+                entity_extract_prompt.format(
+                    **{**context_base, "input_text": _build_packed_input_text([])}
+                )
             )
+        )
+        marker_tokens = len(
+            tokenizer.encode(f'("chunk"{context_base["tuple_delimiter"]}{total_chunks})\n\n')
+        )
+        chunk_packs = _pack_chunks_for_extraction(
+            ordered_chunks,
+            pack_chunks,
+            global_config["llm_model_max_token_size"] - packed_prompt_tokens,
+            marker_tokens,
+        )
 
-        processed_chunks += 1
-        entities_count = len(maybe_nodes)
-        relations_count = len(maybe_edges)
-        log_message = f"Chunk {processed_chunks} of {total_chunks} extracted {entities_count} Ent + {relations_count} Rel"
+        # Input tokens of the initial extraction round, gleaning rounds save proportionally more
+        unpacked_tokens = sum(
+            single_prompt_tokens + chunk_dp["tokens"] for _, chunk_dp in ordered_chunks
+        )
+        packed_tokens = sum(
+            single_prompt_tokens + pack[0][1]["tokens"]
+            if len(pack) == 1
+            else packed_prompt_tokens
+            + sum(chunk_dp["tokens"] + marker_tokens for _, chunk_dp in pack)
+            for pack in chunk_packs
+        )
+        log_message = (
+            f"Packed {total_chunks} chunks into {len(chunk_packs)} extraction requests: "
+            f"saved {total_chunks - len(chunk_packs)} LLM calls and "
+            f"{unpacked_tokens - packed_tokens} input tokens ({packed_tokens} of {unpacked_tokens})"
+        )
         logger.info(log_message)
         if pipeline_status is not None:
             async with pipeline_status_lock:
                 pipeline_status["latest_message"] = log_message
                 pipeline_status["history_messages"].append(log_message)
 
-        # Return the extracted nodes and edges for centralized processing
-        return maybe_nodes, maybe_edges
-
     # Get max async tasks limit from global_config
     llm_model_max_async = global_config.get("llm_model_max_async", 4)
     semaphore = asyncio.Semaphore(llm_model_max_async)
 
-    async def _process_with_semaphore(chunk):
+    async def _process_with_semaphore(chunk_pack):
         async with semaphore:
-            return await _process_single_content(chunk)
+            return await _process_single_content(chunk_pack)
 
     tasks = []
-    for c in ordered_chunks:
-        task = asyncio.create_task(_process_with_semaphore(c))
+    for pack in chunk_packs:
+        task = asyncio.create_task(_process_with_semaphore(pack))
         tasks.append(task)
 
     # Wait for tasks to complete or for the first exception to occur
@@ -1467,13 +1824,228 @@ async def extract_entities(
             # Re-raise the exception to notify the caller
             raise task.exception()
 
-    # If all tasks completed successfully, collect results
-    chunk_results = [task.result() for task in tasks]
+    # If all tasks completed successfully, collect results in chunk order
+    chunk_results = [result for task in tasks for result in task.result()]
 
     # Return the chunk_results for later processing in merge_nodes_and_edges
     return chunk_results
 
 
+# Record in the community reports storage listing the current community ids
+_COMMUNITY_INDEX_KEY = "community_index"
+
+
+def _edge_weight(edge_data: dict) -> float:
+    try:
+        weight = float(edge_data.get("weight", 1.0))
+    except (TypeError, ValueError):
+        return 1.0
+    return weight if weight > 0 else 1.0
+
+
+def _detect_communities(
+    node_ids: list[str],
+    edge_weights: dict[tuple[str, str], float],
+    resolution: float,
+    seed: int = 42,
+) -> list[list[str]]:
+    """Louvain communities of the graph, each sorted, largest first
+
+    A fixed seed keeps the partition of an unchanged graph stable, so its
+    community reports are not regenerated.
+    """
+    import pipmaster as pm
+
+    if not pm.is_installed("networkx"):
+        pm.install("networkx")
+
+    import networkx as nx
+
+    graph = nx.Graph()
+    graph.add_nodes_from(node_ids)
+    for (src_id, tgt_id), weight in edge_weights.items():
+        graph.add_edge(src_id, tgt_id, weight=weight)
+    communities = nx.community.louvain_communities(
+        graph, weight="weight", resolution=resolution, seed=seed
+    )
+    return sorted((sorted(c) for c in communities), key=len, reverse=True)
+
+
+def _parse_community_report(report: str, fallback_title: str) -> tuple[str, str]:
+    """Split the LLM output into the title on its first line and the summary"""
+    lines = report.strip().splitlines()
+    title = lines[0].strip().strip("#*").strip() if lines else ""
+    summary = "\n".join(lines[1:]).strip()
+    if not title:
+        title = fallback_title
+    if not summary:
+        summary = report.strip()
+    return title, summary
+
+
+async def build_communities(
+    knowledge_graph_inst: BaseGraphStorage,
+    community_reports: BaseKVStorage,
+    communities_vdb: BaseVectorStorage,
+    global_config: dict[str, str],
+    llm_response_cache: BaseKVStorage | None = None,
+) -> dict[str, int]:
+    """Detect communities in the graph and write an LLM report for each changed one
+
+    Reports of communities whose members and member descriptions did not
+    change are kept without calling the LLM, reports of communities that no
+    longer exist are deleted.
+
+    Returns:
+        Number of "communities", "updated" reports and "deleted" reports
+    """
+    use_llm_func: callable = global_config["llm_model_func"]
+    # Same priority as entity/relation summaries
+    use_llm_func = partial(use_llm_func, _priority=8)
+    tokenizer: Tokenizer = global_config["tokenizer"]
+    llm_max_tokens = global_config["llm_model_max_token_size"]
+    language = global_config["addon_params"].get(
+        "language", PROMPTS["DEFAULT_LANGUAGE"]
+    )
+
+    node_ids = await knowledge_graph_inst.get_all_labels()
+    nodes, node_edges = await asyncio.gather(
+        knowledge_graph_inst.get_nodes_batch(node_ids),
+        knowledge_graph_inst.get_nodes_edges_batch(node_ids),
+    )
+    pairs = list(
+        {tuple(sorted(e)) for edges in node_edges.values() for e in edges or []}
+    )
+    edge_datas = await knowledge_graph_inst.get_edges_batch(
+        [{"src": src_id, "tgt": tgt_id} for src_id, tgt_id in pairs]
+    )
+    edges = {pair: edge_datas[pair] for pair in pairs if pair in edge_datas}
+    edge_weights = {pair: _edge_weight(data) for pair, data in edges.items()}
+
+    communities = await asyncio.to_thread(
+        _detect_communities,
+        [node_id for node_id in node_ids if node_id in nodes],
+        edge_weights,
+        global_config["community_resolution"],
+    )
+    communities = [
+        c for c in communities if len(c) >= global_config["community_min_size"]
+    ]
+
+    community_of = {
+        node_id: index
+        for index, members in enumerate(communities)
+        for node_id in members
+    }
+    community_edges = defaultdict(list)
+    for pair in edges:
+        index = community_of.get(pair[0])
+        if index is not None and index == community_of.get(pair[1]):
+            community_edges[index].append(pair)
+
+    # Build the report prompts, the prompt doubles as the change signature
+    prompts = {}
+    members_of = {}
+    for index, members in enumerate(communities):
+        degrees = Counter(
+            node_id for pair in community_edges[index] for node_id in pair
+        )
+        # Central members first, so truncation drops the periphery
+        members = sorted(members, key=lambda n: (-degrees[n], n))
+        entity_lines = truncate_list_by_token_size(
+            [
+                f"- {n} ({nodes[n].get('entity_type', 'UNKNOWN')}): {nodes[n].get('description', '')}"
+                for n in members
+            ],
+            key=lambda x: x,
+            max_token_size=llm_max_tokens // 2,
+            tokenizer=tokenizer,
+        )
+        relation_pairs = sorted(
+            community_edges[index], key=lambda p: edge_weights[p], reverse=True
+        )
+        relation_lines = truncate_list_by_token_size(
+            [
+                f"- {src_id} -- {tgt_id}: {edges[(src_id, tgt_id)].get('description', '')}"
+                for src_id, tgt_id in relation_pairs
+            ],
+            key=lambda x: x,
+            max_token_size=llm_max_tokens // 2,
+            tokenizer=tokenizer,
+        )
+        community_id = compute_mdhash_id(
+            GRAPH_FIELD_SEP.join(sorted(members)), prefix="community-"
+        )
+        members_of[community_id] = members
+        prompts[community_id] = PROMPTS["community_report"].format(
+            entities="\n".join(entity_lines),
+            relationships="\n".join(relation_lines),
+            language=language,
+        )
+
+    community_ids = list(prompts)
+    index_record, existing = await asyncio.gather(
+        community_reports.get_by_id(_COMMUNITY_INDEX_KEY),
+        community_reports.get_by_ids(community_ids),
+    )
+    changed_ids = [
+        community_id
+        for community_id, report in zip(community_ids, existing)
+        if report is None
+        or report.get("signature") != compute_mdhash_id(prompts[community_id])
+    ]
+
+    async def _write_report(community_id: str) -> str:
+        return await use_llm_func_with_cache(
+            prompts[community_id],
+            use_llm_func,
+            llm_response_cache=llm_response_cache,
+            max_tokens=global_config["summary_to_max_tokens"],
+            cache_type="community",
+        )
+
+    reports = await asyncio.gather(
+        *[_write_report(community_id) for community_id in changed_ids]
+    )
+
+    records = {}
+    data_for_vdb = {}
+    for community_id, report in zip(changed_ids, reports):
+        members = members_of[community_id]
+        title, summary = _parse_community_report(report, ", ".join(members[:3]))
+        records[community_id] = {
+            "title": title,
+            "summary": summary,
+            "entities": members,
+            "size": len(members),
+            "signature": compute_mdhash_id(prompts[community_id]),
+        }
+        data_for_vdb[community_id] = {
+            "title": title,
+            "content": f"{title}\n{summary}",
+        }
+
+    old_ids = set(index_record.get("community_ids", [])) if index_record else set()
+    stale_ids = list(old_ids - set(community_ids))
+    if stale_ids:
+        await asyncio.gather(
+            community_reports.delete(stale_ids), communities_vdb.delete(stale_ids)
+        )
+    if data_for_vdb:
+        await communities_vdb.upsert(data_for_vdb)
+    records[_COMMUNITY_INDEX_KEY] = {"community_ids": community_ids}
+    await community_reports.upsert(records)
+
+    logger.info(
+        f"Communities: {len(community_ids)} detected, {len(changed_ids)} reports updated, {len(stale_ids)} deleted"
+    )
+    return {
+        "communities": len(community_ids),
+        "updated": len(changed_ids),
+        "deleted": len(stale_ids),
+    }
+
+
 async def kg_query(
     query: str,
     knowledge_graph_inst: BaseGraphStorage,
@@ -1502,7 +2074,7 @@ async def kg_query(
         return cached_response
 
     hl_keywords, ll_keywords = await get_keywords_from_query(
-        query, query_param, global_config, hashing_kv
+        query, query_param, global_config, hashing_kv, knowledge_graph_inst
     )
 
     logger.debug(f"High-level keywords: {hl_keywords}")
@@ -1570,8 +2142,10 @@ async def kg_query(
         return sys_prompt
 
     tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    # Token counting is only needed for the debug log
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(tokenizer.encode(query + sys_prompt))
+        logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
 
     response = await use_model_func(
         query,
@@ -1613,18 +2187,23 @@ async def get_keywords_from_query(
     query_param: QueryParam,
     global_config: dict[str, str],
     hashing_kv: BaseKVStorage | None = None,
+    knowledge_graph_inst: BaseGraphStorage | None = None,
 ) -> tuple[list[str], list[str]]:
     """
     Retrieves high-level and low-level keywords for RAG operations.
 
     This function checks if keywords are already provided in query parameters,
-    and if not, extracts them from the query text using LLM.
+    and if not, extracts them from the query text using LLM. With
+    keyword_extraction "local" the query is first matched against the graph's
+    entity names and relationship keywords, the LLM is only used when too few
+    of the query's words match.
 
     Args:
         query: The user's query text
         query_param: Query parameters that may contain pre-defined keywords
         global_config: Global configuration dictionary
         hashing_kv: Optional key-value storage for caching results
+        knowledge_graph_inst: Knowledge graph used by local keyword extraction
 
     Returns:
         A tuple containing (high_level_keywords, low_level_keywords)
@@ -1633,6 +2212,18 @@ async def get_keywords_from_query(
     if query_param.hl_keywords or query_param.ll_keywords:
         return query_param.hl_keywords, query_param.ll_keywords
 
+    if query_param.keyword_extraction == "local" and knowledge_graph_inst is not None:
+        hl_keywords, ll_keywords, coverage = await get_keyword_index(
+            knowledge_graph_inst
+        ).extract(query, knowledge_graph_inst)
+        min_coverage = global_config["local_keywords_min_coverage"]
+        if (hl_keywords or ll_keywords) and coverage >= min_coverage:
+            logger.debug(f"Local keywords cover {coverage:.0%} of the query")
+            return hl_keywords, ll_keywords
+        logger.debug(
+            f"Local keywords cover {coverage:.0%} of the query, using the LLM instead"
+        )
+
     # Extract keywords using extract_keywords_only function which already supports conversation history
     hl_keywords, ll_keywords = await extract_keywords_only(
         query, query_param, global_config, hashing_kv
@@ -1693,8 +2284,10 @@ async def extract_keywords_only(
     )
 
     tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(kw_prompt))
-    logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
+    # Token counting is only needed for the debug log
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(tokenizer.encode(kw_prompt))
+        logger.debug(f"[kg_query]Prompt Tokens: {len_of_prompts}")
 
     # 5. Call the LLM for keyword extraction
     if param.model_func:
@@ -1779,6 +2372,7 @@ async def _get_vector_context(
                 # Directly use content from chunks_vdb.query result
                 chunk_with_time = {
                     "content": result["content"],
+                    "tokens": result.get("tokens"),
                     "created_at": result.get("created_at", None),
                     "file_path": result.get("file_path", "unknown_source"),
                 }
@@ -1792,6 +2386,7 @@ async def _get_vector_context(
             key=lambda x: x["content"],
             max_token_size=query_param.max_token_for_text_unit,
             tokenizer=tokenizer,
+            token_count_key=lambda x: x.get("tokens"),
         )
 
         logger.debug(
@@ -1911,14 +2506,29 @@ async def _build_query_context(
                 ) = vector_data
 
         # Combine and deduplicate the entities, relationships, and sources
+        # Deduplicate on identity instead of comparing every field, relations
+        # are undirected and chunk ids are derived from the chunk content
         entities_context = process_combine_contexts(
-            hl_entities_context, ll_entities_context, vector_entities_context
+            hl_entities_context,
+            ll_entities_context,
+            vector_entities_context,
+            key=lambda e: e["entity"],
         )
         relations_context = process_combine_contexts(
-            hl_relations_context, ll_relations_context, vector_relations_context
+            hl_relations_context,
+            ll_relations_context,
+            vector_relations_context,
+            key=lambda r: (
+                (r["entity1"], r["entity2"])
+                if r["entity1"] <= r["entity2"]
+                else (r["entity2"], r["entity1"])
+            ),
         )
         text_units_context = process_combine_contexts(
-            hl_text_units_context, ll_text_units_context, vector_text_units_context
+            hl_text_units_context,
+            ll_text_units_context,
+            vector_text_units_context,
+            key=lambda t: t["content"],
         )
     # not necessary to use LLM to generate a response
     if not entities_context and not relations_context:
@@ -1973,15 +2583,29 @@ async def _get_node_data(
     # Extract all entity IDs from your results list
     node_ids = [r["entity_name"] for r in results]
 
-    # Call the batch node retrieval and degree functions concurrently.
-    nodes_dict, degrees_dict = await asyncio.gather(
-        knowledge_graph_inst.get_nodes_batch(node_ids),
-        knowledge_graph_inst.node_degrees_batch(node_ids),
-    )
+    if isinstance(knowledge_graph_inst, RankingIndexGraphStorage):
+        # Node data, degree and description tokens come from the ranking index
+        rankings = await knowledge_graph_inst.entity_rankings(node_ids)
+        node_datas = [
+            rankings[nid].node if nid in rankings else None for nid in node_ids
+        ]
+        node_degrees = [
+            rankings[nid].degree if nid in rankings else 0 for nid in node_ids
+        ]
 
-    # Now, if you need the node data and degree in order:
-    node_datas = [nodes_dict.get(nid) for nid in node_ids]
-    node_degrees = [degrees_dict.get(nid, 0) for nid in node_ids]
+        def indexed_description_tokens(n):
+            return rankings[n["entity_name"]].tokens
+
+    else:
+        # Call the batch node retrieval and degree functions concurrently.
+        nodes_dict, degrees_dict = await asyncio.gather(
+            knowledge_graph_inst.get_nodes_batch(node_ids),
+            knowledge_graph_inst.node_degrees_batch(node_ids),
+        )
+
+        # Now, if you need the node data and degree in order:
+        node_datas = [nodes_dict.get(nid) for nid in node_ids]
+        node_degrees = [degrees_dict.get(nid, 0) for nid in node_ids]
 
     if not all([n is not None for n in node_datas]):
         logger.warning("Some nodes are missing, maybe the storage is damaged")
@@ -2016,6 +2640,11 @@ async def _get_node_data(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
+        token_count_key=(
+            indexed_description_tokens
+            if isinstance(knowledge_graph_inst, RankingIndexGraphStorage)
+            else _stored_description_tokens
+        ),
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -2083,16 +2712,77 @@ async def _get_node_data(
     return entities_context, relations_context, text_units_context
 
 
-async def _find_most_related_text_unit_from_entities(
+def _text_unit_ranking_flag_namespace(knowledge_graph_inst: BaseGraphStorage) -> str:
+    return f"{knowledge_graph_inst.workspace}_{knowledge_graph_inst.namespace}_text_unit_rankings"
+
+
+async def _text_unit_ranking_flag(knowledge_graph_inst: BaseGraphStorage):
+    key = (knowledge_graph_inst.workspace, knowledge_graph_inst.namespace)
+    flag = _text_unit_ranking_flags.get(key)
+    if flag is None:
+        flag = await get_update_flag(
+            _text_unit_ranking_flag_namespace(knowledge_graph_inst)
+        )
+        flag = _text_unit_ranking_flags.setdefault(key, flag)
+    return flag
+
+
+async def _invalidate_text_unit_rankings(knowledge_graph_inst: BaseGraphStorage):
+    """Make every process, this one included, drop its cached chunk rankings"""
+    await _text_unit_ranking_flag(knowledge_graph_inst)
+    await set_all_update_flags(_text_unit_ranking_flag_namespace(knowledge_graph_inst))
+
+
+async def _rank_text_units_for_entities(
     node_datas: list[dict],
-    query_param: QueryParam,
-    text_chunks_db: BaseKVStorage,
     knowledge_graph_inst: BaseGraphStorage,
-):
+) -> list[tuple[str, int, int]]:
+    """Rank the chunks of the given entities without reading the chunks
+
+    Returns:
+        (chunk_id, order, relation_counts) per chunk, order is the index of the
+        first entity citing the chunk and relation_counts the number of that
+        entity's one-hop neighbours also citing it
+    """
+    node_datas = [dp for dp in node_datas if dp["source_id"] is not None]
+    if isinstance(knowledge_graph_inst, RankingIndexGraphStorage):
+        # Each entity's chunks are already ordered, keep the first citing entity per chunk
+        rankings = await knowledge_graph_inst.entity_rankings(
+            [dp["entity_name"] for dp in node_datas]
+        )
+        ranking = []
+        seen_chunk_ids = set()
+        for index, dp in enumerate(node_datas):
+            entity_ranking = rankings.get(dp["entity_name"])
+            if entity_ranking is None:
+                continue
+            for c_id, relation_counts in entity_ranking.chunks:
+                if c_id not in seen_chunk_ids:
+                    seen_chunk_ids.add(c_id)
+                    ranking.append((c_id, index, relation_counts))
+        return ranking
+
+    global _text_unit_ranking_generation
+    ranking_updated = await _text_unit_ranking_flag(knowledge_graph_inst)
+    if ranking_updated.value:
+        ranking_updated.value = False
+        _text_unit_ranking_cache.clear()
+        _text_unit_ranking_generation += 1
+    generation = _text_unit_ranking_generation
+
+    cache_key = (
+        knowledge_graph_inst.workspace,
+        knowledge_graph_inst.namespace,
+        tuple((dp["entity_name"], dp["source_id"]) for dp in node_datas),
+    )
+    ranking = _text_unit_ranking_cache.get(cache_key)
+    if ranking is not None:
+        _text_unit_ranking_cache.move_to_end(cache_key)
+        return ranking
+
     text_units = [
         split_string_by_multi_markers(dp["source_id"], [GRAPH_FIELD_SEP])
         for dp in node_datas
-        if dp["source_id"] is not None
     ]
 
     node_names = [dp["entity_name"] for dp in node_datas]
@@ -2112,57 +2802,56 @@ async def _find_most_related_text_unit_from_entities(
     all_one_hop_nodes_data_dict = await knowledge_graph_inst.get_nodes_batch(
         all_one_hop_nodes
     )
-    all_one_hop_nodes_data = [
-        all_one_hop_nodes_data_dict.get(e) for e in all_one_hop_nodes
-    ]
 
     # Add null check for node data
     all_one_hop_text_units_lookup = {
         k: set(split_string_by_multi_markers(v["source_id"], [GRAPH_FIELD_SEP]))
-        for k, v in zip(all_one_hop_nodes, all_one_hop_nodes_data)
+        for k, v in all_one_hop_nodes_data_dict.items()
         if v is not None and "source_id" in v  # Add source_id check
     }
 
-    all_text_units_lookup = {}
-    tasks = []
-
+    ranking = []
+    seen_chunk_ids = set()
     for index, (this_text_units, this_edges) in enumerate(zip(text_units, edges)):
         for c_id in this_text_units:
-            if c_id not in all_text_units_lookup:
-                all_text_units_lookup[c_id] = index
-                tasks.append((c_id, index, this_edges))
-
-    # Process in batches tasks at a time to avoid overwhelming resources
-    batch_size = 5
-    results = []
-
-    for i in range(0, len(tasks), batch_size):
-        batch_tasks = tasks[i : i + batch_size]
-        batch_results = await asyncio.gather(
-            *[text_chunks_db.get_by_id(c_id) for c_id, _, _ in batch_tasks]
-        )
-        results.extend(batch_results)
-
-    for (c_id, index, this_edges), data in zip(tasks, results):
-        all_text_units_lookup[c_id] = {
-            "data": data,
-            "order": index,
-            "relation_counts": 0,
-        }
-
-        if this_edges:
-            for e in this_edges:
+            if c_id in seen_chunk_ids:
+                continue
+            seen_chunk_ids.add(c_id)
+            relation_counts = 0
+            for e in this_edges or []:
                 if (
                     e[1] in all_one_hop_text_units_lookup
                     and c_id in all_one_hop_text_units_lookup[e[1]]
                 ):
-                    all_text_units_lookup[c_id]["relation_counts"] += 1
+                    relation_counts += 1
+            ranking.append((c_id, index, relation_counts))
+
+    if generation == _text_unit_ranking_generation:
+        _text_unit_ranking_cache[cache_key] = ranking
+        if len(_text_unit_ranking_cache) > _TEXT_UNIT_RANKING_CACHE_SIZE:
+            _text_unit_ranking_cache.popitem(last=False)
+    return ranking
+
+
+async def _find_most_related_text_unit_from_entities(
+    node_datas: list[dict],
+    query_param: QueryParam,
+    text_chunks_db: BaseKVStorage,
+    knowledge_graph_inst: BaseGraphStorage,
+):
+    ranking = await _rank_text_units_for_entities(node_datas, knowledge_graph_inst)
+    if not ranking:
+        logger.warning("No valid text units found")
+        return []
+
+    # Read all candidate chunks with one storage call
+    chunk_datas = await text_chunks_db.get_by_ids([c_id for c_id, _, _ in ranking])
 
     # Filter out None values and ensure data has content
     all_text_units = [
-        {"id": k, **v}
-        for k, v in all_text_units_lookup.items()
-        if v is not None and v.get("data") is not None and "content" in v["data"]
+        {"id": c_id, "data": data, "order": order, "relation_counts": relation_counts}
+        for (c_id, order, relation_counts), data in zip(ranking, chunk_datas)
+        if data is not None and "content" in data
     ]
 
     if not all_text_units:
@@ -2178,10 +2867,11 @@ async def _find_most_related_text_unit_from_entities(
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
+        token_count_key=lambda x: x["data"].get("tokens"),
     )
 
     logger.debug(
-        f"Truncate chunks from {len(all_text_units_lookup)} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
+        f"Truncate chunks from {len(ranking)} to {len(all_text_units)} (max tokens:{query_param.max_token_for_text_unit})"
     )
 
     all_text_units = [t["data"] for t in all_text_units]
@@ -2194,6 +2884,9 @@ async def _find_most_related_edges_from_entities(
     knowledge_graph_inst: BaseGraphStorage,
 ):
     node_names = [dp["entity_name"] for dp in node_datas]
+    if isinstance(knowledge_graph_inst, RankingIndexGraphStorage):
+        return await _merge_ranked_edges(node_names, query_param, knowledge_graph_inst)
+
     batch_edges_dict = await knowledge_graph_inst.get_nodes_edges_batch(node_names)
 
     all_edges = []
@@ -2246,6 +2939,7 @@ async def _find_most_related_edges_from_entities(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
+        token_count_key=_stored_description_tokens,
     )
 
     logger.debug(
@@ -2255,6 +2949,41 @@ async def _find_most_related_edges_from_entities(
     return all_edges_data
 
 
+async def _merge_ranked_edges(
+    node_names: list[str],
+    query_param: QueryParam,
+    knowledge_graph_inst: RankingIndexGraphStorage,
+) -> list[dict]:
+    """Merge the pre-sorted edge lists of the entities up to the token budget"""
+    rankings = await knowledge_graph_inst.entity_rankings(node_names)
+    edge_lists = [rankings[name].edges for name in node_names if name in rankings]
+
+    max_token_size = query_param.max_token_for_global_context
+    if max_token_size <= 0:
+        return []
+    all_edges_data = []
+    seen = set()
+    tokens = 0
+    # heapq.merge is stable, ties keep the entity order a full sort would give
+    for edge in heapq.merge(
+        *edge_lists, key=lambda e: (e.rank, e.weight), reverse=True
+    ):
+        if edge.src_tgt in seen:
+            continue
+        seen.add(edge.src_tgt)
+        tokens += edge.tokens
+        if tokens > max_token_size:
+            break
+        all_edges_data.append(
+            {"src_tgt": edge.src_tgt, "rank": edge.rank, **edge.data}
+        )
+
+    logger.debug(
+        f"Truncate relations to {len(all_edges_data)} (max tokens:{max_token_size})"
+    )
+    return all_edges_data
+
+
 async def _get_edge_data(
     keywords,
     knowledge_graph_inst: BaseGraphStorage,
@@ -2316,6 +3045,7 @@ async def _get_edge_data(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_global_context,
         tokenizer=tokenizer,
+        token_count_key=_stored_description_tokens,
     )
     use_entities, use_text_units = await asyncio.gather(
         _find_most_related_entities_from_relationships(
@@ -2433,6 +3163,7 @@ async def _find_most_related_entities_from_relationships(
         key=lambda x: x["description"] if x["description"] is not None else "",
         max_token_size=query_param.max_token_for_local_context,
         tokenizer=tokenizer,
+        token_count_key=_stored_description_tokens,
     )
     logger.debug(
         f"Truncate entities from {len_node_datas} to {len(node_datas)} (max tokens:{query_param.max_token_for_local_context})"
@@ -2493,6 +3224,7 @@ async def _find_related_text_unit_from_relationships(
         key=lambda x: x["data"]["content"],
         max_token_size=query_param.max_token_for_text_unit,
         tokenizer=tokenizer,
+        token_count_key=lambda x: x["data"].get("tokens"),
     )
 
     logger.debug(
@@ -2570,8 +3302,10 @@ async def naive_query(
     if query_param.only_need_prompt:
         return sys_prompt
 
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
+    # Token counting is only needed for the debug log
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(tokenizer.encode(query + sys_prompt))
+        logger.debug(f"[naive_query]Prompt Tokens: {len_of_prompts}")
 
     response = await use_model_func(
         query,
@@ -2610,6 +3344,139 @@ async def naive_query(
     return response
 
 
+async def community_query(
+    query: str,
+    communities_vdb: BaseVectorStorage,
+    community_reports: BaseKVStorage,
+    query_param: QueryParam,
+    global_config: dict[str, str],
+    hashing_kv: BaseKVStorage | None = None,
+    system_prompt: str | None = None,
+) -> str | AsyncIterator[str]:
+    if query_param.model_func:
+        use_model_func = query_param.model_func
+    else:
+        use_model_func = global_config["llm_model_func"]
+        # Apply higher priority (5) to query relation LLM function
+        use_model_func = partial(use_model_func, _priority=5)
+
+    # Handle cache
+    args_hash = compute_args_hash(query_param.mode, query)
+    cached_response, quantized, min_val, max_val = await handle_cache(
+        hashing_kv, args_hash, query, query_param.mode, cache_type="query"
+    )
+    if cached_response is not None:
+        return cached_response
+
+    tokenizer: Tokenizer = global_config["tokenizer"]
+
+    results = await communities_vdb.query(query, top_k=query_param.top_k)
+    if not results:
+        return PROMPTS["fail_response"]
+    reports = await community_reports.get_by_ids([r["id"] for r in results])
+    reports = [r for r in reports if r is not None and "summary" in r]
+    len_reports = len(reports)
+    reports = truncate_list_by_token_size(
+        reports,
+        key=lambda x: f"{x['title']}\n{x['summary']}",
+        max_token_size=query_param.max_token_for_global_context,
+        tokenizer=tokenizer,
+    )
+    logger.debug(
+        f"Truncate community reports from {len_reports} to {len(reports)} (max tokens:{query_param.max_token_for_global_context})"
+    )
+    logger.info(
+        f"Query communities: {len(reports)} reports, top_k: {query_param.top_k}"
+    )
+    if not reports:
+        return PROMPTS["fail_response"]
+
+    communities_context = [
+        {
+            "id": i + 1,
+            "title": r["title"],
+            "summary": r["summary"],
+            "size": r.get("size", len(r.get("entities", []))),
+        }
+        for i, r in enumerate(reports)
+    ]
+    communities_str = json.dumps(communities_context, ensure_ascii=False)
+    if query_param.only_need_context:
+        return f"""
+---Community Reports---
+
+```json
+{communities_str}
+```
+
+"""
+    # Process conversation history
+    history_context = ""
+    if query_param.conversation_history:
+        history_context = get_conversation_turns(
+            query_param.conversation_history, query_param.history_turns
+        )
+
+    # Build system prompt
+    user_prompt = (
+        query_param.user_prompt
+        if query_param.user_prompt
+        else PROMPTS["DEFAULT_USER_PROMPT"]
+    )
+    sys_prompt_temp = (
+        system_prompt if system_prompt else PROMPTS["community_rag_response"]
+    )
+    sys_prompt = sys_prompt_temp.format(
+        context_data=communities_str,
+        response_type=query_param.response_type,
+        history=history_context,
+        user_prompt=user_prompt,
+    )
+
+    if query_param.only_need_prompt:
+        return sys_prompt
+
+    # Token counting is only needed for the debug log
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(tokenizer.encode(query + sys_prompt))
+        logger.debug(f"[community_query]Prompt Tokens: {len_of_prompts}")
+
+    response = await use_model_func(
+        query,
+        system_prompt=sys_prompt,
+        stream=query_param.stream,
+    )
+
+    if isinstance(response, str) and len(response) > len(sys_prompt):
+        response = (
+            response.replace(sys_prompt, "")
+            .replace("user", "")
+            .replace("model", "")
+            .replace(query, "")
+            .replace("<system>", "")
+            .replace("</system>", "")
+            .strip()
+        )
+
+    if hashing_kv.global_config.get("enable_llm_cache"):
+        # Save to cache
+        await save_to_cache(
+            hashing_kv,
+            CacheData(
+                args_hash=args_hash,
+                content=response,
+                prompt=query,
+                quantized=quantized,
+                min_val=min_val,
+                max_val=max_val,
+                mode=query_param.mode,
+                cache_type="query",
+            ),
+        )
+
+    return response
+
+
 # TODO: Deprecated, use user_prompt in QueryParam instead
 async def kg_query_with_keywords(
     query: str,
@@ -2693,8 +3560,10 @@ async def kg_query_with_keywords(
         return sys_prompt
 
     tokenizer: Tokenizer = global_config["tokenizer"]
-    len_of_prompts = len(tokenizer.encode(query + sys_prompt))
-    logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
+    # Token counting is only needed for the debug log
+    if logger.isEnabledFor(logging.DEBUG):
+        len_of_prompts = len(tokenizer.encode(query + sys_prompt))
+        logger.debug(f"[kg_query_with_keywords]Prompt Tokens: {len_of_prompts}")
 
     # 6. Generate response
     response = await use_model_func(
@@ -2774,6 +3643,7 @@ async def query_with_keywords(
         query_param=param,
         global_config=global_config,
         hashing_kv=hashing_kv,
+        knowledge_graph_inst=knowledge_graph_inst,
     )
 
     # Create a new string with the prompt and the keywords
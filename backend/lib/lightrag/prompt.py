@@ -54,6 +54,11 @@ Text:
 ######################
 Output:"""
 
+PROMPTS["entity_extraction_packed_input"] = """The text below contains {chunk_count} independent chunks. Each chunk starts with a marker line of the form ("chunk"{tuple_delimiter}<chunk_number>).
+Process every chunk separately. Before the records of each chunk, output its marker exactly as given followed by {record_delimiter}, then list the entities, relationships and content keywords found in that chunk only.
+
+{packed_text}"""
+
 PROMPTS["entity_extraction_examples"] = [
     """Example 1:
 
@@ -283,6 +288,23 @@ Description List: {description_list}
 Output:
 """
 
+PROMPTS["community_report"] = """You are a helpful assistant writing a report about one community of a knowledge graph.
+A community is a group of closely related entities. The entities and the relationships between them are listed below.
+Write a title naming the community's main theme on the first line, then a comprehensive summary of what the community covers: its key entities, how they relate, and the main requirements, facts or findings they describe.
+Only use the information provided below, and keep entity names so the summary can be traced back to the graph.
+Use {language} as output language.
+
+#######
+---Data---
+Entities:
+{entities}
+
+Relationships:
+{relationships}
+#######
+Output:
+"""
+
 PROMPTS["entity_continue_extraction"] = """
 MANY entities and relationships were missed in the last extraction.
 
@@ -463,6 +485,33 @@ When handling content with timestamps:
 
 Response:"""
 
+PROMPTS["community_rag_response"] = """---Role---
+
+You are a helpful assistant responding to user query about Community Reports provided in JSON format below. Each report summarizes a group of closely related entities of a knowledge graph.
+
+---Goal---
+
+Generate a concise response based on Community Reports and follow Response Rules, considering both the conversation history and the current query. Summarize all information in the provided Community Reports, and incorporating general knowledge relevant to the Community Reports. Do not include information not provided by Community Reports.
+
+---Conversation History---
+{history}
+
+---Community Reports(CR)---
+{context_data}
+
+---Response Rules---
+
+- Target format and length: {response_type}
+- Use markdown formatting with appropriate section headings
+- Please respond in the same language as the user's question.
+- Ensure the response maintains continuity with the conversation history.
+- List up to 5 most important reference sources at the end under "References" section, in the following format: [CR] title
+- If you don't know the answer, just say so.
+- Do not include information not provided by the Community Reports.
+- Addtional user prompt: {user_prompt}
+
+Response:"""
+
 # TODO: deprecated
 PROMPTS[
     "similarity_check"
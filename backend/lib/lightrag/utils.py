@@ -1,20 +1,30 @@
 from __future__ import annotations
-import weakref
 
 import asyncio
 import html
+import inspect
 import csv
 import json
 import logging
 import logging.handlers
 import os
 import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
 from dataclasses import dataclass
 from functools import wraps
 from hashlib import md5
 from typing import Any, Protocol, Callable, TYPE_CHECKING, List
 import numpy as np
 from dotenv import load_dotenv
+from lightrag.metrics import metrics_registry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 from lightrag.constants import (
     DEFAULT_LOG_MAX_BYTES,
     DEFAULT_LOG_BACKUP_COUNT,
@@ -229,6 +239,104 @@ class UnlimitedSemaphore:
         pass
 
 
+class CPUExecutor:
+    """Runs CPU-bound functions off the event loop thread
+
+    Supported executor types:
+        - "none": run inline on the event loop thread (default, previous behavior)
+        - "thread": run in a ThreadPoolExecutor, helps when the work releases the GIL (e.g. tiktoken)
+        - "process": run in a ProcessPoolExecutor, functions and arguments must be picklable
+
+    Use `map_batched` to send many small work items in a few calls, so the IPC
+    overhead of the process pool is amortized over a whole batch.
+    """
+
+    def __init__(self, executor_type: str = "none", max_workers: int | None = None):
+        if executor_type not in ("none", "thread", "process"):
+            raise ValueError(
+                f"Unknown CPU executor type '{executor_type}', expected none, thread or process"
+            )
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+            if self.executor_type == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="lightrag-cpu",
+                )
+            else:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Run func(*args) in the executor and return its result"""
+        if self.executor_type == "none":
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def map_batched(
+        self, batch_func: Callable, items: list, batch_size: int = 64
+    ) -> list:
+        """Apply a batch function to items, batch_size items per executor call
+
+        Args:
+            batch_func: Function taking a list of items and returning a list of results of the same length
+            items: Work items
+            batch_size: Number of items sent to the executor in one call
+
+        Returns:
+            List of results in the order of items
+        """
+        if not items:
+            return []
+        if self.executor_type == "none":
+            return batch_func(items)
+        batches = [
+            items[i : i + batch_size] for i in range(0, len(items), max(1, batch_size))
+        ]
+        batch_results = await asyncio.gather(
+            *[self.run(batch_func, batch) for batch in batches]
+        )
+        return [result for batch_result in batch_results for result in batch_result]
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_cpu_executors: dict[tuple[str, int | None], CPUExecutor] = {}
+
+
+def get_cpu_executor(
+    executor_type: str | None = None, max_workers: int | None = None
+) -> CPUExecutor:
+    """Get the process-wide CPU executor for the given type and pool size
+
+    Executors are shared by all LightRAG instances of a process and are never
+    stored in global_config, which is copied with dataclasses.asdict.
+    """
+    executor_type = executor_type or "none"
+    max_workers = max_workers or None
+    key = (executor_type, max_workers)
+    if key not in _cpu_executors:
+        _cpu_executors[key] = CPUExecutor(executor_type, max_workers)
+    return _cpu_executors[key]
+
+
+def shutdown_cpu_executors(wait: bool = True) -> None:
+    """Shut down all CPU executor pools of this process"""
+    for executor in _cpu_executors.values():
+        executor.shutdown(wait=wait)
+    _cpu_executors.clear()
+
+
 @dataclass
 class EmbeddingFunc:
     embedding_dim: int
@@ -338,204 +446,307 @@ class QueueFullError(Exception):
     pass
 
 
-def priority_limit_async_func_call(max_size: int, max_queue_size: int = 1000):
+_limiter_queue_wait = metrics_registry.histogram(
+    "lightrag_limiter_queue_wait_seconds",
+    "Time calls spend queued before a limiter worker runs them",
+    ("func", "priority"),
+)
+_limiter_exec_time = metrics_registry.histogram(
+    "lightrag_limiter_exec_seconds",
+    "Execution time of calls run by a limiter worker",
+    ("func", "priority"),
+)
+_limiter_queue_depth = metrics_registry.gauge(
+    "lightrag_limiter_queue_depth",
+    "Calls waiting in a limiter lane",
+    ("func", "priority"),
+)
+_limiter_in_flight = metrics_registry.gauge(
+    "lightrag_limiter_in_flight",
+    "Calls currently running in a limiter lane",
+    ("func", "priority"),
+)
+_limiter_completed = metrics_registry.gauge(
+    "lightrag_limiter_completed",
+    "Calls of a limiter lane that finished successfully",
+    ("func", "priority"),
+)
+_limiter_failed = metrics_registry.gauge(
+    "lightrag_limiter_failed",
+    "Calls of a limiter lane that raised an exception",
+    ("func", "priority"),
+)
+_limiter_preempted = metrics_registry.gauge(
+    "lightrag_limiter_preempted",
+    "Queued calls of a limiter lane displaced by a higher-priority call",
+    ("func", "priority"),
+)
+_limiter_reserved = metrics_registry.gauge(
+    "lightrag_limiter_reserved_workers",
+    "Workers reserved for a limiter lane",
+    ("func", "priority"),
+)
+_limiter_wait_max = metrics_registry.gauge(
+    "lightrag_limiter_queue_wait_max_seconds",
+    "Longest time a call of a limiter lane waited in the queue",
+    ("func", "priority"),
+)
+
+
+def _accepts_priority(func) -> bool:
+    """Whether func declares a ``_priority`` parameter of its own"""
+    try:
+        return "_priority" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+class _PreemptedError(Exception):
+    """Internal signal to a queued call that a higher-priority call took its slot"""
+
+
+def priority_limit_async_func_call(
+    max_size: int,
+    max_queue_size: int = 1000,
+    reserved: dict[int, int] | None = None,
+    preempt: bool = True,
+    name: str | None = None,
+):
     """
     Enhanced priority-limited asynchronous function call decorator
 
+    Calls are grouped into lanes by their ``_priority`` value. Lanes listed in
+    ``reserved`` own that many workers that other lanes never use, the rest of
+    the workers are shared and handed out lowest priority value first. Work is
+    dispatched when a call is queued or a running call finishes, there are no
+    polling workers.
+
     Args:
         max_size: Maximum number of concurrent calls
         max_queue_size: Maximum queue capacity to prevent memory overflow
+        reserved: Minimum number of workers kept for a priority lane, e.g. {5: 1}
+            keeps one worker free for query calls. At least one worker stays shared.
+        preempt: When the queue is full, let a call displace the newest queued
+            (not running) call of a lower-priority lane. The displaced call waits
+            for queue space again.
+        name: Label for the queue wait and execution time metrics, defaults to
+            the decorated function's name
     Returns:
-        Decorator function
+        Decorator function. A decorated function that declares a ``_priority``
+        parameter itself, like MultiModel.llm_model_func, receives the lane of
+        each call so it can schedule nested pools with the same priority.
     """
 
+    reserved = {lane: count for lane, count in (reserved or {}).items() if count > 0}
+    if sum(reserved.values()) > max_size - 1:
+        logger.warning(
+            f"limit_async: reserved workers {reserved} exceed max_size {max_size}, "
+            "reservations ignored"
+        )
+        reserved = {}
+    shared_capacity = max_size - sum(reserved.values())
+
     def final_decro(func):
         # Ensure func is callable
         if not callable(func):
             raise TypeError(f"Expected a callable object, got {type(func)}")
-        queue = asyncio.PriorityQueue(maxsize=max_queue_size)
-        tasks = set()
-        initialization_lock = asyncio.Lock()
-        counter = 0
-        shutdown_event = asyncio.Event()
-        initialized = False  # Global initialization flag
-        worker_health_check_task = None
-
-        # Track active future objects for cleanup
-        active_futures = weakref.WeakSet()
-        reinit_count = 0  # Reinitialization counter to track system health
-
-        # Worker function to process tasks in the queue
-        async def worker():
-            """Worker that processes tasks in the priority queue"""
-            try:
-                while not shutdown_event.is_set():
-                    try:
-                        # Use timeout to get tasks, allowing periodic checking of shutdown signal
-                        try:
-                            (
-                                priority,
-                                count,
-                                future,
-                                args,
-                                kwargs,
-                            ) = await asyncio.wait_for(queue.get(), timeout=1.0)
-                        except asyncio.TimeoutError:
-                            # Timeout is just to check shutdown signal, continue to next iteration
-                            continue
-
-                        # If future is cancelled, skip execution
-                        if future.cancelled():
-                            queue.task_done()
-                            continue
-
-                        try:
-                            # Execute function
-                            result = await func(*args, **kwargs)
-                            # If future is not done, set the result
-                            if not future.done():
-                                future.set_result(result)
-                        except asyncio.CancelledError:
-                            if not future.done():
-                                future.cancel()
-                            logger.debug("limit_async: Task cancelled during execution")
-                        except Exception as e:
-                            logger.error(
-                                f"limit_async: Error in decorated function: {str(e)}"
-                            )
-                            if not future.done():
-                                future.set_exception(e)
-                        finally:
-                            queue.task_done()
-                    except Exception as e:
-                        # Catch all exceptions in worker loop to prevent worker termination
-                        logger.error(f"limit_async: Critical error in worker: {str(e)}")
-                        await asyncio.sleep(0.1)  # Prevent high CPU usage
-            finally:
-                logger.debug("limit_async: Worker exiting")
-
-        async def health_check():
-            """Periodically check worker health status and recover"""
-            nonlocal initialized
-            try:
-                while not shutdown_event.is_set():
-                    await asyncio.sleep(5)  # Check every 5 seconds
-
-                    # No longer acquire lock, directly operate on task set
-                    # Use a copy of the task set to avoid concurrent modification
-                    current_tasks = set(tasks)
-                    done_tasks = {t for t in current_tasks if t.done()}
-                    tasks.difference_update(done_tasks)
-
-                    # Calculate active tasks count
-                    active_tasks_count = len(tasks)
-                    workers_needed = max_size - active_tasks_count
-
-                    if workers_needed > 0:
-                        logger.info(
-                            f"limit_async: Creating {workers_needed} new workers"
-                        )
-                        new_tasks = set()
-                        for _ in range(workers_needed):
-                            task = asyncio.create_task(worker())
-                            new_tasks.add(task)
-                            task.add_done_callback(tasks.discard)
-                        # Update task set in one operation
-                        tasks.update(new_tasks)
-            except Exception as e:
-                logger.error(f"limit_async: Error in health check: {str(e)}")
-            finally:
-                logger.debug("limit_async: Health check task exiting")
-                initialized = False
-
-        async def ensure_workers():
-            """Ensure worker threads and health check system are available
 
-            This function checks if the worker system is already initialized.
-            If not, it performs a one-time initialization of all worker threads
-            and starts the health check system.
-            """
-            nonlocal initialized, worker_health_check_task, tasks, reinit_count
+        func_name = (
+            name
+            or getattr(func, "__name__", None)
+            or getattr(getattr(func, "func", None), "__name__", "unknown")
+        )
 
-            if initialized:
-                return
+        forward_priority = _accepts_priority(func)
+
+        # lane -> FIFO of (future, args, kwargs, enqueued_at)
+        lanes: dict[int, deque] = {}
+        running: dict[int, int] = {}
+        metrics: dict[int, dict[str, float]] = {}
+        running_tasks = set()
+        space_waiters: list[asyncio.Future] = []
+        queued = 0
+        shutting_down = False
+
+        def lane_stats(lane: int) -> dict[str, float]:
+            if lane not in metrics:
+                metrics[lane] = {
+                    "completed": 0,
+                    "failed": 0,
+                    "preempted": 0,
+                    "wait_time_total": 0.0,
+                    "wait_time_max": 0.0,
+                }
+            return metrics[lane]
 
-            async with initialization_lock:
-                if initialized:
-                    return
+        def can_start(lane: int) -> bool:
+            if running.get(lane, 0) < reserved.get(lane, 0):
+                return True
+            shared_in_use = sum(
+                max(0, count - reserved.get(other, 0))
+                for other, count in running.items()
+            )
+            return shared_in_use < shared_capacity
 
-                # Increment reinitialization counter if this is not the first initialization
-                if reinit_count > 0:
-                    reinit_count += 1
-                    logger.warning(
-                        f"limit_async: Reinitializing needed (count: {reinit_count})"
+        def update_gauges():
+            for lane in set(lanes) | set(running) | set(metrics) | set(reserved):
+                _limiter_queue_depth.set(
+                    len(lanes.get(lane, ())), func=func_name, priority=lane
+                )
+                _limiter_in_flight.set(
+                    running.get(lane, 0), func=func_name, priority=lane
+                )
+                _limiter_reserved.set(
+                    reserved.get(lane, 0), func=func_name, priority=lane
+                )
+                stats = metrics.get(lane)
+                if stats is not None:
+                    _limiter_completed.set(
+                        stats["completed"], func=func_name, priority=lane
                     )
-                else:
-                    reinit_count = 1  # First initialization
-
-                # Check for completed tasks and remove them from the task set
-                current_tasks = set(tasks)
-                done_tasks = {t for t in current_tasks if t.done()}
-                tasks.difference_update(done_tasks)
-
-                # Log active tasks count during reinitialization
-                active_tasks_count = len(tasks)
-                if active_tasks_count > 0 and reinit_count > 1:
-                    logger.warning(
-                        f"limit_async: {active_tasks_count} tasks still running during reinitialization"
+                    _limiter_failed.set(stats["failed"], func=func_name, priority=lane)
+                    _limiter_preempted.set(
+                        stats["preempted"], func=func_name, priority=lane
+                    )
+                    _limiter_wait_max.set(
+                        stats["wait_time_max"], func=func_name, priority=lane
                     )
 
-                # Create initial worker tasks, only adding the number needed
-                workers_needed = max_size - active_tasks_count
-                for _ in range(workers_needed):
-                    task = asyncio.create_task(worker())
-                    tasks.add(task)
-                    task.add_done_callback(tasks.discard)
-
-                # Start health check
-                worker_health_check_task = asyncio.create_task(health_check())
-
-                initialized = True
-                logger.info(f"limit_async: {workers_needed} new workers initialized")
-
-        async def shutdown():
-            """Gracefully shut down all workers and the queue"""
-            logger.info("limit_async: Shutting down priority queue workers")
-
-            # Set the shutdown event
-            shutdown_event.set()
+        def wake_space_waiters():
+            while space_waiters:
+                waiter = space_waiters.pop()
+                if not waiter.done():
+                    waiter.set_result(None)
+
+        def dispatch():
+            """Start queued calls while their lane has a free worker"""
+            nonlocal queued
+            dequeued = False
+            for lane in sorted(lanes):
+                queue = lanes[lane]
+                while queue:
+                    future, args, kwargs, enqueued_at = queue[0]
+                    if future.done():
+                        queue.popleft()
+                        queued -= 1
+                        dequeued = True
+                        continue
+                    if not can_start(lane):
+                        break
+                    queue.popleft()
+                    queued -= 1
+                    dequeued = True
+
+                    wait_time = time.monotonic() - enqueued_at
+                    stats = lane_stats(lane)
+                    stats["wait_time_total"] += wait_time
+                    stats["wait_time_max"] = max(stats["wait_time_max"], wait_time)
+                    _limiter_queue_wait.observe(
+                        wait_time, func=func_name, priority=lane
+                    )
 
-            # Cancel all active futures
-            for future in list(active_futures):
+                    running[lane] = running.get(lane, 0) + 1
+                    task = asyncio.create_task(run(lane, future, args, kwargs))
+                    running_tasks.add(task)
+                    task.add_done_callback(running_tasks.discard)
+                    # Cancelling the caller's future (timeout, hedging) stops the call
+                    future.add_done_callback(
+                        lambda f, task=task: task.cancel() if f.cancelled() else None
+                    )
+            if dequeued:
+                wake_space_waiters()
+            update_gauges()
+
+        async def run(lane, future, args, kwargs):
+            started_at = time.monotonic()
+            if forward_priority:
+                kwargs = {**kwargs, "_priority": lane}
+            try:
+                result = await func(*args, **kwargs)
+                if not future.done():
+                    future.set_result(result)
+                lane_stats(lane)["completed"] += 1
+            except asyncio.CancelledError:
                 if not future.done():
                     future.cancel()
-
-            # Wait for the queue to empty
-            try:
-                await asyncio.wait_for(queue.join(), timeout=5.0)
-            except asyncio.TimeoutError:
-                logger.warning(
-                    "limit_async: Timeout waiting for queue to empty during shutdown"
+                logger.debug("limit_async: Task cancelled during execution")
+            except Exception as e:
+                logger.error(f"limit_async: Error in decorated function: {str(e)}")
+                if not future.done():
+                    future.set_exception(e)
+                lane_stats(lane)["failed"] += 1
+            finally:
+                _limiter_exec_time.observe(
+                    time.monotonic() - started_at, func=func_name, priority=lane
                 )
+                running[lane] -= 1
+                if not shutting_down:
+                    dispatch()
+
+        def preempt_lower(priority: int) -> bool:
+            """Displace the newest queued call of the lowest-priority lane below priority"""
+            nonlocal queued
+            for lane in sorted(lanes, reverse=True):
+                if lane <= priority:
+                    break
+                queue = lanes[lane]
+                while queue:
+                    future = queue.pop()[0]
+                    queued -= 1
+                    if not future.done():
+                        future.set_exception(_PreemptedError())
+                        lane_stats(lane)["preempted"] += 1
+                        return True
+            return False
+
+        async def wait_for_queue_space(priority: int):
+            loop = asyncio.get_running_loop()
+            while queued >= max_queue_size:
+                if preempt and preempt_lower(priority):
+                    return
+                waiter = loop.create_future()
+                space_waiters.append(waiter)
+                await waiter
 
-            # Cancel all worker tasks
-            for task in list(tasks):
+        async def shutdown():
+            """Gracefully shut down: cancel queued calls and running tasks"""
+            nonlocal shutting_down, queued
+            logger.info("limit_async: Shutting down priority lanes")
+            shutting_down = True
+
+            for queue in lanes.values():
+                while queue:
+                    future = queue.popleft()[0]
+                    if not future.done():
+                        future.cancel()
+            queued = 0
+            wake_space_waiters()
+
+            for task in list(running_tasks):
                 if not task.done():
                     task.cancel()
-
-            # Wait for all tasks to complete
-            if tasks:
-                await asyncio.gather(*tasks, return_exceptions=True)
-
-            # Cancel the health check task
-            if worker_health_check_task and not worker_health_check_task.done():
-                worker_health_check_task.cancel()
-                try:
-                    await worker_health_check_task
-                except asyncio.CancelledError:
-                    pass
-
-            logger.info("limit_async: Priority queue workers shutdown complete")
+            if running_tasks:
+                await asyncio.gather(*running_tasks, return_exceptions=True)
+
+            shutting_down = False
+            logger.info("limit_async: Priority lanes shutdown complete")
+
+        def lane_metrics() -> dict[int, dict[str, float]]:
+            """Per-lane queue depth, running calls and wait time statistics"""
+            snapshot = {}
+            for lane in sorted(set(lanes) | set(running) | set(metrics)):
+                stats = dict(lane_stats(lane))
+                started = stats["completed"] + stats["failed"] + running.get(lane, 0)
+                stats["queue_depth"] = sum(
+                    1 for entry in lanes.get(lane, ()) if not entry[0].done()
+                )
+                stats["running"] = running.get(lane, 0)
+                stats["reserved"] = reserved.get(lane, 0)
+                stats["wait_time_avg"] = (
+                    stats["wait_time_total"] / started if started else 0.0
+                )
+                snapshot[lane] = stats
+            return snapshot
 
         @wraps(func)
         async def wait_func(
@@ -556,70 +767,211 @@ def priority_limit_async_func_call(max_size: int, max_queue_size: int = 1000):
                 QueueFullError: If the queue is full and waiting times out
                 Any exception raised by the decorated function
             """
-            # Ensure worker system is initialized
-            await ensure_workers()
-
-            # Create a future for the result
-            future = asyncio.Future()
-            active_futures.add(future)
+            nonlocal queued
+            loop = asyncio.get_running_loop()
 
-            nonlocal counter
-            async with initialization_lock:
-                current_count = counter  # Use local variable to avoid race conditions
-                counter += 1
-
-            # Try to put the task into the queue, supporting timeout
-            try:
+            while True:
+                # Try to get a place in the queue, supporting timeout
                 if _queue_timeout is not None:
-                    # Use timeout to wait for queue space
                     try:
                         await asyncio.wait_for(
-                            # current_count is used to ensure FIFO order
-                            queue.put((_priority, current_count, future, args, kwargs)),
-                            timeout=_queue_timeout,
+                            wait_for_queue_space(_priority), timeout=_queue_timeout
                         )
                     except asyncio.TimeoutError:
                         raise QueueFullError(
                             f"Queue full, timeout after {_queue_timeout} seconds"
                         )
                 else:
-                    # No timeout, may wait indefinitely
-                    # current_count is used to ensure FIFO order
-                    await queue.put((_priority, current_count, future, args, kwargs))
-            except Exception as e:
-                # Clean up the future
-                if not future.done():
-                    future.set_exception(e)
-                active_futures.discard(future)
-                raise
+                    await wait_for_queue_space(_priority)
 
-            try:
-                # Wait for the result, optional timeout
-                if _timeout is not None:
-                    try:
-                        return await asyncio.wait_for(future, _timeout)
-                    except asyncio.TimeoutError:
-                        # Cancel the future
-                        if not future.done():
-                            future.cancel()
-                        raise TimeoutError(
-                            f"limit_async: Task timed out after {_timeout} seconds"
-                        )
-                else:
-                    # Wait for the result without timeout
-                    return await future
-            finally:
-                # Clean up the future reference
-                active_futures.discard(future)
+                future = loop.create_future()
+                entry = (future, args, kwargs, time.monotonic())
+                lanes.setdefault(_priority, deque()).append(entry)
+                queued += 1
+                dispatch()
 
-        # Add the shutdown method to the decorated function
+                try:
+                    # Wait for the result, optional timeout
+                    if _timeout is not None:
+                        try:
+                            return await asyncio.wait_for(future, _timeout)
+                        except asyncio.TimeoutError:
+                            raise TimeoutError(
+                                f"limit_async: Task timed out after {_timeout} seconds"
+                            )
+                    else:
+                        return await future
+                except _PreemptedError:
+                    # Displaced from the queue by a higher-priority call, queue again
+                    continue
+                finally:
+                    if not future.done():
+                        future.cancel()
+                        # Drop a still queued entry right away so it does not hold queue space
+                        try:
+                            lanes[_priority].remove(entry)
+                        except ValueError:
+                            pass
+                        else:
+                            queued -= 1
+                            wake_space_waiters()
+                            update_gauges()
+
+        # Add the shutdown and metrics methods to the decorated function
         wait_func.shutdown = shutdown
+        wait_func.lane_metrics = lane_metrics
 
         return wait_func
 
     return final_decro
 
 
+_hedge_calls = metrics_registry.gauge(
+    "lightrag_hedge_calls",
+    "Calls eligible for hedging",
+    ("func",),
+)
+_hedge_hedges = metrics_registry.gauge(
+    "lightrag_hedge_hedges",
+    "Eligible calls that were duplicated by a hedge request",
+    ("func",),
+)
+_hedge_wins = metrics_registry.gauge(
+    "lightrag_hedge_wins",
+    "Hedged calls answered by the hedge request",
+    ("func",),
+)
+
+
+async def _prepend_async_iterator(first, iterator):
+    """Yield an item already taken from an async iterator, then the rest of it"""
+    yield first
+    async for item in iterator:
+        yield item
+
+
+async def _empty_async_iterator():
+    return
+    yield
+
+
+def hedge_async_func_call(
+    budget: float,
+    initial_delay: float,
+    max_priority: int = 5,
+    percentile: float = 0.95,
+    window: int = 200,
+    min_samples: int = 20,
+    name: str | None = None,
+):
+    """
+    Hedged request decorator for query-priority LLM calls
+
+    A call with ``_priority <= max_priority`` that has not produced a response
+    (or, for streams, its first chunk) within the observed latency percentile
+    is duplicated. The first successful attempt wins and the other is cancelled.
+    Lower-priority calls such as entity extraction are never hedged.
+
+    Args:
+        budget: Maximum fraction of eligible calls that may be hedged (0.05 = 5%)
+        initial_delay: Hedge delay in seconds until min_samples latencies are known
+        max_priority: Highest _priority value that is eligible for hedging
+        percentile: Latency percentile used as hedge delay
+        window: Number of recent latencies kept
+        min_samples: Latencies required before the percentile is used
+        name: Label for the hedge metrics, defaults to the decorated function's name
+    Returns:
+        Decorator function
+    """
+
+    def final_decro(func):
+        latencies = deque(maxlen=window)
+        stats = {"calls": 0, "hedges": 0, "hedge_wins": 0}
+        func_name = name or getattr(func, "__name__", "unknown")
+
+        def update_gauges():
+            _hedge_calls.set(stats["calls"], func=func_name)
+            _hedge_hedges.set(stats["hedges"], func=func_name)
+            _hedge_wins.set(stats["hedge_wins"], func=func_name)
+
+        def hedge_delay() -> float:
+            if len(latencies) < min_samples:
+                return initial_delay
+            ordered = sorted(latencies)
+            return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+        async def attempt(args, kwargs, record: bool):
+            # Only primaries are recorded, hedges are biased towards fast calls
+            started_at = time.monotonic()
+            try:
+                result = await func(*args, **kwargs)
+                if hasattr(result, "__aiter__"):
+                    # A stream counts as answered once its first chunk arrives
+                    iterator = result.__aiter__()
+                    try:
+                        first = await iterator.__anext__()
+                    except StopAsyncIteration:
+                        result = _empty_async_iterator()
+                    else:
+                        result = _prepend_async_iterator(first, iterator)
+            except asyncio.CancelledError:
+                # A cancelled slow primary still took at least this long
+                if record:
+                    latencies.append(time.monotonic() - started_at)
+                raise
+            if record:
+                latencies.append(time.monotonic() - started_at)
+            return result
+
+        @wraps(func)
+        async def hedged_func(*args, _priority=10, **kwargs):
+            if _priority > max_priority:
+                return await func(*args, _priority=_priority, **kwargs)
+
+            kwargs["_priority"] = _priority
+            stats["calls"] += 1
+            update_gauges()
+            primary = asyncio.ensure_future(attempt(args, kwargs, True))
+            tasks = {primary}
+            try:
+                delay = hedge_delay()
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if done or stats["hedges"] + 1 > budget * stats["calls"]:
+                    return await primary
+
+                stats["hedges"] += 1
+                logger.debug(
+                    f"Hedging LLM call after {delay:.2f}s "
+                    f"({stats['hedges']}/{stats['calls']} calls hedged)"
+                )
+                hedge = asyncio.ensure_future(attempt(args, kwargs, False))
+                tasks.add(hedge)
+                update_gauges()
+                error = None
+                pending = tasks
+                while pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        if task.exception() is None:
+                            if task is hedge:
+                                stats["hedge_wins"] += 1
+                                update_gauges()
+                            return task.result()
+                        error = task.exception()
+                raise error
+            finally:
+                for task in tasks:
+                    if not task.done():
+                        task.cancel()
+
+        hedged_func.hedge_stats = stats
+        return hedged_func
+
+    return final_decro
+
+
 def wrap_embedding_func_with_attrs(**kwargs):
     """Wrap a function with attributes"""
 
@@ -630,16 +982,407 @@ def wrap_embedding_func_with_attrs(**kwargs):
     return final_decro
 
 
+class EmbeddingVectorCache:
+    """Persistent content-hash to vector cache shared by all vector storages.
+
+    Entries are keyed by the md5 of the embedded text and evicted in LRU order
+    once ``max_entries`` is exceeded. The cache file records a fingerprint of
+    the embedding model and dimension, so a file written for another model is
+    discarded on load instead of serving stale vectors.
+    """
+
+    def __init__(self, file_name: str, fingerprint: str, max_entries: int):
+        self.file_name = file_name
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _load(self) -> None:
+        if not os.path.exists(self.file_name):
+            return
+        try:
+            with np.load(self.file_name, allow_pickle=False) as data:
+                if str(data["fingerprint"]) != self.fingerprint:
+                    logger.info(
+                        f"Embedding cache fingerprint changed ({data['fingerprint']} -> "
+                        f"{self.fingerprint}), discarding {self.file_name}"
+                    )
+                    # Overwrite the stale file on the next save
+                    self._dirty = True
+                    return
+                keys = data["keys"]
+                vectors = data["vectors"]
+        except Exception as e:
+            logger.warning(f"Failed to load embedding cache {self.file_name}: {e}")
+            return
+
+        # Keys are stored oldest first, keep the most recently used ones
+        start = max(0, len(keys) - self.max_entries)
+        for key, vector in zip(keys[start:], vectors[start:]):
+            self._entries[str(key)] = vector
+        logger.info(
+            f"Loaded {len(self._entries)} cached embeddings from {self.file_name}"
+        )
+
+    def get_many(self, keys: list[str]) -> list[np.ndarray | None]:
+        """Look up vectors by content hash, refreshing the LRU position of hits."""
+        results = []
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, keys: list[str], vectors: np.ndarray) -> None:
+        """Insert vectors by content hash, evicting least recently used entries."""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                # Copy so cached rows don't pin the caller's whole batch array
+                self._entries[key] = np.array(vector, dtype=np.float32, copy=True)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def save(self) -> None:
+        """Write the cache atomically if it changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            keys = list(self._entries.keys())
+            vectors = list(self._entries.values())
+            self._dirty = False
+
+        def _write(tmp_file_name: str):
+            with open(tmp_file_name, "wb") as f:
+                np.savez(
+                    f,
+                    fingerprint=np.array(self.fingerprint),
+                    keys=np.array(keys, dtype=str),
+                    vectors=np.stack(vectors).astype(np.float32)
+                    if vectors
+                    else np.empty((0, 0), dtype=np.float32),
+                )
+
+        try:
+            os.makedirs(os.path.dirname(self.file_name) or ".", exist_ok=True)
+            atomic_write(self.file_name, _write)
+        except Exception as e:
+            with self._lock:
+                self._dirty = True
+            logger.warning(f"Failed to save embedding cache {self.file_name}: {e}")
+            return
+        logger.debug(
+            f"Saved {len(keys)} cached embeddings to {self.file_name} "
+            f"(hits={self.hits}, misses={self.misses})"
+        )
+
+
+# Process-wide embedding caches keyed by file name, shared by instances using the same working_dir
+_embedding_vector_caches: dict[str, EmbeddingVectorCache] = {}
+
+
+def get_embedding_vector_cache(
+    file_name: str, fingerprint: str, max_entries: int
+) -> EmbeddingVectorCache:
+    """Return the shared embedding cache for file_name, reloading it if the fingerprint changed."""
+    cache = _embedding_vector_caches.get(file_name)
+    if cache is None or cache.fingerprint != fingerprint:
+        cache = EmbeddingVectorCache(file_name, fingerprint, max_entries)
+        _embedding_vector_caches[file_name] = cache
+    else:
+        cache.max_entries = max_entries
+    return cache
+
+
+def wrap_embedding_func_with_vector_cache(func, cache: EmbeddingVectorCache):
+    """Serve embeddings from the cache and only send cache misses to func.
+
+    Calls that pass ``_priority`` (query embeddings) bypass the cache, so one-off
+    query texts do not evict document vectors.
+    """
+
+    @wraps(func)
+    async def cached_func(texts: list[str], *args, **kwargs) -> np.ndarray:
+        if "_priority" in kwargs or args:
+            return await func(texts, *args, **kwargs)
+
+        keys = [compute_mdhash_id(text) for text in texts]
+        cached = cache.get_many(keys)
+
+        # Embed each distinct missing text once
+        missing: dict[str, str] = {}
+        for key, text, vector in zip(keys, texts, cached):
+            if vector is None and key not in missing:
+                missing[key] = text
+        if not missing:
+            return np.stack(cached)
+
+        new_vectors = await func(list(missing.values()), **kwargs)
+        if len(new_vectors) != len(missing):
+            # Let the storage report the mismatch, do not cache partial results
+            return new_vectors
+        cache.put_many(list(missing.keys()), new_vectors)
+
+        by_key = dict(zip(missing.keys(), new_vectors))
+        return np.stack(
+            [
+                vector if vector is not None else by_key[key]
+                for key, vector in zip(keys, cached)
+            ]
+        )
+
+    return cached_func
+
+
+class QueryEmbeddingCache:
+    """In-memory LRU of query embeddings, bounded by the bytes of the stored vectors.
+
+    Keys include the fingerprint of the embedding model and dimension, so a
+    vector computed by another model is never served.
+    """
+
+    def __init__(self, fingerprint: str, max_bytes: int):
+        self.fingerprint = fingerprint
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _key(self, text: str) -> str:
+        return compute_mdhash_id(f"{self.fingerprint}\n{text}")
+
+    def get(self, text: str) -> np.ndarray | None:
+        key = self._key(text)
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, text: str, vector: np.ndarray) -> None:
+        key = self._key(text)
+        # Copy so the entry does not keep the caller's whole batch alive
+        vector = np.array(vector)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self._entries[key] = vector
+            self.bytes += vector.nbytes
+            while self.bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+
+def wrap_embedding_func_with_query_cache(func, cache: QueryEmbeddingCache):
+    """Serve repeated query embeddings from memory.
+
+    Only query-priority calls (``_priority`` below the default 10) are cached,
+    document embeddings go to func unchanged.
+    """
+
+    @wraps(func)
+    async def cached_func(texts: list[str], *args, **kwargs) -> np.ndarray:
+        if args or kwargs.get("_priority", 10) >= 10:
+            return await func(texts, *args, **kwargs)
+
+        cached = [cache.get(text) for text in texts]
+        # Embed each distinct missing text once
+        missing = list(
+            dict.fromkeys(text for text, vector in zip(texts, cached) if vector is None)
+        )
+        if not missing:
+            return np.stack(cached)
+
+        new_vectors = await func(missing, **kwargs)
+        if len(new_vectors) != len(missing):
+            # Let the storage report the mismatch, do not cache partial results
+            return new_vectors
+        for text, vector in zip(missing, new_vectors):
+            cache.put(text, vector)
+
+        by_text = dict(zip(missing, new_vectors))
+        return np.stack(
+            [
+                vector if vector is not None else by_text[text]
+                for text, vector in zip(texts, cached)
+            ]
+        )
+
+    return cached_func
+
+
+def wrap_embedding_func_with_micro_batching(
+    func, max_batch_size: int, max_wait_ms: float
+):
+    """Coalesce concurrent embedding calls into shared requests to func.
+
+    Texts from concurrent callers with the same ``_priority`` are collected for
+    up to ``max_wait_ms`` (or until ``max_batch_size`` texts are pending), sent
+    as one call and the rows are scattered back to each caller. Query-priority
+    calls (``_priority`` below the default 10) are flushed on the next loop
+    iteration, so they only coalesce with queries issued in the same tick.
+
+    Args:
+        func: Embedding function accepting a list of texts and ``_priority``
+        max_batch_size: Maximum number of texts sent in one request
+        max_wait_ms: Maximum time a document-priority call waits for company
+    Returns:
+        The batching embedding function
+    """
+    pending: dict[int, list[tuple[list[str], asyncio.Future]]] = {}
+    pending_sizes: dict[int, int] = {}
+    flush_handles: dict[int, asyncio.Handle] = {}
+    batch_tasks = set()
+
+    async def run_batch(
+        priority: int, items: list[tuple[list[str], asyncio.Future]]
+    ):
+        texts = [text for item_texts, _ in items for text in item_texts]
+        try:
+            vectors = await func(texts, _priority=priority)
+            if len(vectors) != len(texts):
+                raise ValueError(
+                    f"embedding is not 1-1 with batch, {len(vectors)} != {len(texts)}"
+                )
+        except asyncio.CancelledError:
+            for _, future in items:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future in items:
+            if not future.done():
+                future.set_result(vectors[offset : offset + len(item_texts)])
+            offset += len(item_texts)
+
+    def flush(priority: int):
+        handle = flush_handles.pop(priority, None)
+        if handle is not None:
+            handle.cancel()
+        items = pending.pop(priority, None)
+        pending_sizes.pop(priority, None)
+        if not items:
+            return
+        if len(items) > 1:
+            logger.debug(
+                f"Embedding micro-batch: {len(items)} calls coalesced into one request"
+            )
+        task = asyncio.create_task(run_batch(priority, items))
+        batch_tasks.add(task)
+        task.add_done_callback(batch_tasks.discard)
+
+    @wraps(func)
+    async def batched_func(texts: list[str], *args, _priority=10, **kwargs):
+        # Calls with extra arguments or that fill a batch on their own go straight through
+        if args or kwargs or len(texts) >= max_batch_size:
+            return await func(texts, *args, _priority=_priority, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        if pending_sizes.get(_priority, 0) + len(texts) > max_batch_size:
+            flush(_priority)
+
+        future = loop.create_future()
+        pending.setdefault(_priority, []).append((texts, future))
+        pending_sizes[_priority] = pending_sizes.get(_priority, 0) + len(texts)
+
+        if pending_sizes[_priority] >= max_batch_size:
+            flush(_priority)
+        elif _priority not in flush_handles:
+            delay = max_wait_ms / 1000 if _priority >= 10 else 0
+            flush_handles[_priority] = loop.call_later(delay, flush, _priority)
+
+        return await future
+
+    return batched_func
+
+
 def load_json(file_name):
     if not os.path.exists(file_name):
         return None
+    if orjson is not None:
+        with open(file_name, "rb") as f:
+            return orjson.loads(f.read())
     with open(file_name, encoding="utf-8") as f:
         return json.load(f)
 
 
-def write_json(json_obj, file_name):
-    with open(file_name, "w", encoding="utf-8") as f:
-        json.dump(json_obj, f, indent=2, ensure_ascii=False)
+def atomic_write(file_name: str, write_func: Callable[[str], None]) -> None:
+    """Write a file through a temp file in the same directory and rename it into place
+
+    A crash or a failed write leaves the previous file intact instead of a
+    truncated one.
+
+    Args:
+        file_name: Destination path
+        write_func: Writes the complete content to the temp path it is given
+    """
+    directory = os.path.dirname(os.path.abspath(file_name))
+    fd, tmp_file_name = tempfile.mkstemp(
+        prefix=f".{os.path.basename(file_name)}.", suffix=".tmp", dir=directory
+    )
+    os.close(fd)
+    try:
+        write_func(tmp_file_name)
+        with open(tmp_file_name, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_file_name, file_name)
+    except BaseException:
+        try:
+            os.remove(tmp_file_name)
+        except OSError:
+            pass
+        raise
+
+
+def write_json(json_obj, file_name, indent: int | None = 2):
+    """Serialize json_obj and atomically replace file_name, using orjson when installed"""
+    data = None
+    if orjson is not None:
+        try:
+            data = orjson.dumps(
+                json_obj,
+                option=(orjson.OPT_INDENT_2 if indent else 0)
+                | orjson.OPT_SERIALIZE_NUMPY,
+            )
+        except TypeError:
+            # e.g. non-string keys, fall back to the stdlib encoder
+            data = None
+    if data is None:
+        data = json.dumps(json_obj, indent=indent, ensure_ascii=False).encode("utf-8")
+
+    def _write(tmp_file_name: str):
+        with open(tmp_file_name, "wb") as f:
+            f.write(data)
+
+    atomic_write(file_name, _write)
 
 
 class TokenizerInterface(Protocol):
@@ -661,16 +1404,38 @@ class Tokenizer:
     A wrapper around a tokenizer to provide a consistent interface for encoding and decoding.
     """
 
-    def __init__(self, model_name: str, tokenizer: TokenizerInterface):
+    def __init__(
+        self,
+        model_name: str,
+        tokenizer: TokenizerInterface,
+        token_count_cache_size: int = 4096,
+    ):
         """
         Initializes the Tokenizer with a tokenizer model name and a tokenizer instance.
 
         Args:
             model_name: The associated model name for the tokenizer.
             tokenizer: An instance of a class implementing the TokenizerInterface.
+            token_count_cache_size: Maximum number of strings kept in the token count LRU cache, 0 disables it.
         """
         self.model_name: str = model_name
         self.tokenizer: TokenizerInterface = tokenizer
+        self.token_count_cache_size: int = token_count_cache_size
+        self._token_count_cache: OrderedDict[str, int] = OrderedDict()
+        self._token_count_lock = threading.Lock()
+        self.token_counter: Callable[[str], int] | None = None
+        """Optional cheap token counter (e.g. ApproximateTokenCounter) used by count_tokens instead of encoding"""
+
+    def __getstate__(self):
+        # Locks are not picklable and the cache is not worth shipping to pool workers
+        state = self.__dict__.copy()
+        state["_token_count_cache"] = OrderedDict()
+        state.pop("_token_count_lock", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._token_count_lock = threading.Lock()
 
     def encode(self, content: str) -> List[int]:
         """
@@ -696,18 +1461,151 @@ class Tokenizer:
         """
         return self.tokenizer.decode(tokens)
 
+    def encode_batch(self, contents: List[str]) -> List[List[int]]:
+        """
+        Encodes a list of strings, using the batch API of the underlying tokenizer when available.
+
+        Args:
+            contents: The strings to encode.
+
+        Returns:
+            A list of token lists, in the order of contents.
+        """
+        encode_batch = getattr(self.tokenizer, "encode_batch", None)
+        if encode_batch is not None:
+            return encode_batch(contents)
+        return [self.tokenizer.encode(content) for content in contents]
+
+    def count_tokens(self, content: str) -> int:
+        """
+        Returns the number of tokens of a string, served from the LRU cache when possible.
+
+        Args:
+            content: The string to count tokens for.
+
+        Returns:
+            The number of tokens.
+        """
+        return self.count_tokens_batch([content])[0]
+
+    def count_tokens_batch(self, contents: List[str]) -> List[int]:
+        """
+        Returns the number of tokens of each string, encoding cache misses in one batch.
+
+        Args:
+            contents: The strings to count tokens for.
+
+        Returns:
+            A list of token counts, in the order of contents.
+        """
+        token_counter = getattr(self, "token_counter", None)
+        if token_counter is not None:
+            return [token_counter(content) for content in contents]
+        if getattr(self, "token_count_cache_size", 0) <= 0:
+            return [len(tokens) for tokens in self.encode_batch(contents)]
+
+        counts: List[int | None] = []
+        with self._token_count_lock:
+            for content in contents:
+                count = self._token_count_cache.get(content)
+                if count is not None:
+                    self._token_count_cache.move_to_end(content)
+                counts.append(count)
+
+        missing = list({c for c, count in zip(contents, counts) if count is None})
+        if not missing:
+            return counts
+
+        missing_counts = dict(
+            zip(missing, (len(tokens) for tokens in self.encode_batch(missing)))
+        )
+        with self._token_count_lock:
+            for content, count in missing_counts.items():
+                self._token_count_cache[content] = count
+                self._token_count_cache.move_to_end(content)
+            while len(self._token_count_cache) > self.token_count_cache_size:
+                self._token_count_cache.popitem(last=False)
+
+        return [
+            count if count is not None else missing_counts[content]
+            for content, count in zip(contents, counts)
+        ]
+
+
+# Serializes the TIKTOKEN_CACHE_DIR override of encodings loaded from a cache_dir
+_tiktoken_cache_env_lock = threading.Lock()
+
+
+class _LazyTiktokenEncoding:
+    """Loads a tiktoken encoding through load() or on first use, so construction never blocks on the BPE file"""
+
+    def __init__(self, model_name: str, cache_dir: str | None = None):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self._encoding = None
+        self._lock = threading.Lock()
+
+    def _load_encoding(self):
+        import tiktoken
+
+        if not self.cache_dir:
+            return tiktoken.encoding_for_model(self.model_name)
+        # tiktoken only reads its cache location from the environment, point it
+        # at cache_dir for this load and restore it right after
+        with _tiktoken_cache_env_lock:
+            previous = os.environ.get("TIKTOKEN_CACHE_DIR")
+            os.environ["TIKTOKEN_CACHE_DIR"] = self.cache_dir
+            try:
+                return tiktoken.encoding_for_model(self.model_name)
+            finally:
+                if previous is None:
+                    os.environ.pop("TIKTOKEN_CACHE_DIR", None)
+                else:
+                    os.environ["TIKTOKEN_CACHE_DIR"] = previous
+
+    def load(self):
+        """Load the encoding now, blocking, e.g. from a worker thread"""
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    self._encoding = self._load_encoding()
+        return self._encoding
+
+    def encode(self, content: str) -> List[int]:
+        return self.load().encode(content)
+
+    def decode(self, tokens: List[int]) -> str:
+        return self.load().decode(tokens)
+
+    def encode_batch(self, contents: List[str]) -> List[List[int]]:
+        return self.load().encode_batch(contents)
+
+    def __getstate__(self):
+        # tiktoken caches encodings per process, workers load their own copy
+        return {"model_name": self.model_name, "cache_dir": self.cache_dir}
+
+    def __setstate__(self, state):
+        self.__init__(state["model_name"], state.get("cache_dir"))
+
 
 class TiktokenTokenizer(Tokenizer):
     """
     A Tokenizer implementation using the tiktoken library.
     """
 
-    def __init__(self, model_name: str = "gpt-4o-mini"):
+    def __init__(self, model_name: str = "gpt-4o-mini", cache_dir: str | None = None):
         """
         Initializes the TiktokenTokenizer with a specified model name.
 
+        The BPE file is loaded by LightRAG.initialize_storages in a worker thread,
+        or lazily on first use. For offline deployments, point `cache_dir` (or the
+        TIKTOKEN_CACHE_DIR environment variable) to a directory populated by running
+        tiktoken once with TIKTOKEN_CACHE_DIR set to it. cache_dir only applies to
+        this tokenizer, the process environment is left as is.
+
         Args:
             model_name: The model name for the tiktoken tokenizer to use.  Defaults to "gpt-4o-mini".
+            cache_dir: Directory holding the cached tiktoken BPE files.
 
         Raises:
             ImportError: If tiktoken is not installed.
@@ -721,10 +1619,133 @@ class TiktokenTokenizer(Tokenizer):
             )
 
         try:
-            tokenizer = tiktoken.encoding_for_model(model_name)
-            super().__init__(model_name=model_name, tokenizer=tokenizer)
+            # Validate the model name without loading the BPE file
+            tiktoken.model.encoding_name_for_model(model_name)
         except KeyError:
             raise ValueError(f"Invalid model_name: {model_name}.")
+        super().__init__(
+            model_name=model_name,
+            tokenizer=_LazyTiktokenEncoding(model_name, cache_dir),
+        )
+
+
+class ApproximateTokenCounter:
+    """
+    Cheap token counter estimating tokens from per-script character ratios.
+
+    Intended for budgeting paths (context truncation, summary triggers) where exact
+    counts are not required. Characters are bucketed by script with C-speed regex
+    counting, and each bucket has its own characters-per-token ratio. The default
+    ratios are rough values for BPE tokenizers; use `calibrate` to fit them to the
+    tokenizer and languages actually in use.
+    """
+
+    SCRIPT_PATTERNS: dict[str, re.Pattern] = {
+        "cjk": re.compile(
+            r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]"
+        ),
+        "latin_ext": re.compile(r"[\u00c0-\u024f\u1e00-\u1eff]"),
+        "cyrillic": re.compile(r"[\u0400-\u04ff]"),
+        "whitespace": re.compile(r"\s"),
+        "ascii": re.compile(r"[\x21-\x7e]"),
+    }
+
+    DEFAULT_CHARS_PER_TOKEN: dict[str, float] = {
+        "ascii": 4.0,
+        "latin_ext": 1.5,
+        "cjk": 1.0,
+        "cyrillic": 2.5,
+        "whitespace": 8.0,
+        "other": 2.0,
+    }
+
+    def __init__(self, chars_per_token: dict[str, float] | None = None):
+        """
+        Args:
+            chars_per_token: Characters-per-token ratio per script bucket, overriding the defaults.
+        """
+        self.chars_per_token: dict[str, float] = {
+            **self.DEFAULT_CHARS_PER_TOKEN,
+            **(chars_per_token or {}),
+        }
+
+    def _script_counts(self, content: str) -> dict[str, int]:
+        counts = {
+            script: len(pattern.findall(content))
+            for script, pattern in self.SCRIPT_PATTERNS.items()
+        }
+        counts["other"] = max(0, len(content) - sum(counts.values()))
+        return counts
+
+    def __call__(self, content: str) -> int:
+        if not content:
+            return 0
+        estimate = sum(
+            count / self.chars_per_token[script]
+            for script, count in self._script_counts(content).items()
+            if count
+        )
+        return max(1, round(estimate))
+
+    def calibrate(self, samples: List[str], tokenizer: Tokenizer) -> None:
+        """
+        Fit the ratio of each script bucket to an exact tokenizer.
+
+        Each sample is attributed to its dominant non-whitespace script, so samples
+        should be representative texts of the languages being ingested.
+
+        Args:
+            samples: Sample texts.
+            tokenizer: Exact tokenizer to calibrate against.
+        """
+        chars: dict[str, int] = {}
+        tokens: dict[str, int] = {}
+        for sample, sample_tokens in zip(samples, tokenizer.encode_batch(samples)):
+            counts = self._script_counts(sample)
+            counts.pop("whitespace")
+            if not sample_tokens or not any(counts.values()):
+                continue
+            script = max(counts, key=counts.get)
+            chars[script] = chars.get(script, 0) + counts[script]
+            tokens[script] = tokens.get(script, 0) + len(sample_tokens)
+        for script, char_count in chars.items():
+            self.chars_per_token[script] = char_count / tokens[script]
+
+
+_TOKENIZER_REGISTRY: dict[str, Callable[..., Tokenizer]] = {}
+
+
+def register_tokenizer(model_name: str, factory: Callable[..., Tokenizer]) -> None:
+    """
+    Register a tokenizer factory for a model name.
+
+    Use this to match the tokenizer to the LLM actually serving requests (e.g. a
+    tokenizer shipped with a Cloudflare Workers AI model) instead of tiktoken.
+
+    Args:
+        model_name: Model name looked up by `get_tokenizer`.
+        factory: Callable taking `cache_dir` as keyword argument and returning a Tokenizer.
+    """
+    _TOKENIZER_REGISTRY[model_name] = factory
+
+
+def get_tokenizer(model_name: str, cache_dir: str | None = None) -> Tokenizer:
+    """
+    Build the tokenizer for a model name, loading its files from a local cache directory.
+
+    Registered factories take precedence, other names are resolved as tiktoken models.
+
+    Args:
+        model_name: Model name of the tokenizer.
+        cache_dir: Directory holding the bundled tokenizer files, if any.
+
+    Returns:
+        A Tokenizer instance.
+    """
+    factory = _TOKENIZER_REGISTRY.get(model_name)
+    if factory is not None:
+        return factory(cache_dir=cache_dir)
+    return TiktokenTokenizer(model_name, cache_dir=cache_dir)
 
 
 def pack_user_ass_to_openai_messages(*args: str):
@@ -765,29 +1786,51 @@ def truncate_list_by_token_size(
     key: Callable[[Any], str],
     max_token_size: int,
     tokenizer: Tokenizer,
+    token_count_key: Callable[[Any], int | None] | None = None,
 ) -> list[int]:
-    """Truncate a list of data by token size"""
+    """Truncate a list of data by token size
+
+    Args:
+        list_data: Items to truncate, in priority order
+        key: Returns the text of an item
+        max_token_size: Token budget for the kept items
+        tokenizer: Tokenizer used for items without a precomputed token count
+        token_count_key: Returns the token count stored with an item at ingest time, or None if absent
+    """
     if max_token_size <= 0:
         return []
     tokens = 0
     for i, data in enumerate(list_data):
-        tokens += len(tokenizer.encode(key(data)))
+        token_count = token_count_key(data) if token_count_key is not None else None
+        if token_count is None:
+            token_count = tokenizer.count_tokens(key(data))
+        tokens += token_count
         if tokens > max_token_size:
             return list_data[:i]
     return list_data
 
 
-def process_combine_contexts(*context_lists):
+def _context_content_key(item: dict) -> tuple:
+    return tuple(sorted((k, v) for k, v in item.items() if k != "id"))
+
+
+def process_combine_contexts(
+    *context_lists, key: Callable[[dict], Any] | None = None
+) -> list[dict]:
     """
-    Combine multiple context lists and remove duplicate content
+    Combine multiple context lists and remove duplicate items
 
     Args:
         *context_lists: Any number of context lists
+        key: Returns the identity of an item, e.g. the entity name. Without it
+            items are compared by all their fields except "id"
 
     Returns:
-        Combined context list with duplicates removed
+        Combined context list with duplicates removed, first occurrence kept
     """
-    seen_content = {}
+    if key is None:
+        key = _context_content_key
+    seen = set()
     combined_data = []
 
     # Iterate through all input context lists
@@ -795,10 +1838,9 @@ def process_combine_contexts(*context_lists):
         if not context_list:  # Skip empty lists
             continue
         for item in context_list:
-            content_dict = {k: v for k, v in item.items() if k != "id"}
-            content_key = tuple(sorted(content_dict.items()))
-            if content_key not in seen_content:
-                seen_content[content_key] = item
+            item_key = key(item)
+            if item_key not in seen:
+                seen.add(item_key)
                 combined_data.append(item)
 
     # Reassign IDs
@@ -1443,16 +2485,15 @@ async def update_chunk_cache_list(
     try:
         chunk_data = await text_chunks_storage.get_by_id(chunk_id)
         if chunk_data:
-            # Ensure llm_cache_list exists
-            if "llm_cache_list" not in chunk_data:
-                chunk_data["llm_cache_list"] = []
-
             # Add cache keys to the list if not already present
-            existing_keys = set(chunk_data["llm_cache_list"])
+            llm_cache_list = chunk_data.get("llm_cache_list", [])
+            existing_keys = set(llm_cache_list)
             new_keys = [key for key in cache_keys if key not in existing_keys]
 
             if new_keys:
-                chunk_data["llm_cache_list"].extend(new_keys)
+                # The stored record may be a read-only view, upsert a modified copy
+                chunk_data = dict(chunk_data)
+                chunk_data["llm_cache_list"] = list(llm_cache_list) + new_keys
 
                 # Update the chunk in storage
                 await text_chunks_storage.upsert({chunk_id: chunk_data})
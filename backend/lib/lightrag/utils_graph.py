@@ -9,6 +9,7 @@ from .kg.shared_storage import get_graph_db_lock
 from .constants import GRAPH_FIELD_SEP
 from .utils import compute_mdhash_id, logger
 from .base import StorageNameSpace
+from .operate import invalidate_graph_query_caches
 
 
 async def adelete_by_entity(
@@ -79,6 +80,7 @@ async def _delete_by_entity_done(
             ]
         ]
     )
+    await invalidate_graph_query_caches(chunk_entity_relation_graph)
 
 
 async def adelete_by_relation(
@@ -158,6 +160,7 @@ async def _delete_relation_done(relationships_vdb, chunk_entity_relation_graph)
             ]
         ]
     )
+    await invalidate_graph_query_caches(chunk_entity_relation_graph)
 
 
 async def aedit_entity(
@@ -215,6 +218,9 @@ async def aedit_entity(
             # 2. Update entity information in the graph
             new_node_data = {**node_data, **updated_data}
             new_node_data["entity_id"] = new_entity_name
+            if "description" in updated_data:
+                # Drop the token count computed for the old description
+                new_node_data.pop("description_tokens", None)
 
             if "entity_name" in new_node_data:
                 del new_node_data[
@@ -370,6 +376,7 @@ async def _edit_entity_done(
             ]
         ]
     )
+    await invalidate_graph_query_caches(chunk_entity_relation_graph)
 
 
 async def aedit_relation(
@@ -421,6 +428,9 @@ async def aedit_relation(
 
             # 2. Update relation information in the graph
             new_edge_data = {**edge_data, **updated_data}
+            if "description" in updated_data:
+                # Drop the token count computed for the old description
+                new_edge_data.pop("description_tokens", None)
             await chunk_entity_relation_graph.upsert_edge(
                 source_entity, target_entity, new_edge_data
             )
@@ -486,6 +496,7 @@ async def _edit_relation_done(relationships_vdb, chunk_entity_relation_graph) ->
             ]
         ]
     )
+    await invalidate_graph_query_caches(chunk_entity_relation_graph)
 
 
 async def acreate_entity(
@@ -954,6 +965,8 @@ def _merge_entity_attributes(
     all_keys = set()
     for data in entity_data_list:
         all_keys.update(data.keys())
+    # Token counts of the source descriptions do not apply to the merged description
+    all_keys.discard("description_tokens")
 
     # Merge values for each key
     for key in all_keys:
@@ -1004,6 +1017,8 @@ def _merge_relation_attributes(
     all_keys = set()
     for data in relation_data_list:
         all_keys.update(data.keys())
+    # Token counts of the source descriptions do not apply to the merged description
+    all_keys.discard("description_tokens")
 
     # Merge values for each key
     for key in all_keys:
@@ -1058,6 +1073,7 @@ async def _merge_entities_done(
             ]
         ]
     )
+    await invalidate_graph_query_caches(chunk_entity_relation_graph)
 
 
 async def get_entity_info(
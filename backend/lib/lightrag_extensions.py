@@ -91,6 +91,11 @@ class MyLightRAG:
             api_base_url=API_BASE_URL,
             embedding_model_name=EMBEDDING_MODEL,
             llm_model_name=LLM_MODEL,
+            max_concurrency=int(os.getenv("CLOUDFLARE_MAX_CONCURRENCY", "16")),
+            initial_concurrency=int(os.getenv("CLOUDFLARE_INITIAL_CONCURRENCY", "4")),
+            requests_per_second=float(os.getenv("CLOUDFLARE_REQUESTS_PER_SECOND", "5")),
+            latency_target=float(os.getenv("CLOUDFLARE_LATENCY_TARGET", "20")),
+            max_retries=int(os.getenv("CLOUDFLARE_MAX_RETRIES", "5")),
         )
         print("Initializing LightRAG Class\n=======")
         self.rag = LightRAG(
@@ -99,6 +104,9 @@ class MyLightRAG:
             llm_model_func=self.cloudflare_worker.query,
             llm_model_name=LLM_MODEL,
             llm_model_max_token_size=4080,
+            # the Cloudflare worker adapts concurrency itself, keep LightRAG's fixed limits out of its way
+            llm_model_max_async=self.cloudflare_worker.max_concurrency,
+            embedding_func_max_async=self.cloudflare_worker.max_concurrency,
             embedding_func=EmbeddingFunc(
                 embedding_dim=int(os.getenv("EMBEDDING_DIM", "1024")),
                 max_token_size=int(os.getenv("MAX_EMBED_TOKENS", "2048")),
@@ -131,12 +139,18 @@ class MyLightRAG:
             print(f'Starting full insertion of test\nlogs:')
             await self.rag.ainsert(book)
             print(f'Finished insertion of text')
-
         except Exception as e:
             print(f"Error in createKG: {e}")
+            return
+
+        try:
+            counts = await self.rag.abuild_communities()
+            print(f'Finished community reports: {counts}')
+        except Exception as e:
+            print(f"Skipping community reports: {e}")
 
     async def query(self, query, mode):
-        ALLOWED_MODES = {'hybrid', 'local', 'naive', 'global'}
+        ALLOWED_MODES = {'hybrid', 'local', 'naive', 'global', 'community'}
 
         if mode.lower() in ALLOWED_MODES:
             resp = await self.rag.aquery(